@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+链接解析基准测试
+
+生成包含各种链接形式（watch、youtu.be?si=、shorts、m.youtube.com、&list=、播放列表、频道）和
+一定比例无效行的链接文件，测量:
+- 逐行解析的速度（行/秒）
+- 解析时的峰值内存（边读边解析，与文件大小无关；对比把整个文件读入列表）
+- 批次开始前的耗时（统计行数并得到第一个链接，即开始下载前的等待）
+
+示例:
+    python benchmarks/bench_links.py                          # 100 万行
+    python benchmarks/bench_links.py --lines 5000000 --invalid 0.05
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+from downloader_core.links import count_link_lines, iter_link_file  # noqa: E402
+
+ID_CHARS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-'
+LINK_SHAPES = [
+    'https://www.youtube.com/watch?v={id}',
+    'https://youtu.be/{id}?si=Xk3aP0q9LmNbVc2d',
+    'https://www.youtube.com/shorts/{id}?feature=share',
+    'https://m.youtube.com/watch?v={id}&t=42s',
+    'https://www.youtube.com/watch?v={id}&list=PLrAXtmErZgOeiKm4sgNOknGvNjby9efdf&index=3',
+    'https://music.youtube.com/watch?v={id}',
+    'https://www.youtube.com/playlist?list=PL{id}',
+    'https://www.youtube.com/@channel{index}/videos',
+]
+INVALID_LINES = [
+    'https://www.youtube.com/feed/subscriptions',
+    'https://youtu.be/truncated',
+    'https://vimeo.com/123456',
+    '某个视频的备注',
+]
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='链接解析基准测试')
+    parser.add_argument('--lines', type=int, default=1000000, help='链接文件行数')
+    parser.add_argument('--invalid', type=float, default=0.01, help='无效行的比例')
+    parser.add_argument('--seed', type=int, default=1, help='随机种子')
+    parser.add_argument('--json', metavar='FILE', help='将结果写入 JSON 文件')
+    return parser
+
+def write_links_file(path, line_count, invalid_rate, seed):
+    rng = random.Random(seed)
+    # 常见的导出文件中大多数是视频链接
+    weights = [40, 20, 15, 10, 8, 5, 1, 1]
+    with open(path, 'w', encoding='utf-8') as file:
+        for index in range(line_count):
+            if rng.random() < invalid_rate:
+                file.write(rng.choice(INVALID_LINES) + '\n')
+                continue
+            video_id = ''.join(rng.choice(ID_CHARS) for _ in range(11))
+            shape = rng.choices(LINK_SHAPES, weights)[0]
+            file.write(shape.format(id=video_id, index=index) + '\n')
+
+def measure(function):
+    """运行并返回 (结果, 耗时, 峰值内存 MB)"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / (1024 * 1024)
+
+def main():
+    args = build_parser().parse_args()
+    work_dir = tempfile.mkdtemp(prefix='ytdl_links_')
+    path = os.path.join(work_dir, 'links.txt')
+    try:
+        print(f"生成 {args.lines} 行链接文件...", flush=True)
+        write_links_file(path, args.lines, args.invalid, args.seed)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+
+        # 解析速度不受 tracemalloc 影响，单独计时
+        rejected = []
+        started = time.perf_counter()
+        links = sum(1 for _ in iter_link_file(path, lambda number, line, reason: rejected.append(reason)))
+        parse_elapsed = time.perf_counter() - started
+
+        _, _, streaming_peak = measure(lambda: sum(1 for _ in iter_link_file(path)))
+
+        def read_list():
+            with open(path, 'r', encoding='utf-8') as file:
+                return len([line.strip() for line in file if line.strip()])
+        _, _, list_peak = measure(read_list)
+
+        started = time.perf_counter()
+        total = count_link_lines(path)
+        next(iter_link_file(path))
+        startup = time.perf_counter() - started
+
+        result = {
+            'lines': args.lines,
+            'file_mb': round(size_mb, 1),
+            'links': links,
+            'rejected': len(rejected),
+            'parse_seconds': round(parse_elapsed, 3),
+            'lines_per_second': round(args.lines / parse_elapsed),
+            'streaming_peak_mb': round(streaming_peak, 2),
+            'list_peak_mb': round(list_peak, 1),
+            'startup_seconds': round(startup, 3),
+            'counted_total': total,
+        }
+        print(f"文件 {result['file_mb']} MB，{args.lines} 行：{links} 个链接，{len(rejected)} 行无法识别")
+        print(f"解析 {parse_elapsed:.2f} 秒，{result['lines_per_second'] / 1e6:.2f} 百万行/秒")
+        print(f"峰值内存：边读边解析 {streaming_peak:.2f} MB，读入列表 {list_peak:.1f} MB")
+        print(f"开始下载前的耗时（统计行数并得到第一个链接）: {startup:.2f} 秒")
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as file:
+                json.dump(result, file, ensure_ascii=False, indent=2)
+    finally:
+        try:
+            os.remove(path)
+            os.rmdir(work_dir)
+        except OSError:
+            pass
+
+if __name__ == '__main__':
+    main()
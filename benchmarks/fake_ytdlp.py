@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+模拟 yt-dlp 的可执行程序（基准测试用）
+
+支持下载器用到的命令行用法，输出格式与 yt-dlp 一致:
+    --version / -U                    版本和更新
+    -F                                格式列表
+    --dump-single-json                元数据（格式地址指向本地媒体服务器）
+    --flat-playlist --print TEMPLATE  播放列表条目
+    下载（链接或 --load-info-json）    从媒体服务器下载并按 --progress-template 输出进度
+                                      （-f 137+140 下载后拼接合并，-f 137,140 分开保存、不合并）
+
+通过环境变量配置:
+    FAKE_YTDLP_SERVER   本地媒体服务器地址（未设置时不发起网络请求，立即完成传输）
+    FAKE_YTDLP_SIZE     每个视频的媒体大小（字节，默认 1048576）
+    FAKE_YTDLP_STARTUP  额外的启动耗时（秒，模拟 yt-dlp 自身的导入时间）
+    FAKE_YTDLP_LOG      每次调用追加一行 JSON 统计（类型、起止时间、传输耗时、字节数、返回码）
+    FAKE_YTDLP_DISCARD  为 1 时不写入下载文件
+"""
+
+import json
+import os
+import re
+import sys
+import time
+import urllib.error
+import urllib.request
+
+STARTED = time.time()
+
+# 带参数的选项（其余以 - 开头的参数视为开关）
+VALUE_FLAGS = {
+    '-f', '-o', '-N', '--merge-output-format', '--proxy', '--sleep-interval', '--max-sleep-interval',
+    '--retries', '--fragment-retries', '--user-agent', '--referer', '--add-header',
+    '--progress-template', '--load-info-json', '--print', '--limit-rate', '--concurrent-fragments',
+}
+VIDEO_ID_PATTERN = re.compile(r'(?:v=|youtu\.be/|shorts/)([A-Za-z0-9_-]{11})')
+FIELD_PATTERN = re.compile(r'%\(([\w.]+)\)s')
+
+# (格式ID, 扩展名, 高度, 帧率, 视频编码, 音频编码, 占视频大小的比例)
+FORMATS = [
+    ('140', 'm4a', None, None, 'none', 'mp4a.40.2', 0.2),
+    ('18', 'mp4', 360, 30, 'avc1.42001E', 'mp4a.40.2', 0.3),
+    ('134', 'mp4', 360, 30, 'avc1.4d401e', 'none', 0.25),
+    ('135', 'mp4', 480, 30, 'avc1.4d401f', 'none', 0.35),
+    ('136', 'mp4', 720, 30, 'avc1.4d401f', 'none', 0.5),
+    ('298', 'mp4', 720, 60, 'avc1.4d4020', 'none', 0.6),
+    ('137', 'mp4', 1080, 30, 'avc1.640028', 'none', 0.7),
+    ('299', 'mp4', 1080, 60, 'avc1.64002a', 'none', 0.8),
+]
+
+class FakeError(Exception):
+    pass
+
+def parse_arguments(argv):
+    options, switches, positional = {}, set(), []
+    index = 0
+    while index < len(argv):
+        arg = argv[index]
+        if arg in VALUE_FLAGS and index + 1 < len(argv):
+            options[arg] = argv[index + 1]
+            index += 2
+            continue
+        if arg.startswith('-'):
+            switches.add(arg)
+        else:
+            positional.append(arg)
+        index += 1
+    return options, switches, positional
+
+def log_invocation(kind, returncode, transfer=0.0, size=0):
+    path = os.environ.get('FAKE_YTDLP_LOG')
+    if not path:
+        return
+    record = {'kind': kind, 'start': STARTED, 'end': time.time(), 'transfer': transfer,
+              'bytes': size, 'returncode': returncode}
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write(json.dumps(record) + '\n')
+
+def server_url():
+    return os.environ.get('FAKE_YTDLP_SERVER', '').rstrip('/')
+
+def open_url(url, video_id):
+    try:
+        return urllib.request.urlopen(url, timeout=30)
+    except urllib.error.HTTPError as e:
+        if e.code == 429:
+            raise FakeError(f"[youtube] {video_id}: Unable to download webpage: HTTP Error 429: Too Many Requests")
+        raise FakeError(f"[youtube] {video_id}: HTTP Error {e.code}: {e.reason}")
+    except urllib.error.URLError as e:
+        raise FakeError(f"[youtube] {video_id}: Unable to download webpage: {e.reason}")
+
+def extract_info(link):
+    """模拟页面解析：请求一次视频页面，生成格式列表"""
+    match = VIDEO_ID_PATTERN.search(link)
+    if not match:
+        raise FakeError(f"[generic] Unsupported URL: {link}")
+    video_id = match.group(1)
+    base = server_url()
+    if base:
+        open_url(f"{base}/watch?v={video_id}", video_id).read()
+
+    size = int(os.environ.get('FAKE_YTDLP_SIZE', 1024 * 1024))
+    formats = []
+    for format_id, ext, height, fps, vcodec, acodec, ratio in FORMATS:
+        filesize = max(1, int(size * ratio))
+        formats.append({
+            'format_id': format_id, 'ext': ext, 'height': height, 'fps': fps,
+            'vcodec': vcodec, 'acodec': acodec, 'filesize': filesize,
+            'resolution': f"{height}p" if height else 'audio only',
+            'url': f"{base}/media/{video_id}/{format_id}?size={filesize}" if base else None,
+        })
+    return {'id': video_id, 'title': f"Benchmark {video_id}", 'duration': 60,
+            'extractor': 'youtube', 'webpage_url': link, 'formats': formats}
+
+def select_formats(info, format_spec):
+    """按 -f 选择格式：格式ID组合直接使用，其他选择器使用最佳视频+音频"""
+    by_id = {f['format_id']: f for f in info['formats']}
+    if format_spec:
+        parts = re.split(r'[+,]', format_spec)
+        if all(part in by_id for part in parts):
+            return [by_id[part] for part in parts]
+    return [by_id['299'], by_id['140']]
+
+def render(template, fields):
+    def value(match):
+        field = fields.get(match.group(1))
+        return 'NA' if field is None else str(field)
+    return FIELD_PATTERN.sub(value, template)
+
+def download_stream(fmt, video_id, destination, progress_template):
+    """下载一个格式，按模板输出进度行，返回 (字节数, 传输耗时)"""
+    total = fmt['filesize']
+    started = time.monotonic()
+    received = 0
+    last_report = 0
+    response = open_url(fmt['url'], video_id) if fmt.get('url') else None
+    output = open(destination, 'wb') if destination else None
+    try:
+        while received < total:
+            if response:
+                chunk = response.read(64 * 1024)
+                if not chunk:
+                    break
+            else:
+                chunk = b'\0' * min(64 * 1024, total - received)
+            received += len(chunk)
+            if output:
+                output.write(chunk)
+            now = time.monotonic()
+            if progress_template and (now - last_report >= 0.1 or received >= total):
+                last_report = now
+                elapsed = max(now - started, 1e-6)
+                speed = received / elapsed
+                print(render(progress_template, {
+                    'progress.downloaded_bytes': received,
+                    'progress.total_bytes': total,
+                    'progress.total_bytes_estimate': None,
+                    'progress.speed': round(speed, 1),
+                    'progress.eta': int((total - received) / speed) if speed else None,
+                }), flush=True)
+    finally:
+        if response:
+            response.close()
+        if output:
+            output.close()
+    return received, time.monotonic() - started
+
+def output_path(template, info, ext, format_id=None):
+    fields = {'title': info['title'], 'id': info['id'], 'ext': ext, 'format_id': format_id}
+    return FIELD_PATTERN.sub(lambda match: str(fields.get(match.group(1), 'NA')), template)
+
+def download(info, options):
+    progress_template = options.get('--progress-template')
+    if progress_template and progress_template.startswith('download:'):
+        progress_template = progress_template[len('download:'):]
+    chosen = select_formats(info, options.get('-f'))
+    ext = options.get('--merge-output-format') or chosen[0]['ext']
+    final_path = output_path(options.get('-o', '%(title)s.%(ext)s'), info, ext)
+    discard = os.environ.get('FAKE_YTDLP_DISCARD') == '1'
+
+    print(f"[youtube] {info['id']}: Downloading webpage", flush=True)
+    print(f"[info] {info['id']}: Downloading {len(chosen)} format(s): "
+          f"{'+'.join(f['format_id'] for f in chosen)}", flush=True)
+    size, transfer, parts = 0, 0.0, []
+
+    # 分开下载（-f 137,140）：每个格式单独保存，已存在的文件直接跳过
+    if ',' in (options.get('-f') or ''):
+        for fmt in chosen:
+            path = output_path(options.get('-o', '%(title)s.%(ext)s'), info, fmt['ext'], fmt['format_id'])
+            if not discard and os.path.exists(path):
+                print(f"[download] {path} has already been downloaded", flush=True)
+                continue
+            print(f"[download] Destination: {path}", flush=True)
+            received, elapsed = download_stream(fmt, info['id'], None if discard else path, progress_template)
+            size += received
+            transfer += elapsed
+        return size, transfer
+    for fmt in chosen:
+        part = None if discard else f"{os.path.splitext(final_path)[0]}.f{fmt['format_id']}.{fmt['ext']}"
+        print(f"[download] Destination: {part or final_path}", flush=True)
+        received, elapsed = download_stream(fmt, info['id'], part, progress_template)
+        size += received
+        transfer += elapsed
+        if part:
+            parts.append(part)
+
+    # 合并：按顺序拼接各个格式文件
+    if parts:
+        print(f"[Merger] Merging formats into \"{final_path}\"", flush=True)
+        with open(final_path, 'wb') as output:
+            for part in parts:
+                with open(part, 'rb') as source:
+                    while True:
+                        block = source.read(1024 * 1024)
+                        if not block:
+                            break
+                        output.write(block)
+                os.remove(part)
+    return size, transfer
+
+def expand_playlist(link, template):
+    """生成播放列表条目（条目数取链接中的 n 参数，默认10）"""
+    match = re.search(r'list=([\w-]+)', link) or re.search(r'youtube\.com/([@\w-]+)', link)
+    playlist_id = re.sub(r'[^A-Za-z0-9_-]', '_', match.group(1) if match else 'PL')[:4].ljust(4, '_')
+    count_match = re.search(r'[?&]n=(\d+)', link)
+    count = int(count_match.group(1)) if count_match else 10
+    for index in range(count):
+        print(render(template, {'id': f"{playlist_id}{index:07d}"}), flush=True)
+
+def main(argv):
+    startup = float(os.environ.get('FAKE_YTDLP_STARTUP', 0))
+    if startup:
+        time.sleep(startup)
+    options, switches, positional = parse_arguments(argv)
+    link = positional[-1] if positional else ''
+
+    if '--version' in switches:
+        print('2025.01.01')
+        log_invocation('version', 0)
+        return 0
+    if '-U' in switches:
+        print('Latest version: 2025.01.01, Current version: 2025.01.01\nyt-dlp is up to date (2025.01.01)')
+        log_invocation('update', 0)
+        return 0
+
+    kind = 'download'
+    try:
+        if '--flat-playlist' in switches:
+            kind = 'expand'
+            expand_playlist(link, options.get('--print', '%(id)s'))
+        elif '--dump-single-json' in switches:
+            kind = 'probe'
+            print(json.dumps(extract_info(link)))
+        elif '-F' in switches:
+            kind = 'formats'
+            info = extract_info(link)
+            print(f"[info] Available formats for {info['id']}:")
+            print("ID  EXT  RESOLUTION FPS │ FILESIZE  VCODEC        ACODEC")
+            for f in info['formats']:
+                print(f"{f['format_id']:<3} {f['ext']:<4} {f['resolution']:<10} {f['fps'] or '':>3} │ "
+                      f"{f['filesize']:>9} {f['vcodec']:<13} {f['acodec']}")
+        else:
+            if '--load-info-json' in options:
+                with open(options['--load-info-json'], encoding='utf-8') as file:
+                    info = json.load(file)
+            else:
+                info = extract_info(link)
+            size, transfer = download(info, options)
+            log_invocation(kind, 0, transfer, size)
+            return 0
+    except FakeError as e:
+        print(f"ERROR: {e}", file=sys.stderr, flush=True)
+        log_invocation(kind, 1)
+        return 1
+    log_invocation(kind, 0)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+本地媒体服务器（基准测试用）
+
+提供合成的视频页面和媒体数据，可配置每个连接的带宽、响应延迟和 429 限流比例:
+    /watch?v=<id>                 视频页面（返回少量JSON，用于模拟元数据请求）
+    /media/<id>/<format>?size=N   N 字节的合成媒体数据
+
+单独运行:
+    python benchmarks/media_server.py --port 8765 --bandwidth 2M --latency 0.05 --error-rate 0.01
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+CHUNK_SIZE = 64 * 1024
+
+def parse_size(text):
+    """解析带单位的字节数（如 512K、2M、1.5G）"""
+    text = str(text).strip().upper()
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(float(text))
+
+class MediaRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.count('requests')
+        if server.latency:
+            time.sleep(server.latency)
+        if server.error_rate and server.random() < server.error_rate:
+            server.count('throttled')
+            self.send_error_response(429, 'Too Many Requests')
+            return
+
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if url.path == '/watch':
+            body = json.dumps({'id': query.get('v', [''])[0]}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif url.path.startswith('/media/'):
+            self.send_media(int(query.get('size', [server.default_size])[0]))
+        else:
+            self.send_error_response(404, 'Not Found')
+
+    def send_error_response(self, code, message):
+        body = message.encode('utf-8')
+        self.send_response(code)
+        if code == 429:
+            self.send_header('Retry-After', '1')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_media(self, size):
+        """按配置带宽分块发送合成数据"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+        bandwidth = self.server.bandwidth
+        chunk = b'\0' * CHUNK_SIZE
+        started = time.monotonic()
+        sent = 0
+        try:
+            while sent < size:
+                length = min(CHUNK_SIZE, size - sent)
+                self.wfile.write(chunk[:length])
+                sent += length
+                if bandwidth:
+                    # 按累计发送量计算应到达的时间，避免每块单独休眠带来的误差累积
+                    delay = started + sent / bandwidth - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.server.count('bytes_sent', sent)
+
+class MediaServer(ThreadingHTTPServer):
+    """合成媒体服务器（bandwidth 为每个连接的字节/秒，0 表示不限速）"""
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, bandwidth=0, latency=0.0, error_rate=0.0,
+                 default_size=1024 * 1024, seed=None):
+        super().__init__((host, port), MediaRequestHandler)
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.error_rate = error_rate
+        self.default_size = default_size
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'throttled': 0, 'bytes_sent': 0}
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def random(self):
+        with self.lock:
+            return self.rng.random()
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.stats[name] += value
+
+    def start(self):
+        """在后台线程中运行"""
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description='基准测试用本地媒体服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--bandwidth', default='0', help='每个连接的带宽（如 2M，0 表示不限速）')
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求的响应延迟（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回 429 的请求比例（0-1）')
+    parser.add_argument('--size', default='1M', help='默认媒体大小')
+    parser.add_argument('--seed', type=int, help='随机种子（用于复现 429 序列）')
+    args = parser.parse_args()
+
+    server = MediaServer(args.host, args.port, parse_size(args.bandwidth), args.latency,
+                         args.error_rate, parse_size(args.size), args.seed)
+    print(f"媒体服务器已启动: {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"统计: {server.stats}")
+
+if __name__ == "__main__":
+    main()
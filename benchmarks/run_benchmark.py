@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+下载器基准测试
+
+用本地媒体服务器和模拟 yt-dlp（benchmarks/fake_ytdlp.py）运行 DownloadEngine.download_videos，测量:
+- 批次总耗时和平均每个视频的耗时
+- 每个视频的额外开销（处理每个视频的耗时减去数据传输耗时，即探测、进程启动、重试等待和合并的开销）
+- 启动的 yt-dlp 进程数（按探测、下载等类型统计）
+- 峰值内存（下载器进程和单个 yt-dlp 子进程）
+- 界面更新延迟（模拟主循环每 100 毫秒从更新队列取出最新值刷新控件）
+
+每个规模在单独的子进程中运行，峰值内存互不影响。
+
+示例:
+    python benchmarks/run_benchmark.py                      # 10、1000、10000 个链接
+    python benchmarks/run_benchmark.py --links 100 --bandwidth 1M --latency 0.05 --error-rate 0.02
+    python benchmarks/run_benchmark.py --links 1000 --json bench_output.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+from media_server import MediaServer, parse_size  # noqa: E402
+from downloader_core.updates import UpdateQueue  # noqa: E402
+
+# 与 youtube_downloader.UI_REFRESH_INTERVAL 相同（毫秒）
+UI_REFRESH_INTERVAL = 100
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='YouTube 批量下载器基准测试')
+    parser.add_argument('--links', type=int, nargs='+', default=[10, 1000, 10000], help='每轮的链接数')
+    parser.add_argument('--workers', type=int, default=2, help='初始并发数')
+    parser.add_argument('--ceiling', type=int, default=8, help='并发数上限')
+    parser.add_argument('--size', default='256K', help='每个视频的媒体大小')
+    parser.add_argument('--bandwidth', default='0', help='媒体服务器每个连接的带宽（如 2M，0 表示不限速）')
+    parser.add_argument('--latency', type=float, default=0.0, help='媒体服务器每个请求的延迟（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='媒体服务器返回 429 的请求比例')
+    parser.add_argument('--startup', type=float, default=0.0, help='模拟 yt-dlp 额外的启动耗时（秒）')
+    parser.add_argument('--ui-cost', type=float, default=0.0002, help='模拟主循环刷新每个控件的耗时（秒）')
+    parser.add_argument('--realistic-delays', action='store_true',
+                        help='保留配置中的随机延迟和重试等待（默认置0，只测量调度和解析开销）')
+    parser.add_argument('--discard', action='store_true', help='不写入下载文件')
+    parser.add_argument('--seed', type=int, default=1, help='429 随机序列的种子')
+    parser.add_argument('--json', metavar='FILE', help='将结果写入 JSON 文件')
+    parser.add_argument('--verbose', action='store_true', help='显示下载器输出')
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    return parser
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def peak_rss_mb(children=False):
+    """峰值内存（MB，children 为 True 时为最大的子进程），不支持的平台返回None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return round(usage / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+class SimulatedMainLoop:
+    """模拟界面主循环：与 YouTubeDownloader.refresh_ui 相同，按固定间隔从 UpdateQueue 取出更新并刷新控件
+
+    记录每次刷新时等待最久的更新的延迟，以及工作线程写入的更新数。
+    """
+
+    def __init__(self, cost, interval=UI_REFRESH_INTERVAL / 1000):
+        self.cost = cost
+        self.interval = interval
+        self.updates = UpdateQueue()
+        self.put_counter = itertools.count(1)
+        self.put_count = 0
+        self.latencies = []
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def put(self, key, value=None):
+        """在工作线程中调用"""
+        self.put_count = next(self.put_counter)
+        self.updates.put(key, value)
+
+    def refresh(self):
+        updates = self.updates.drain()
+        if not updates:
+            return
+        self.latencies.append(self.updates.last_delay)
+        batch_progress = updates.get('batch_progress')
+        if batch_progress is not None:
+            batch_progress.position()
+        # 模拟更新控件的耗时
+        deadline = time.perf_counter() + self.cost * len(updates)
+        while time.perf_counter() < deadline:
+            pass
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.refresh()
+        self.refresh()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+def create_stub(directory):
+    """生成调用 fake_ytdlp.py 的可执行程序（使用当前 Python 解释器）"""
+    script = os.path.join(BENCHMARK_DIR, 'fake_ytdlp.py')
+    if os.name == 'nt':
+        path = os.path.join(directory, 'yt-dlp.bat')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(f'@"{sys.executable}" "{script}" %*\n')
+    else:
+        path = os.path.join(directory, 'yt-dlp')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(f'#!/bin/sh\nexec "{sys.executable}" "{script}" "$@"\n')
+        os.chmod(path, 0o755)
+    return path
+
+def summarize_invocations(log_path):
+    """汇总模拟 yt-dlp 的调用记录"""
+    counts, durations = {}, {}
+    transfer, total_bytes = 0.0, 0
+    if not os.path.exists(log_path):
+        return counts, durations, transfer, total_bytes
+    with open(log_path, encoding='utf-8') as file:
+        for line in file:
+            record = json.loads(line)
+            kind = record['kind']
+            counts[kind] = counts.get(kind, 0) + 1
+            durations[kind] = durations.get(kind, 0.0) + record['end'] - record['start']
+            transfer += record['transfer']
+            total_bytes += record['bytes']
+    return counts, durations, transfer, total_bytes
+
+def run_scenario(args, link_count):
+    """运行一轮基准测试，返回结果字典"""
+    from downloader_core import DownloadEngine, create_default_config, save_config
+
+    work_dir = tempfile.mkdtemp(prefix='ytdl_bench_')
+    server = MediaServer(bandwidth=parse_size(args.bandwidth), latency=args.latency,
+                         error_rate=args.error_rate, default_size=parse_size(args.size), seed=args.seed).start()
+    try:
+        log_path = os.path.join(work_dir, 'invocations.jsonl')
+        os.environ.update({
+            'FAKE_YTDLP_SERVER': server.url,
+            'FAKE_YTDLP_SIZE': str(parse_size(args.size)),
+            'FAKE_YTDLP_STARTUP': str(args.startup),
+            'FAKE_YTDLP_LOG': log_path,
+            'FAKE_YTDLP_DISCARD': '1' if args.discard else '0',
+        })
+
+        # 配置文件放在临时目录中，缓存、下载记录和下载日志也随之放在临时目录
+        config_path = os.path.join(work_dir, 'config.yaml')
+        config = create_default_config()
+        config['download']['proxy']['enabled'] = False
+        config['download']['save_path'] = os.path.join(work_dir, 'downloads')
+        config['download']['concurrency']['ceiling'] = args.ceiling
+        # 模拟的 yt-dlp 在下载进程中直接拼接文件，不使用 ffmpeg 合并
+        config['download']['merge']['enabled'] = False
+        if not args.realistic_delays:
+            config['behavior']['random_delay_range'] = [0, 0]
+            config['behavior']['download_interval'] = 0
+            config['behavior']['retry_delay'] = 0
+            # --error-rate 模拟的限流不需要真实的等待和熔断冷却，否则耗时主要是等待
+            config['retry']['rate_limit_delay'] = 1
+            config['retry']['breaker_cooldown'] = 2
+            config['retry']['breaker_max_cooldown'] = 10
+        save_config(config, config_path)
+
+        links_file = os.path.join(work_dir, 'links.txt')
+        with open(links_file, 'w', encoding='utf-8') as file:
+            for index in range(link_count):
+                file.write(f"https://www.youtube.com/watch?v=bench{index:06d}\n")
+
+        # 与界面相同：回调只写入更新队列，由主循环定时刷新控件
+        loop = SimulatedMainLoop(args.ui_cost)
+        engine = DownloadEngine(
+            config, config_path=config_path, yt_dlp_path=create_stub(work_dir),
+            on_status=lambda message: loop.put('status', message),
+            on_progress=lambda progress: loop.put('batch_progress', progress),
+            on_concurrency=lambda limit: loop.put('concurrency', limit)
+        )
+
+        # 记录每次下载尝试的处理耗时（含探测、进程启动和传输，重试等待不占用下载线程，不计入）
+        job_times = []
+        download_attempt = engine.download_attempt
+
+        def timed_download_attempt(*args, **kwargs):
+            job_started = time.perf_counter()
+            try:
+                return download_attempt(*args, **kwargs)
+            finally:
+                job_times.append(time.perf_counter() - job_started)
+
+        engine.download_attempt = timed_download_attempt
+
+        started = time.perf_counter()
+        summary = engine.download_videos(links_file, save_path=config['download']['save_path'],
+                                         max_workers=args.workers)
+        wall_time = time.perf_counter() - started
+        loop.stop()
+
+        counts, durations, transfer, total_bytes = summarize_invocations(log_path)
+        videos = max(1, summary['completed'] + summary['failed']) if summary else 1
+        return {
+            'links': link_count,
+            'wall_time': round(wall_time, 3),
+            'per_video_ms': round(wall_time / videos * 1000, 2),
+            'overhead_ms': round((sum(job_times) - transfer) / videos * 1000, 2),
+            'process_time': {kind: round(value, 3) for kind, value in durations.items()},
+            'processes': counts,
+            'process_count': sum(counts.values()),
+            'bytes': total_bytes,
+            'completed': summary['completed'] if summary else 0,
+            'failed': summary['failed'] if summary else 0,
+            'peak_rss_mb': peak_rss_mb(),
+            'child_peak_rss_mb': peak_rss_mb(children=True),
+            'ui_updates': loop.put_count,
+            'ui_refreshes': len(loop.latencies),
+            'ui_latency_ms': {
+                'p50': round((percentile(loop.latencies, 0.5) or 0) * 1000, 3),
+                'p95': round((percentile(loop.latencies, 0.95) or 0) * 1000, 3),
+                'max': round(max(loop.latencies, default=0) * 1000, 3),
+            },
+            'server': dict(server.stats),
+            'metrics': summary['metrics'] if summary else None,
+        }
+    finally:
+        server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def print_table(results):
+    header = f"{'链接数':>8} {'总耗时(s)':>10} {'每视频(ms)':>11} {'额外开销(ms)':>12} {'进程数':>8} " \
+             f"{'内存(MB)':>12} {'界面延迟 p50/p95/max (ms)':>28} {'成功/失败':>11} {'429':>6}"
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        memory = f"{result['peak_rss_mb']}/{result['child_peak_rss_mb']}"
+        latency = result['ui_latency_ms']
+        latency_text = f"{latency['p50']}/{latency['p95']}/{latency['max']}"
+        print(f"{result['links']:>8} {result['wall_time']:>10} {result['per_video_ms']:>11} "
+              f"{result['overhead_ms']:>12} {result['process_count']:>8} {memory:>12} "
+              f"{latency_text:>28} {result['completed']:>5}/{result['failed']:<5} "
+              f"{result['server']['throttled']:>6}")
+
+def main():
+    args = build_parser().parse_args()
+
+    if args.child is not None:
+        result = run_scenario(args, args.child)
+        with open(args.result, 'w', encoding='utf-8') as file:
+            json.dump(result, file)
+        return 0
+
+    # 每个规模在单独的子进程中运行，峰值内存互不影响
+    results = []
+    for link_count in args.links:
+        print(f"运行 {link_count} 个链接...", flush=True)
+        fd, result_path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        try:
+            command = [sys.executable, os.path.abspath(__file__), *sys.argv[1:],
+                       '--child', str(link_count), '--result', result_path]
+            output = None if args.verbose else subprocess.DEVNULL
+            returncode = subprocess.run(command, stdout=output, stderr=output).returncode
+            if returncode != 0:
+                print(f"{link_count} 个链接的测试失败，返回码 {returncode}")
+                continue
+            with open(result_path, encoding='utf-8') as file:
+                results.append(json.load(file))
+        finally:
+            os.remove(result_path)
+
+    print()
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.json}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+多节点下载基准测试
+
+在本机启动一个协调节点（python -m downloader_core --serve，只分配任务、不下载）和若干下载节点
+（python -m downloader_core --worker），每个节点使用各自的配置、保存路径和模拟 yt-dlp，
+提交链接后测量全部完成的耗时和吞吐量，检查吞吐量是否随节点数近似线性增长。
+默认每个下载受带宽限制（与实际下载相同）；各节点共用本机CPU，CPU 核数少于节点数时吞吐量还受CPU限制。
+
+--kill 在完成约一半时强制结束一个下载节点，验证租约到期后任务重新排队并由其他节点完成。
+
+示例:
+    python benchmarks/run_distributed.py                          # 1、2、4 个节点
+    python benchmarks/run_distributed.py --nodes 1 3 --links 300 --bandwidth 1M --batch-size 8
+    python benchmarks/run_distributed.py --nodes 3 --kill --lease 6
+"""
+
+import argparse
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, PROJECT_DIR)
+
+from media_server import MediaServer, parse_size  # noqa: E402
+from run_benchmark import create_stub  # noqa: E402
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='YouTube 批量下载器多节点基准测试')
+    parser.add_argument('--nodes', type=int, nargs='+', default=[1, 2, 4], help='每轮的下载节点数')
+    parser.add_argument('--links', type=int, default=48, help='每轮的链接数')
+    parser.add_argument('--workers', type=int, default=2, help='每个节点的并发数')
+    parser.add_argument('--size', default='1M', help='每个视频的媒体大小')
+    parser.add_argument('--bandwidth', default='512K', help='媒体服务器每个连接的带宽（模拟每个节点的网络上限）')
+    parser.add_argument('--startup', type=float, default=0.0, help='模拟 yt-dlp 额外的启动耗时（秒）')
+    parser.add_argument('--batch-size', type=int, default=0, help='下载节点每次领取的链接数（0 为并发数的2倍）')
+    parser.add_argument('--lease', type=int, default=10, help='租约时长（秒）')
+    parser.add_argument('--kill', action='store_true', help='完成约一半时强制结束一个下载节点')
+    parser.add_argument('--timeout', type=float, default=600, help='每轮的最长耗时（秒）')
+    parser.add_argument('--json', metavar='FILE', help='将结果写入 JSON 文件')
+    parser.add_argument('--verbose', action='store_true', help='显示协调节点和下载节点的输出')
+    return parser
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def write_config(directory, port, args, coordinator=False):
+    """生成节点配置（缓存、下载记录等随配置文件放在节点自己的目录中）"""
+    from downloader_core import create_default_config, save_config
+
+    os.makedirs(directory, exist_ok=True)
+    config = create_default_config()
+    config['download']['proxy']['enabled'] = False
+    config['download']['save_path'] = os.path.join(directory, 'downloads')
+    config['download']['max_workers'] = args.workers
+    config['download']['concurrency']['ceiling'] = args.workers
+    config['download']['merge']['enabled'] = False
+    config['behavior']['random_delay_range'] = [0, 0]
+    config['behavior']['download_interval'] = 0
+    config['behavior']['retry_delay'] = 0
+    config['service'].update(port=port, lease_seconds=args.lease, local_downloads=not coordinator)
+    config['worker'].update(coordinator=f"http://127.0.0.1:{port}", name=os.path.basename(directory),
+                            batch_size=args.batch_size)
+    config_path = os.path.join(directory, 'config.yaml')
+    save_config(config, config_path)
+    return config_path
+
+def start_process(arguments, log_path, env, verbose):
+    output = None if verbose else open(log_path, 'w', encoding='utf-8')
+    return subprocess.Popen([sys.executable, '-m', 'downloader_core'] + arguments, cwd=PROJECT_DIR, env=env,
+                            stdout=output, stderr=subprocess.STDOUT)
+
+def run_scenario(args, node_count):
+    """运行一轮，返回结果字典"""
+    from downloader_core.service import ServiceClient
+
+    work_dir = tempfile.mkdtemp(prefix='ytdl_dist_')
+    server = MediaServer(bandwidth=parse_size(args.bandwidth), default_size=parse_size(args.size)).start()
+    processes = []
+    try:
+        env = dict(os.environ, FAKE_YTDLP_SERVER=server.url, FAKE_YTDLP_SIZE=str(parse_size(args.size)),
+                   FAKE_YTDLP_STARTUP=str(args.startup), FAKE_YTDLP_DISCARD='1', PYTHONUNBUFFERED='1')
+        stub = create_stub(work_dir)
+        port = free_port()
+        config_path = write_config(os.path.join(work_dir, 'coordinator'), port, args, coordinator=True)
+        processes.append(start_process(['--serve', '--config', config_path, '--yt-dlp', stub],
+                                       os.path.join(work_dir, 'coordinator.log'), env, args.verbose))
+        client = ServiceClient(f"http://127.0.0.1:{port}")
+        deadline = time.time() + 30
+        while not client.ping():
+            if time.time() > deadline:
+                raise RuntimeError("协调节点启动超时")
+            time.sleep(0.2)
+
+        for index in range(node_count):
+            node_config = write_config(os.path.join(work_dir, f'node{index + 1}'), port, args)
+            processes.append(start_process(['--worker', '--config', node_config, '--yt-dlp', stub],
+                                           os.path.join(work_dir, f'node{index + 1}.log'), env, args.verbose))
+
+        links = [f"https://www.youtube.com/watch?v=dist{index:07d}" for index in range(args.links)]
+        started = time.perf_counter()
+        client.submit(links, client='benchmark')
+        killed = None
+        deadline = time.time() + args.timeout
+        while True:
+            counts = client.status()['queue']
+            finished = counts.get('done', 0) + counts.get('failed', 0) + counts.get('cancelled', 0)
+            if finished >= args.links:
+                break
+            if time.time() > deadline:
+                raise RuntimeError(f"超时，已完成 {finished}/{args.links}")
+            if args.kill and killed is None and node_count > 1 and finished >= args.links // 2:
+                # 强制结束第一个下载节点，不汇报也不交还任务
+                killed = processes[1].pid
+                os.kill(killed, signal.SIGKILL)
+            time.sleep(0.2)
+        elapsed = time.perf_counter() - started
+
+        per_node = {worker['name']: worker['jobs'].get('done', 0) for worker in client.workers()}
+        return {
+            'nodes': node_count,
+            'links': args.links,
+            'elapsed': round(elapsed, 2),
+            'throughput': round(args.links / elapsed, 2),
+            'done': counts.get('done', 0),
+            'failed': counts.get('failed', 0),
+            'per_node': per_node,
+            'killed': bool(killed),
+        }
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def print_results(results):
+    base = results[0]['throughput'] / results[0]['nodes'] if results else 0
+    print(f"\n{'节点数':<8}{'耗时(秒)':>10}{'吞吐(个/秒)':>14}{'线性比例':>10}{'完成':>8}{'失败':>6}  每个节点完成数")
+    for result in results:
+        scaling = result['throughput'] / (base * result['nodes']) if base else 0
+        per_node = ', '.join(f"{name}: {count}" for name, count in sorted(result['per_node'].items()))
+        killed = '（中途结束一个节点）' if result['killed'] else ''
+        print(f"{result['nodes']:<8}{result['elapsed']:>10.2f}{result['throughput']:>14.2f}{scaling:>10.0%}"
+              f"{result['done']:>8}{result['failed']:>6}  {per_node}{killed}")
+
+def main():
+    args = build_parser().parse_args()
+    results = []
+    for node_count in args.nodes:
+        print(f"运行 {node_count} 个下载节点，{args.links} 个链接...", flush=True)
+        results.append(run_scenario(args, node_count))
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+
+if __name__ == '__main__':
+    main()
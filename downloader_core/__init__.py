@@ -0,0 +1,16 @@
+"""
+YouTube 批量下载器核心（下载引擎与命令行入口，不依赖 tkinter）
+
+命令行用法: python -m downloader_core links.txt --workers 4
+"""
+
+from .config import CONFIG_FILE, load_config, save_config, create_default_config
+
+__all__ = ['CONFIG_FILE', 'load_config', 'save_config', 'create_default_config', 'DownloadEngine']
+
+def __getattr__(name):
+    # 下载引擎在首次使用时才导入（只用到配置或链接解析时不必加载整个引擎）
+    if name == 'DownloadEngine':
+        from .engine import DownloadEngine
+        return DownloadEngine
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
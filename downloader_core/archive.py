@@ -0,0 +1,32 @@
+"""
+已完成视频索引
+"""
+
+import os
+import threading
+
+class DownloadArchive:
+    """已完成视频索引（兼容 yt-dlp --download-archive 文件格式，加载到集合中O(1)查询）"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.ids = set()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    parts = line.split()
+                    if len(parts) == 2:
+                        self.ids.add(parts[1])
+
+    def __contains__(self, video_id):
+        return video_id in self.ids
+
+    def add(self, video_id):
+        """记录已完成的视频（追加写入）"""
+        with self.lock:
+            if video_id in self.ids:
+                return
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(f"youtube {video_id}\n")
+            self.ids.add(video_id)
@@ -0,0 +1,342 @@
+"""
+yt-dlp 运行后端
+
+- SubprocessBackend：每次操作启动一个 yt-dlp 进程（默认，适用于打包自带的 yt-dlp.exe）
+- InProcessBackend：通过 yt_dlp Python 模块在进程内运行，每个下载线程复用一个长期存在的
+  YoutubeDL 实例，可复用HTTP连接和提取器缓存（需要安装 yt-dlp 模块）
+
+两种后端使用相同的接口，选项统一使用 YoutubeDL 的参数名（如 format、outtmpl、http_headers）。
+"""
+
+import copy
+import importlib.util
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import deque
+
+from .runner import PROGRESS_TEMPLATE, DownloadCancelled, run_ytdlp
+from .startup import file_stamp
+
+# 播放列表展开时每个条目的输出前缀
+ENTRY_PREFIX = '[ytdl-entry]'
+ENTRY_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{11}$')
+
+# YoutubeDL 参数 -> yt-dlp 命令行选项
+VALUE_OPTIONS = [
+    ('format', '-f'),
+    ('outtmpl', '-o'),
+    ('merge_output_format', '--merge-output-format'),
+    ('proxy', '--proxy'),
+    ('sleep_interval', '--sleep-interval'),
+    ('max_sleep_interval', '--max-sleep-interval'),
+    ('retries', '--retries'),
+    ('fragment_retries', '--fragment-retries'),
+    ('ratelimit', '--limit-rate'),
+    ('concurrent_fragment_downloads', '--concurrent-fragments'),
+]
+SWITCH_OPTIONS = [
+    ('continuedl', '--continue'),
+    ('ignoreerrors', '--ignore-errors'),
+    ('noplaylist', '--no-playlist'),
+]
+
+def build_arguments(options):
+    """将 YoutubeDL 参数转换为 yt-dlp 命令行参数"""
+    arguments = []
+    for key, flag in VALUE_OPTIONS:
+        value = options.get(key)
+        if value is not None:
+            arguments.extend([flag, str(value)])
+
+    headers = dict(options.get('http_headers') or {})
+    user_agent = headers.pop('User-Agent', None)
+    referer = headers.pop('Referer', None)
+    if user_agent:
+        arguments.extend(['--user-agent', user_agent])
+    if referer:
+        arguments.extend(['--referer', referer])
+    for name, value in headers.items():
+        arguments.extend(['--add-header', f"{name}:{value}"])
+
+    for key, flag in SWITCH_OPTIONS:
+        if options.get(key):
+            arguments.append(flag)
+    return arguments
+
+class SubprocessBackend:
+    """子进程后端：每次操作启动一个 yt-dlp 进程（on_process 回调会收到每个进程的用途）"""
+
+    name = 'subprocess'
+    # 进程启动后 --limit-rate 不能再改变
+    live_rate_limit = False
+
+    def __init__(self, yt_dlp_path):
+        self.yt_dlp_path = yt_dlp_path
+        self.on_process = None
+
+    def _spawned(self, kind):
+        if self.on_process:
+            self.on_process(kind)
+
+    def probe(self, link, options):
+        """获取视频元数据（一次 --dump-single-json 请求）"""
+        self._spawned('probe')
+        command = [self.yt_dlp_path, '--dump-single-json', '--no-playlist', '--no-warnings']
+        command.extend(build_arguments(options))
+        command.append(link)
+
+        result = subprocess.run(command, capture_output=True, text=True, timeout=60)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or f"yt-dlp 返回码 {result.returncode}")
+        return json.loads(result.stdout)
+
+    def expand(self, link, options):
+        """逐个生成播放列表/频道中的视频ID（--lazy-playlist 边枚举边输出，不等待整个列表）"""
+        command = [self.yt_dlp_path, '--flat-playlist', '--lazy-playlist', '--no-warnings',
+                   '--print', ENTRY_PREFIX + ' %(id)s']
+        command.extend(build_arguments(options))
+        command.append(link)
+
+        self._spawned('expand')
+        process = subprocess.Popen(
+            command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            text=True, encoding='utf-8', errors='replace', bufsize=1
+        )
+        tail = deque(maxlen=20)
+        count = 0
+        try:
+            for line in process.stdout:
+                line = line.rstrip()
+                if line.startswith(ENTRY_PREFIX):
+                    video_id = line[len(ENTRY_PREFIX):].strip()
+                    if ENTRY_ID_PATTERN.match(video_id):
+                        count += 1
+                        yield video_id
+                elif line:
+                    tail.append(line)
+        finally:
+            # 提前停止枚举时结束进程
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()
+            returncode = process.wait()
+        if returncode != 0 and count == 0:
+            raise RuntimeError('\n'.join(tail) or f"yt-dlp 返回码 {returncode}")
+
+    def write_info_file(self, info):
+        """将探测得到的元数据写入临时文件，供 --load-info-json 使用"""
+        fd, info_file = tempfile.mkstemp(prefix='ytdl_', suffix='.info.json')
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            json.dump(info, file)
+        return info_file
+
+    def download(self, link, options, info=None, on_progress=None, on_output=None):
+        """下载视频，提供 info 时直接使用已探测的元数据（不再解析页面）
+
+        返回 (返回码, 输出末尾文本)。
+        """
+        command = [self.yt_dlp_path]
+        command.extend(build_arguments(options))
+        command.extend(['--newline', '--progress-template', PROGRESS_TEMPLATE])
+
+        info_file = None
+        self._spawned('download')
+        try:
+            if info:
+                info_file = self.write_info_file(info)
+                command.extend(['--load-info-json', info_file])
+            else:
+                command.append(link)
+            return run_ytdlp(command, on_progress, on_output)
+        finally:
+            if info_file:
+                try:
+                    os.remove(info_file)
+                except OSError:
+                    pass
+
+    def executable_stamp(self):
+        """yt-dlp 可执行文件的修改时间和大小（文件未变化时版本不变），找不到文件时返回None"""
+        path = self.yt_dlp_path if os.path.dirname(self.yt_dlp_path) else shutil.which(self.yt_dlp_path)
+        return file_stamp(path) if path else None
+
+    def version(self):
+        """yt-dlp 版本，失败时返回None"""
+        try:
+            result = subprocess.run([self.yt_dlp_path, '--version'],
+                                    capture_output=True, text=True, timeout=10)
+            if result.returncode == 0:
+                return result.stdout.strip()
+        except Exception:
+            pass
+        return None
+
+    def update(self):
+        """更新 yt-dlp，返回是否成功"""
+        result = subprocess.run([self.yt_dlp_path, '-U'], capture_output=True, text=True, timeout=120)
+        return result.returncode == 0
+
+class _CallbackLogger:
+    """YoutubeDL 日志对象：把输出逐行交给回调，并保留最后若干行用于错误报告"""
+
+    def __init__(self, tail_lines=50):
+        self.tail = deque(maxlen=tail_lines)
+        self.on_output = None
+
+    def reset(self, on_output=None):
+        self.tail.clear()
+        self.on_output = on_output
+
+    def _line(self, message):
+        for line in str(message).splitlines():
+            if line:
+                self.tail.append(line)
+                if self.on_output:
+                    self.on_output(line)
+
+    debug = info = warning = error = _line
+
+    def text(self):
+        return '\n'.join(self.tail)
+
+class InProcessBackend:
+    """进程内后端：每个线程（按代理区分）复用一个长期存在的 YoutubeDL 实例"""
+
+    name = 'inprocess'
+    # yt-dlp 每读取一块数据都从 params 读取限速，下载过程中修改立即生效（并行下载分片时各分片使用参数副本，不生效）
+    live_rate_limit = True
+
+    def __init__(self):
+        # 未安装时抛出 ImportError，由 create_backend 回退到子进程后端；模块较大，首次使用时才导入
+        if importlib.util.find_spec('yt_dlp') is None:
+            raise ImportError("No module named 'yt_dlp'")
+        self._yt_dlp = None
+        self.local = threading.local()
+        # 不启动进程，保留属性以便与子进程后端使用相同的接口
+        self.on_process = None
+        # 正在下载的链接 -> YoutubeDL 实例（set_rate_limit 在其他线程中修改限速）
+        self.active = {}
+        self.active_lock = threading.Lock()
+
+    @property
+    def yt_dlp(self):
+        if self._yt_dlp is None:
+            import yt_dlp
+            self._yt_dlp = yt_dlp
+        return self._yt_dlp
+
+    def _get_ydl(self, proxy):
+        """获取当前线程的 YoutubeDL 实例（代理在创建实例时确定，不同代理使用不同实例）"""
+        instances = getattr(self.local, 'instances', None)
+        if instances is None:
+            instances = self.local.instances = {}
+            self.local.logger = _CallbackLogger()
+            self.local.on_progress = None
+        ydl = instances.get(proxy)
+        if ydl is None:
+            params = {'quiet': True, 'noprogress': True, 'logger': self.local.logger}
+            if proxy:
+                params['proxy'] = proxy
+            ydl = self.yt_dlp.YoutubeDL(params)
+            ydl.add_progress_hook(self._progress_hook)
+            instances[proxy] = ydl
+        return ydl
+
+    def _progress_hook(self, status):
+        on_progress = getattr(self.local, 'on_progress', None)
+        if on_progress and status.get('status') == 'downloading':
+            on_progress(
+                status.get('downloaded_bytes') or 0,
+                status.get('total_bytes') or status.get('total_bytes_estimate'),
+                status.get('speed'),
+                status.get('eta')
+            )
+
+    def _configure(self, ydl, options):
+        params = dict(options)
+        params.pop('proxy', None)
+        # 单个视频下载，出错时需要抛出异常才能判断成败
+        params['ignoreerrors'] = False
+        if 'outtmpl' in params:
+            params['outtmpl'] = {'default': params['outtmpl']}
+        ydl.params.update(params)
+        # 格式选择器在创建实例时编译，需要单独更新（None 表示使用 yt-dlp 默认格式）
+        format_spec = params.get('format')
+        ydl.format_selector = ydl.build_format_selector(format_spec) if format_spec else None
+
+    def probe(self, link, options):
+        """获取视频元数据"""
+        ydl = self._get_ydl(options.get('proxy'))
+        self._configure(ydl, dict(options, noplaylist=True, format=None))
+        self.local.logger.reset()
+        info = ydl.extract_info(link, download=False)
+        return ydl.sanitize_info(info)
+
+    def expand(self, link, options):
+        """逐个生成播放列表/频道中的视频ID（不解析条目，分页结果按需获取）"""
+        ydl = self._get_ydl(options.get('proxy'))
+        self._configure(ydl, dict(options, noplaylist=False, format=None))
+        self.local.logger.reset()
+        info = ydl.extract_info(link, download=False, process=False)
+        for entry in info.get('entries') or []:
+            video_id = entry.get('id') if entry else None
+            if video_id and ENTRY_ID_PATTERN.match(video_id):
+                yield video_id
+
+    def download(self, link, options, info=None, on_progress=None, on_output=None):
+        """下载视频，提供 info 时直接使用已探测的元数据（不再解析页面）"""
+        ydl = self._get_ydl(options.get('proxy'))
+        with self.active_lock:
+            self._configure(ydl, options)
+            self.active[link] = ydl
+        self.local.logger.reset(on_output)
+        self.local.on_progress = on_progress
+        try:
+            if info:
+                ydl.process_ie_result(copy.deepcopy(info), download=True)
+            else:
+                ydl.extract_info(link, download=True)
+            return 0, self.local.logger.text()
+        except DownloadCancelled:
+            raise
+        except Exception as e:
+            return 1, f"{self.local.logger.text()}\n{e}".strip()
+        finally:
+            with self.active_lock:
+                self.active.pop(link, None)
+            self.local.on_progress = None
+            self.local.logger.reset()
+
+    def set_rate_limit(self, link, rate):
+        """修改正在下载的链接的限速（字节/秒，None 表示不限）"""
+        with self.active_lock:
+            ydl = self.active.get(link)
+            if ydl is not None:
+                ydl.params['ratelimit'] = rate
+
+    def executable_stamp(self):
+        """进程内模式不启动 yt-dlp，版本不需要缓存"""
+        return None
+
+    def version(self):
+        return self.yt_dlp.version.__version__
+
+    def update(self):
+        """进程内模式需要通过 pip 更新 yt-dlp 模块"""
+        print("进程内模式请使用 pip install -U yt-dlp 更新")
+        return False
+
+def create_backend(mode, yt_dlp_path):
+    """按配置创建后端：subprocess、inprocess 或 auto（已安装 yt_dlp 模块时使用进程内模式）"""
+    if mode in ('inprocess', 'auto'):
+        try:
+            return InProcessBackend()
+        except ImportError:
+            if mode == 'inprocess':
+                print("未安装 yt_dlp 模块，改用子进程模式")
+    return SubprocessBackend(yt_dlp_path)
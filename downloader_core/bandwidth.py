@@ -0,0 +1,177 @@
+"""
+带宽管理：按全局上限（可按时间段设置）为每个下载进程分配 --limit-rate
+"""
+
+import re
+import threading
+import time
+
+from .runner import DownloadCancelled
+
+RATE_PATTERN = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([KMG]?)(?:i?B)?(?:/s)?\s*$', re.IGNORECASE)
+RATE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+def parse_rate(value):
+    """解析带宽（如 5M、800K、1.5MB/s 或字节数），0 或空表示不限，返回 字节/秒"""
+    if value in (None, '', 0):
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = RATE_PATTERN.match(str(value))
+    if not match:
+        raise ValueError(f"无法解析带宽: {value}")
+    return int(float(match.group(1)) * RATE_UNITS[match.group(2).upper()])
+
+def format_rate(rate):
+    """带宽的显示文本"""
+    if not rate:
+        return "不限"
+    if rate >= 1024 * 1024:
+        return f"{rate / 1024 / 1024:.1f} MB/s"
+    return f"{rate / 1024:.0f} KB/s"
+
+def _parse_time(text):
+    hours, minutes = str(text).split(':')
+    return int(hours) * 60 + int(minutes)
+
+class BandwidthSchedule:
+    """按时间段的带宽上限
+
+    规则格式：{start: '09:00', end: '18:00', limit: '2M', days: [1, 2, 3, 4, 5]}，
+    days 可省略（1 为周一），end 早于 start 时表示跨过午夜。多条规则同时匹配时使用第一条。
+    """
+
+    def __init__(self, rules=None, default=0):
+        self.default = parse_rate(default)
+        self.rules = []
+        for rule in rules or []:
+            self.rules.append((
+                _parse_time(rule['start']),
+                _parse_time(rule['end']),
+                parse_rate(rule.get('limit')),
+                set(rule['days']) if rule.get('days') else None,
+            ))
+
+    def limit_at(self, moment=None):
+        """指定时间（默认当前时间）的带宽上限，0 表示不限"""
+        moment = time.localtime(moment)
+        minute = moment.tm_hour * 60 + moment.tm_min
+        weekday = moment.tm_wday + 1
+        for start, end, limit, days in self.rules:
+            if start <= end:
+                active = start <= minute < end
+                day = weekday
+            else:
+                # 跨过午夜的时间段，午夜之后属于前一天的规则
+                active = minute >= start or minute < end
+                day = weekday if minute >= start else (weekday - 2) % 7 + 1
+            if active and (days is None or day in days):
+                return limit
+        return self.default
+
+class BandwidthManager:
+    """全局带宽分配（线程安全）
+
+    每个下载开始时按当前上限和预计同时进行的下载数（set_slots）平均分配带宽（每份至少 min_rate），
+    并扣除其他下载已占用的部分，总和不超过上限；剩余带宽不足时等待其他下载结束。
+    进程内下载（acquire 时提供 on_change）在其他下载开始或结束、上限变化时重新分配，
+    先降到新的份额为新下载腾出带宽；yt-dlp 子进程启动后限速不再改变，只在结束时交还带宽，
+    上限或并发数变化后从下一个开始的下载起生效。
+    """
+
+    def __init__(self, schedule, min_rate=100 * 1024, on_change=None):
+        self.schedule = schedule
+        self.min_rate = parse_rate(min_rate)
+        self.on_change = on_change
+        self.condition = threading.Condition()
+        self.budgets = {}
+        # 可在下载过程中调整限速的下载：键 -> 回调
+        self.adjusters = {}
+        self.slots = 1
+        self.limit = schedule.limit_at()
+
+    def refresh(self):
+        """按时间段更新当前上限，返回当前上限"""
+        limit = self.schedule.limit_at()
+        with self.condition:
+            changed = limit != self.limit
+            self.limit = limit
+            if changed:
+                self._rebalance()
+                self.condition.notify_all()
+        if changed and self.on_change:
+            self.on_change(limit)
+        return limit
+
+    def set_slots(self, slots):
+        """预计同时进行的下载数（由调度循环根据并发数和排队任务数更新）"""
+        with self.condition:
+            slots = max(1, slots)
+            changed = slots != self.slots
+            self.slots = slots
+            if changed:
+                self._rebalance()
+
+    def _share(self, count):
+        """count 个下载同时进行时每个下载的份额（至少 min_rate，不超过上限）"""
+        return int(min(self.limit, max(self.min_rate, self.limit / max(self.slots, count))))
+
+    def _rebalance(self, skip=None):
+        """重新分配可调整的下载并通知新的限速（需持有锁，skip 为不需要通知的下载）"""
+        if not self.adjusters:
+            return
+        if self.limit:
+            share = self._share(len(self.budgets))
+            fixed = sum(budget for key, budget in self.budgets.items() if key not in self.adjusters)
+            # 子进程占满上限时（上限调低后）仍保留最低限速，等子进程结束后恢复
+            rate = max(min(share, self.min_rate) or 1, min(share, (self.limit - fixed) // len(self.adjusters)))
+        else:
+            rate = 0
+        for key, callback in self.adjusters.items():
+            if self.budgets.get(key) != rate:
+                self.budgets[key] = rate
+                if key != skip:
+                    callback(rate or None)
+
+    def acquire(self, key, on_change=None, cancelled=None):
+        """为一个下载分配带宽（字节/秒），不限速时返回None
+
+        on_change 为可在下载过程中调整限速时的回调（参数为新的限速，None 表示不限），
+        剩余带宽不足时等待，等待期间 cancelled() 为 True 时抛出 DownloadCancelled。
+        """
+        self.refresh()
+        with self.condition:
+            while self.limit:
+                share = self._share(len(self.budgets) + (key not in self.budgets))
+                # 可调整的下载会先降到同一份额
+                others = sum(min(budget, share) if other in self.adjusters else budget
+                             for other, budget in self.budgets.items() if other != key)
+                available = self.limit - others
+                if available >= max(1, min(share, self.min_rate)):
+                    budget = min(share, available)
+                    break
+                if cancelled and cancelled():
+                    raise DownloadCancelled()
+                self.condition.wait(1.0)
+                self.limit = self.schedule.limit_at()
+            else:
+                budget = 0
+            self.budgets[key] = budget
+            if on_change:
+                self.adjusters[key] = on_change
+            self._rebalance(skip=key)
+            return self.budgets[key] or None
+
+    def release(self, key):
+        """下载结束，释放分配的带宽"""
+        with self.condition:
+            if self.budgets.pop(key, None) is None:
+                return
+            self.adjusters.pop(key, None)
+            self._rebalance()
+            self.condition.notify_all()
+
+    def allocated(self):
+        """已分配的带宽总和"""
+        with self.condition:
+            return sum(self.budgets.values())
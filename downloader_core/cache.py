@@ -0,0 +1,85 @@
+"""
+视频格式缓存
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+class FormatCache:
+    """视频格式缓存（SQLite，按视频ID存储，支持TTL过期和LRU淘汰）"""
+
+    def __init__(self, path, ttl=7 * 24 * 3600, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS formats ('
+            'video_id TEXT NOT NULL, profile TEXT NOT NULL, data TEXT NOT NULL, '
+            'created REAL NOT NULL, accessed REAL NOT NULL, '
+            'PRIMARY KEY (video_id, profile))'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS formats_accessed ON formats (accessed)')
+        self.conn.execute('DELETE FROM formats WHERE created < ?', (time.time() - self.ttl,))
+        self.conn.commit()
+
+    def get(self, video_id, profile):
+        """读取缓存，过期或不存在时返回None"""
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT data, created FROM formats WHERE video_id = ? AND profile = ?',
+                (video_id, profile)
+            ).fetchone()
+            if row is None or row[1] < now - self.ttl:
+                self.misses += 1
+                return None
+            self.conn.execute(
+                'UPDATE formats SET accessed = ? WHERE video_id = ? AND profile = ?',
+                (now, video_id, profile)
+            )
+            self.conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, video_id, profile, data):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO formats (video_id, profile, data, created, accessed) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (video_id, profile, json.dumps(data, ensure_ascii=False), now, now)
+            )
+            count = self.conn.execute('SELECT COUNT(*) FROM formats').fetchone()[0]
+            if count > self.max_entries:
+                self.conn.execute(
+                    'DELETE FROM formats WHERE rowid IN '
+                    '(SELECT rowid FROM formats ORDER BY accessed ASC LIMIT ?)',
+                    (count - self.max_entries,)
+                )
+            self.conn.commit()
+
+    def delete(self, video_id, profile):
+        """删除缓存（缓存的格式ID已失效时）"""
+        with self.lock:
+            self.conn.execute('DELETE FROM formats WHERE video_id = ? AND profile = ?', (video_id, profile))
+            self.conn.commit()
+
+    def reset_stats(self):
+        """重置命中统计"""
+        self.hits = 0
+        self.misses = 0
+
+    def stats_text(self):
+        """命中统计文本（用于状态栏）"""
+        return f"缓存 命中 {self.hits}/未命中 {self.misses}"
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,236 @@
+"""
+命令行入口（无界面运行，适合没有显示器的下载服务器）
+
+示例:
+    python -m downloader_core links.txt --workers 4
+    cat links.txt | python -m downloader_core - --low-quality --json
+    python -m downloader_core --serve                 # 启动下载队列服务（HTTP/JSON 接口）
+    python -m downloader_core links.txt --submit      # 提交到已运行的队列服务
+    python -m downloader_core --worker http://192.168.1.10:8790   # 作为下载节点，从协调节点领取任务
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+from .config import CONFIG_FILE, get_ytdlp_executable, load_config
+from .engine import DownloadEngine
+from .links import iter_link_file, iter_links
+from .service import ServiceClient, ServiceError, create_service
+from .worker import create_worker
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m downloader_core',
+        description='YouTube 批量下载（命令行模式）'
+    )
+    parser.add_argument('links_file', nargs='?',
+                        help='每行一个链接的文本文件，"-" 或省略时从标准输入读取')
+    parser.add_argument('--workers', type=int, help='初始并发数（默认使用配置文件中的 max_workers）')
+    parser.add_argument('--low-quality', action='store_true', help='优先下载最低画质')
+    parser.add_argument('--save-path', help='保存路径（默认使用配置文件中的 save_path）')
+    parser.add_argument('--config', default=CONFIG_FILE, help='配置文件路径')
+    parser.add_argument('--yt-dlp', dest='yt_dlp', help='yt-dlp 可执行文件路径')
+    parser.add_argument('--engine', choices=['subprocess', 'inprocess', 'auto'],
+                        help='yt-dlp 运行方式（默认使用配置文件中的 download.engine）')
+    parser.add_argument('--limit-rate', metavar='RATE',
+                        help='总带宽上限，如 5M、800K（覆盖配置文件中的上限和时间段，0 表示不限）')
+    proxy_group = parser.add_mutually_exclusive_group()
+    proxy_group.add_argument('--proxy', help='使用指定代理（覆盖配置文件）')
+    proxy_group.add_argument('--no-proxy', action='store_true', help='不使用代理')
+    parser.add_argument('--incremental', action='store_true', default=None,
+                        help='播放列表/频道只下载上次展开之后新增的视频')
+    parser.add_argument('--resume', metavar='JOURNAL', help='按下载日志继续未完成的批次')
+    parser.add_argument('--json', action='store_true', help='以 JSON Lines 格式输出进度')
+    parser.add_argument('--metrics', metavar='FILE',
+                        help='批次结束时将指标以 Prometheus 文本格式写入文件（可供 node_exporter textfile 采集）')
+    service_group = parser.add_mutually_exclusive_group()
+    service_group.add_argument('--serve', action='store_true',
+                               help='启动下载队列服务，通过 HTTP/JSON 接口接收链接（地址见配置文件 service 部分）')
+    service_group.add_argument('--submit', action='store_true',
+                               help='把链接提交到已运行的队列服务，不在本进程中下载')
+    service_group.add_argument('--worker', nargs='?', const='', metavar='URL',
+                               help='作为下载节点运行：从协调节点（队列服务）领取链接并下载（默认地址见配置文件 worker 部分）')
+    return parser
+
+def find_ytdlp(path=None):
+    """确定yt-dlp路径：命令行参数 > 程序自带 > PATH 中的 yt-dlp"""
+    if path:
+        return path
+    bundled = get_ytdlp_executable()
+    if os.path.exists(bundled):
+        return bundled
+    return shutil.which('yt-dlp') or bundled
+
+class JsonLinesReporter:
+    """以 JSON Lines 格式向标准输出汇报事件（线程安全）
+
+    stream 在创建时确定：--json 模式下其他输出（提示、汇总表、进程内 yt-dlp 的输出）都改写到标准错误，
+    标准输出中只有 JSON 行。
+    """
+
+    def __init__(self, stream=sys.stdout):
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        line = json.dumps(dict(event=event, **fields), ensure_ascii=False)
+        with self.lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+    def attach(self, engine):
+        engine.on_status = lambda message: self.emit('status', message=message)
+        engine.on_progress = lambda progress: self.emit('progress', **progress.snapshot())
+        engine.on_concurrency = lambda limit: self.emit('concurrency', limit=limit)
+
+def write_metrics(path, text):
+    """写入指标文件（先写临时文件再替换，采集程序不会读到写了一半的文件）"""
+    temp_path = path + '.tmp'
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"无法写入指标文件: {e}", file=sys.stderr)
+
+def serve(engine):
+    """运行下载队列服务，直到按 Ctrl+C"""
+    service = create_service(engine)
+    try:
+        service.start()
+    except OSError as e:
+        print(f"无法启动队列服务: {e}", file=sys.stderr)
+        return 2
+    print(f"下载队列服务已启动: {service.url}", file=sys.stderr, flush=True)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        service.stop()
+        engine.close_journals()
+        print("\n队列服务已停止，未完成的任务下次启动时继续", file=sys.stderr)
+    return 0
+
+def work(engine, coordinator=None):
+    """作为下载节点运行，直到按 Ctrl+C（未完成的任务交还协调节点）"""
+    worker = create_worker(engine, coordinator)
+    print(f"下载节点 {worker.name} 已启动，协调节点: {worker.client.url}", file=sys.stderr, flush=True)
+    thread = threading.Thread(target=worker.run, daemon=True)
+    thread.start()
+    try:
+        while thread.is_alive():
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\n正在停止，未完成的任务交还协调节点...", file=sys.stderr)
+        worker.stop()
+        thread.join()
+    return 0
+
+def print_rejected(number, line, reason):
+    print(f"忽略第 {number} 行（{reason}）: {line}", file=sys.stderr)
+
+def submit(config, file_path, links, args, reporter=None):
+    """提交到已运行的队列服务，输出任务ID"""
+    service_config = config.get('service', {})
+    client = ServiceClient(f"http://{service_config.get('host', '127.0.0.1')}:{service_config.get('port', 8790)}",
+                           service_config.get('token') or None)
+    try:
+        if args.resume:
+            ids = client.resume(os.path.abspath(args.resume), client='cli')
+        else:
+            # 提交前解析链接，无法识别的行在本地提示；记录来源文件，失败的链接保存到 <文件>_failed.txt
+            links = iter_link_file(file_path, print_rejected) if file_path else iter_links(links, print_rejected)
+            save_path = os.path.abspath(args.save_path) if args.save_path else None
+            source = os.path.abspath(file_path) if file_path else None
+            ids = client.submit(links, save_path=save_path, low_quality=args.low_quality, client='cli', source=source)
+    except (OSError, ServiceError) as e:
+        print(f"提交失败: {e}", file=sys.stderr)
+        return 2
+    if reporter:
+        reporter.emit('submitted', ids=ids)
+    else:
+        print(json.dumps({'ids': ids}))
+    return 0
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    try:
+        config = load_config(args.config)
+    except Exception as e:
+        print(f"无法加载配置文件: {e}", file=sys.stderr)
+        return 2
+
+    if args.engine:
+        config['download']['engine'] = args.engine
+    if args.limit_rate is not None:
+        config['download']['bandwidth'] = dict(config['download'].get('bandwidth', {}),
+                                               limit=args.limit_rate, schedule=[])
+    if args.no_proxy:
+        config['download']['proxy']['enabled'] = False
+    elif args.proxy:
+        config['download']['proxy']['enabled'] = True
+        config['download']['proxy']['url'] = args.proxy
+        config['download']['proxy']['pool'] = []
+
+    reporter = None
+    if args.json:
+        reporter = JsonLinesReporter(sys.stdout)
+        # 引擎和各模块的提示直接 print，改写到标准错误，避免混入 JSON 行
+        sys.stdout = sys.stderr
+
+    engine = DownloadEngine(config, config_path=args.config, yt_dlp_path=find_ytdlp(args.yt_dlp))
+
+    if reporter:
+        reporter.attach(engine)
+    else:
+        engine.on_status = lambda message: print(message, file=sys.stderr, flush=True)
+
+    if args.serve:
+        return serve(engine)
+    if args.worker is not None:
+        # 下载节点使用本机的保存路径和并发数
+        if args.save_path:
+            config['download']['save_path'] = os.path.abspath(args.save_path)
+        if args.workers:
+            config['download']['max_workers'] = args.workers
+        return work(engine, args.worker or None)
+
+    # 读取链接来源：日志续传、文件或标准输入
+    file_path, links = None, None
+    if not args.resume:
+        if args.links_file and args.links_file != '-':
+            file_path = args.links_file
+        elif args.links_file == '-' or not sys.stdin.isatty():
+            # 边读边解析，与链接文件相同（不读入内存）
+            links = sys.stdin
+        else:
+            build_parser().print_usage(sys.stderr)
+            print("请指定链接文件，或通过标准输入传入链接", file=sys.stderr)
+            return 2
+
+    if args.submit:
+        return submit(config, file_path, links, args, reporter)
+
+    try:
+        summary = engine.download_videos(
+            file_path, links, journal_path=args.resume, save_path=args.save_path,
+            max_workers=args.workers, prefer_low_quality=args.low_quality, incremental=args.incremental
+        )
+    except KeyboardInterrupt:
+        engine.close_journals()
+        print("\n下载被用户中断，可使用 --resume 继续", file=sys.stderr)
+        return 130
+
+    if summary is None:
+        return 2
+    if args.metrics:
+        write_metrics(args.metrics, engine.metrics.prometheus_text(summary['metrics']))
+    if reporter:
+        reporter.emit('summary', **summary)
+    return 1 if summary['failed'] else 0
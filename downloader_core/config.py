@@ -0,0 +1,221 @@
+"""
+配置文件读写和资源路径
+"""
+
+import json
+import os
+import sys
+
+from .startup import STARTUP_CACHE_FILE, file_stamp, get_startup_cache
+
+def get_resource_path(relative_path):
+    """获取资源文件路径（支持打包后的exe）"""
+    try:
+        # PyInstaller打包后的临时目录
+        base_path = sys._MEIPASS
+    except Exception:
+        # 开发环境下的当前目录
+        base_path = os.path.abspath(".")
+    return os.path.join(base_path, relative_path)
+
+def get_ytdlp_executable():
+    """获取yt-dlp可执行文件路径（跨平台支持）"""
+    if sys.platform.startswith('win'):
+        return get_resource_path('yt-dlp.exe')
+    else:
+        # macOS和Linux使用yt-dlp（无扩展名）
+        return get_resource_path('yt-dlp')
+
+def get_config_path():
+    """获取配置文件路径（exe同目录下）"""
+    if getattr(sys, 'frozen', False):
+        # 打包后的exe文件目录
+        return os.path.join(os.path.dirname(sys.executable), 'youtube_downloader_config.yaml')
+    else:
+        # 开发环境
+        return 'youtube_downloader_config.yaml'
+
+def get_data_path(filename, config_path=None):
+    """获取数据文件路径（与配置文件同目录）"""
+    if os.path.isabs(filename):
+        return filename
+    return os.path.join(os.path.dirname(config_path or get_config_path()), filename)
+
+# 配置文件名称和路径
+CONFIG_FILE = get_config_path()
+
+def create_default_config():
+    """创建默认配置"""
+    return {
+        'archive': {
+            'enabled': True,
+            'path': 'youtube_downloader_archive.txt'
+        },
+        'behavior': {
+            'download_interval': 2,
+            'ignore_errors': True,
+            'max_retries': 3,
+            'random_delay_range': [1, 3],
+            'retry_delay': 5,
+            'unique_filename': True
+        },
+        'cache': {
+            'enabled': True,
+            'max_entries': 10000,
+            'path': 'youtube_downloader_cache.db',
+            'ttl_hours': 168
+        },
+        'debug': {
+            'enabled': False,
+            'log_backups': 3,
+            'log_file': 'youtube_downloader_metrics.jsonl',
+            'log_max_mb': 5,
+            'save_logs': False,
+            'show_formats': False
+        },
+        'download': {
+            'bandwidth': {
+                'limit': 0,
+                'min_rate': '100K',
+                'schedule': []
+            },
+            'concurrency': {
+                'adaptive': True,
+                'adjust_interval': 15,
+                'ceiling': 8
+            },
+            'engine': 'subprocess',
+            'large_files': {
+                'fragments': 4,
+                'threshold_mb': 500
+            },
+            'max_workers': 2,
+            'merge': {
+                'enabled': True,
+                'ffmpeg_path': '',
+                'max_pending': 4,
+                'workers': 0
+            },
+            'order': {
+                'policy': 'priority',
+                'probe_workers': 2
+            },
+            'proxy': {
+                'check_interval': 60,
+                'enabled': True,
+                'pool': [],
+                'test_on_startup': False,
+                'test_url': 'https://www.google.com',
+                'timeout': 3,
+                'url': 'http://127.0.0.1:7890'
+            },
+            'save_path': os.path.join(os.path.expanduser('~'), 'Downloads')
+        },
+        'journal': {
+            'directory': 'youtube_downloader_journals',
+            'enabled': True
+        },
+        'playlist': {
+            'cache_hours': 6,
+            'incremental': False,
+            'stop_after_known': 50
+        },
+        'python_path': sys.executable,
+        'retry': {
+            'breaker_cooldown': 60,
+            'breaker_max_cooldown': 900,
+            'breaker_threshold': 5,
+            'breaker_window': 60,
+            'max_delay': 600,
+            'rate_limit_delay': 30,
+            'ytdlp_retries': 2
+        },
+        'service': {
+            'allowed_paths': [],
+            'batch_size': 0,
+            'database': 'youtube_downloader_queue.db',
+            'enabled': True,
+            'host': '127.0.0.1',
+            'lease_seconds': 60,
+            'local_downloads': True,
+            'max_body_kb': 8192,
+            'port': 8790,
+            'token': ''
+        },
+        'storage': {
+            'min_free_mb': 1024,
+            'staging_dir': '',
+            'writers_per_volume': 0
+        },
+        'video': {
+            'format_priority': [
+                'bestvideo[height=1080][fps=60]+bestaudio/best',
+                'bestvideo[height=720][fps=60]+bestaudio/best',
+                'bestvideo[height=1080][fps=30]+bestaudio/best',
+                'bestvideo[height=720][fps=30]+bestaudio/best',
+                'bestvideo[height=480]+bestaudio/best',
+                'bestvideo[height=360]+bestaudio/best'
+            ],
+            'max_height': 1080,
+            'output_format': 'mp4'
+        },
+        'worker': {
+            'batch_size': 0,
+            'coordinator': 'http://127.0.0.1:8790',
+            'name': '',
+            'token': ''
+        }
+    }
+
+def save_config(config, config_path=None):
+    """保存配置文件"""
+    import yaml
+
+    config_path = config_path or CONFIG_FILE
+    with open(config_path, 'w', encoding='utf-8') as file:
+        yaml.dump(config, file, default_flow_style=False, allow_unicode=True)
+    cache_config(config, config_path)
+
+def config_cache_key(config_path):
+    """配置在启动缓存中的键（按配置文件路径区分，同一目录中的多个配置文件互不覆盖）"""
+    return f"config:{os.path.abspath(config_path)}"
+
+def cache_config(config, config_path):
+    """把解析后的配置存入启动缓存（只有 JSON 能原样表示的配置才缓存）"""
+    try:
+        if json.loads(json.dumps(config)) != config:
+            return
+    except (TypeError, ValueError):
+        return
+    stamp = file_stamp(config_path)
+    if stamp:
+        cache = get_startup_cache(get_data_path(STARTUP_CACHE_FILE, config_path))
+        cache.put(config_cache_key(config_path), stamp, config)
+
+def load_config(config_path=None):
+    """加载配置文件（不存在时创建默认配置）
+
+    配置文件未修改时直接使用启动缓存中上次解析的结果，不导入和解析 YAML。
+    """
+    config_path = config_path or CONFIG_FILE
+    stamp = file_stamp(config_path)
+    if stamp:
+        cache = get_startup_cache(get_data_path(STARTUP_CACHE_FILE, config_path))
+        config = cache.get(config_cache_key(config_path), stamp)
+        if config is not None:
+            return config
+    try:
+        import yaml
+
+        with open(config_path, 'r', encoding='utf-8') as file:
+            # 有 libyaml 时使用 C 实现的解析器
+            config = yaml.load(file, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+        cache_config(config, config_path)
+        return config
+    except FileNotFoundError:
+        config = create_default_config()
+        try:
+            save_config(config, config_path)
+        except Exception as e:
+            print(f"无法保存默认配置: {e}")
+        return config
@@ -0,0 +1,1287 @@
+"""
+下载引擎：格式解析、单个视频下载和批量调度（不依赖GUI，可用于命令行）
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+
+from .archive import DownloadArchive
+from .cache import FormatCache
+from .config import get_data_path, get_ytdlp_executable
+from .formats import extract_video_id, match_format_selector, estimate_filesize
+from .jobs import (CANCELLED, DONE, DOWNLOADING, FAILED, MERGING, NOMINAL_BYTE_RATE, ORDER_POLICIES, QUEUED,
+                   RETRY_WAIT, UNKNOWN_WEIGHT, JobTable, order_weight, split_priority)
+from .journal import BatchJournal
+from .links import count_link_lines, is_link_line, iter_link_file, iter_links
+from .metrics import POSTPROCESS_PATTERN, BatchMetrics, classify_error, get_metrics_logger
+from .playlists import PlaylistCache, expand_collection, is_collection_url, normalize_collection_url, video_url
+from .postprocess import find_ffmpeg, merge_parts, merged_path, part_template, split_format
+from .progress import BatchProgress
+from .backends import create_backend
+from .bandwidth import BandwidthManager, BandwidthSchedule, format_rate
+from .proxies import ProxyPool
+from .retry import NETWORK, PERMANENT, RATE_LIMITED, TRANSIENT, CircuitBreaker, RetryPolicy, classify_failure
+from .runner import DESTINATION_PATTERN, DOWNLOADED_PATTERN, DownloadCancelled
+from .scheduler import ConcurrencyController, DelayQueue, JobFeeder, TokenBucket
+from .startup import STARTUP_CACHE_FILE, get_startup_cache
+from .storage import StorageManager, same_directory
+
+# 批次开始后逐行显示的无法识别的行数（其余只计数）
+REJECTED_LINES_SHOWN = 20
+
+class DownloadEngine:
+    """下载引擎
+
+    界面通过回调接收状态：on_status(文本)、on_progress(BatchProgress)、on_concurrency(当前并发数)。
+    """
+
+    def __init__(self, config, config_path=None, yt_dlp_path=None,
+                 on_status=None, on_progress=None, on_concurrency=None):
+        self.config = config
+        self.config_path = config_path
+        self.yt_dlp_path = yt_dlp_path or get_ytdlp_executable()
+        self.backend = create_backend(config['download'].get('engine', 'subprocess'), self.yt_dlp_path)
+        self.on_status = on_status
+        self.on_progress = on_progress
+        self.on_concurrency = on_concurrency
+        self.format_cache = self.create_format_cache()
+        self.playlist_cache = self.create_playlist_cache()
+        self.download_archive = self.create_download_archive()
+        self.active_journals = set()
+        self.proxy_pool = None
+        self.proxy_pool_lock = threading.Lock()
+        # 最近一个批次的指标和任务表
+        self.metrics = None
+        self.jobs = None
+
+    def update_status(self, message):
+        """汇报状态文本"""
+        if self.on_status:
+            self.on_status(message)
+
+    def update_progress(self, progress):
+        """汇报批次进度"""
+        if self.on_progress:
+            self.on_progress(progress)
+
+    def update_concurrency(self, limit):
+        """汇报当前并发数"""
+        if self.on_concurrency:
+            self.on_concurrency(limit)
+
+    def create_format_cache(self):
+        """创建格式缓存（配置关闭或无法打开时返回None）"""
+        cache_config = self.config.get('cache', {})
+        if not cache_config.get('enabled', True):
+            return None
+        try:
+            return FormatCache(
+                get_data_path(cache_config.get('path', 'youtube_downloader_cache.db'), self.config_path),
+                ttl=cache_config.get('ttl_hours', 168) * 3600,
+                max_entries=cache_config.get('max_entries', 10000)
+            )
+        except Exception as e:
+            print(f"无法打开格式缓存: {e}")
+            return None
+
+    def create_playlist_cache(self):
+        """创建播放列表展开缓存（与格式缓存使用同一个数据库，缓存关闭时返回None）"""
+        cache_config = self.config.get('cache', {})
+        if not cache_config.get('enabled', True):
+            return None
+        try:
+            return PlaylistCache(
+                get_data_path(cache_config.get('path', 'youtube_downloader_cache.db'), self.config_path)
+            )
+        except Exception as e:
+            print(f"无法打开播放列表缓存: {e}")
+            return None
+
+    def create_download_archive(self):
+        """加载已完成视频索引（配置关闭或无法读取时返回None）"""
+        archive_config = self.config.get('archive', {})
+        if not archive_config.get('enabled', True):
+            return None
+        try:
+            return DownloadArchive(get_data_path(archive_config.get('path', 'youtube_downloader_archive.txt'),
+                                                 self.config_path))
+        except Exception as e:
+            print(f"无法加载下载记录: {e}")
+            return None
+
+    def create_metrics(self):
+        """创建批次指标（debug.save_logs 开启时写入按大小轮换的 JSONL 日志）"""
+        debug_config = self.config.get('debug', {})
+        logger = None
+        if debug_config.get('save_logs'):
+            try:
+                logger = get_metrics_logger(
+                    get_data_path(debug_config.get('log_file', 'youtube_downloader_metrics.jsonl'), self.config_path),
+                    max_bytes=debug_config.get('log_max_mb', 5) * 1024 * 1024,
+                    backup_count=debug_config.get('log_backups', 3)
+                )
+            except Exception as e:
+                print(f"无法打开指标日志: {e}")
+        return BatchMetrics(logger)
+
+    def get_journal_directory(self):
+        """下载日志目录（配置关闭时返回None）"""
+        journal_config = self.config.get('journal', {})
+        if not journal_config.get('enabled', True):
+            return None
+        return get_data_path(journal_config.get('directory', 'youtube_downloader_journals'), self.config_path)
+
+    def create_journal(self, header):
+        """为新批次创建下载日志（配置关闭或无法创建时返回None）"""
+        directory = self.get_journal_directory()
+        if not directory:
+            return None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            name = f"{time.strftime('%Y%m%d_%H%M%S')}_{os.urandom(4).hex()}.jsonl"
+            return BatchJournal(os.path.join(directory, name), header)
+        except Exception as e:
+            print(f"无法创建下载日志: {e}")
+            return None
+
+    def get_proxy_pool(self):
+        """当前配置对应的代理池（download.proxy.url 和 pool 中的代理，配置变化时重新创建），未启用代理时返回None"""
+        proxy_config = self.config['download']['proxy']
+        if not proxy_config['enabled']:
+            return None
+        urls = [proxy_config.get('url')] + list(proxy_config.get('pool') or [])
+        with self.proxy_pool_lock:
+            if self.proxy_pool is None or list(self.proxy_pool.proxies) != [url for url in dict.fromkeys(urls) if url]:
+                if self.proxy_pool:
+                    self.proxy_pool.stop()
+                self.proxy_pool = ProxyPool(
+                    urls,
+                    proxy_config.get('test_url', 'https://www.google.com'),
+                    timeout=proxy_config.get('timeout', 3),
+                    check_interval=proxy_config.get('check_interval', 60)
+                )
+            return self.proxy_pool
+
+    def test_proxy_connection(self, max_age=None):
+        """测试代理连接：并行检查代理池中的所有代理，任一可用即成功（max_age 秒内全部检查过时直接使用结果）"""
+        proxy_pool = self.get_proxy_pool()
+        if proxy_pool is None:
+            return True
+        if max_age:
+            healthy = proxy_pool.recent_healthy_count(max_age)
+            if healthy:
+                return True
+        return proxy_pool.check_all() > 0
+
+    def get_request_options(self, proxy=None):
+        """公共请求参数（反检测请求头和代理），使用 YoutubeDL 参数名；proxy 为从代理池选出的代理"""
+        options = {
+            'http_headers': {
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                'Referer': 'https://www.youtube.com/',
+                'Accept-Language': 'en-US,en;q=0.9',
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+            },
+        }
+        if proxy:
+            options['proxy'] = proxy
+        elif self.config['download']['proxy']['enabled']:
+            options['proxy'] = self.config['download']['proxy']['url']
+        return options
+
+    def probe_video(self, link):
+        """获取视频元数据（每个视频只探测一次）"""
+        proxy_pool = self.get_proxy_pool()
+        proxy = proxy_pool.acquire() if proxy_pool else None
+        try:
+            info = self.backend.probe(link, self.get_request_options(proxy))
+        except Exception as e:
+            if proxy:
+                proxy_pool.release(proxy, classify_failure(str(e)), error=str(e))
+            raise
+        if proxy:
+            proxy_pool.release(proxy)
+        return info
+
+    def get_format_profile(self, prefer_low_quality=False):
+        """画质档位：返回 (格式优先级列表, 兜底格式, 缓存档位键)，格式优先级变化时档位键随之变化"""
+        if prefer_low_quality:
+            format_priority = [
+                "worst[height<=360]+bestaudio/worst",
+                "worst[height<=480]+bestaudio/worst",
+                "worst[height<=720]+bestaudio/worst",
+            ]
+            fallback = "worst"
+        else:
+            format_priority = self.config['video']['format_priority']
+            fallback = "best[height<=1080]"
+        profile = hashlib.md5(json.dumps(format_priority).encode('utf-8')).hexdigest()[:12]
+        return format_priority, fallback, profile
+
+    def get_cached_format(self, link, prefer_low_quality=False):
+        """格式缓存中的解析结果，没有时返回None（不探测）"""
+        video_id = extract_video_id(link)
+        if not self.format_cache or not video_id:
+            return None
+        cached = self.format_cache.get(video_id, self.get_format_profile(prefer_low_quality)[2])
+        if cached:
+            cached['info'] = None
+        return cached
+
+    def forget_cached_format(self, link, prefer_low_quality=False):
+        """删除格式缓存中的解析结果（下载时格式已不可用）"""
+        video_id = extract_video_id(link)
+        if not self.format_cache or not video_id:
+            return
+        try:
+            self.format_cache.delete(video_id, self.get_format_profile(prefer_low_quality)[2])
+        except Exception as e:
+            print(f"删除格式缓存失败: {e}")
+
+    def resolve_format(self, link, prefer_low_quality=False):
+        """解析下载格式：探测一次元数据，从结构化格式列表中选出具体格式ID"""
+        format_priority, fallback, profile = self.get_format_profile(prefer_low_quality)
+
+        # 缓存键：视频ID + 画质档位
+        video_id = extract_video_id(link)
+        cached = self.get_cached_format(link, prefer_low_quality)
+        if cached:
+            return cached
+
+        try:
+            info = self.probe_video(link)
+        except Exception as e:
+            print(f"获取格式失败: {e}")
+            # 探测失败时交给yt-dlp在下载时自行选择
+            return {
+                'id': None,
+                'format': "worst" if prefer_low_quality else "best[height<=720]",
+                'selector': None,
+                'title': None,
+                'duration': None,
+                'filesize': None,
+                'info': None,
+                'error': str(e),
+            }
+
+        formats = info.get('formats') or []
+        if self.config['debug'].get('show_formats'):
+            for f in formats:
+                print(f"可用格式: {f.get('format_id')} {f.get('ext')} {f.get('resolution')} {f.get('fps')}")
+
+        # 按优先级选择格式（只要求首选项可用，避免被 "/best" 兜底误匹配）
+        selector, chosen = fallback, None
+        for format_str in format_priority:
+            chosen = match_format_selector(formats, format_str)
+            if chosen:
+                selector = format_str
+                break
+        else:
+            chosen = match_format_selector(formats, fallback, allow_fallback=True)
+
+        if chosen:
+            format_id = '+'.join(f['format_id'] for f in chosen)
+        else:
+            # 格式列表中没有匹配项，交给yt-dlp处理选择器
+            format_id = fallback
+
+        if self.config['debug']['enabled']:
+            print(f"选择格式: {link} -> {format_id} ({selector})")
+
+        resolution = {
+            'id': info.get('id') or video_id,
+            'format': format_id,
+            'selector': selector,
+            'title': info.get('title'),
+            'duration': info.get('duration'),
+            'filesize': estimate_filesize(chosen, info.get('duration')) if chosen else None,
+        }
+        cache_key = video_id or resolution['id']
+        if self.format_cache and cache_key:
+            try:
+                self.format_cache.put(cache_key, profile, resolution)
+            except Exception as e:
+                print(f"写入格式缓存失败: {e}")
+
+        resolution['info'] = info
+        return resolution
+
+    def expand_playlist(self, link, incremental=None):
+        """逐个生成播放列表/频道中的视频ID（incremental 为None时使用配置）"""
+        playlist_config = self.config.get('playlist', {})
+        if incremental is None:
+            incremental = playlist_config.get('incremental', False)
+        return expand_collection(
+            self.backend, link, self.get_request_options(),
+            cache=self.playlist_cache,
+            incremental=incremental,
+            max_age=playlist_config.get('cache_hours', 6) * 3600,
+            stop_after_known=playlist_config.get('stop_after_known', 50)
+        )
+
+    def get_best_format(self, link, prefer_low_quality=False):
+        """获取最佳可用格式"""
+        return self.resolve_format(link, prefer_low_quality)['format']
+
+    def create_retry_policy(self):
+        """按配置创建重试策略"""
+        retry_config = self.config.get('retry', {})
+        return RetryPolicy(
+            self.config['behavior']['max_retries'],
+            self.config['behavior']['retry_delay'],
+            retry_config.get('max_delay', 600),
+            retry_config.get('rate_limit_delay', 30)
+        )
+
+    def create_circuit_breaker(self):
+        """按配置创建限流熔断器"""
+        retry_config = self.config.get('retry', {})
+        return CircuitBreaker(
+            retry_config.get('breaker_threshold', 5),
+            retry_config.get('breaker_window', 60),
+            retry_config.get('breaker_cooldown', 60),
+            retry_config.get('breaker_max_cooldown', 900)
+        )
+
+    def create_bandwidth_manager(self):
+        """按配置创建带宽管理（download.bandwidth），未设置上限和时间段时返回None"""
+        bandwidth_config = self.config['download'].get('bandwidth', {})
+        if not bandwidth_config.get('limit') and not bandwidth_config.get('schedule'):
+            return None
+        try:
+            schedule = BandwidthSchedule(bandwidth_config.get('schedule'), bandwidth_config.get('limit'))
+        except (KeyError, ValueError) as e:
+            print(f"带宽配置无效，不限速: {e}")
+            return None
+        return BandwidthManager(
+            schedule,
+            bandwidth_config.get('min_rate', '100K'),
+            on_change=lambda limit: self.update_status(f"带宽上限调整为 {format_rate(limit)}")
+        )
+
+    def create_storage_manager(self):
+        """按配置创建存储管理（storage 部分：磁盘保留空间、每个磁盘同时写入的下载数、临时目录）"""
+        storage_config = self.config.get('storage', {})
+        staging_dir = storage_config.get('staging_dir') or None
+        if staging_dir:
+            staging_dir = os.path.abspath(os.path.expanduser(staging_dir))
+            try:
+                os.makedirs(staging_dir, exist_ok=True)
+            except OSError as e:
+                print(f"无法创建临时目录，直接下载到保存路径: {e}")
+                staging_dir = None
+        return StorageManager(
+            min_free=storage_config.get('min_free_mb', 1024) * 1024 * 1024,
+            writers_per_volume=storage_config.get('writers_per_volume', 0),
+            staging_dir=staging_dir
+        )
+
+    def get_expected_size(self, resolution):
+        """视频的预计大小（探测得到的大小，没有时按时长估算），都未知时返回None"""
+        size = resolution['filesize']
+        if size is None and resolution['duration']:
+            size = resolution['duration'] * NOMINAL_BYTE_RATE
+        return size
+
+    def get_fragment_count(self, resolution, controller=None):
+        """大文件模式：超过 large_files.threshold_mb 的视频并行下载分片，返回分片并发数（1 表示普通下载）
+
+        提供 controller 时额外的连接从全局并发预算（concurrency.ceiling）中空闲的部分分配，
+        用完后需调用 controller.release_connections(分片并发数 - 1)。
+        """
+        large_config = self.config['download'].get('large_files', {})
+        threshold = large_config.get('threshold_mb', 0) * 1024 * 1024
+        fragments = large_config.get('fragments', 4)
+        size = self.get_expected_size(resolution)
+        if not threshold or fragments <= 1 or not size or size < threshold:
+            return 1
+        if controller is None:
+            return fragments
+        return 1 + controller.reserve_connections(fragments - 1)
+
+    def get_merge_ffmpeg(self):
+        """批量下载时单独合并阶段使用的 ffmpeg（配置关闭或找不到 ffmpeg 时返回None，由 yt-dlp 自行合并）"""
+        merge_config = self.config['download'].get('merge', {})
+        if not merge_config.get('enabled', True):
+            return None
+        ffmpeg = find_ffmpeg(merge_config.get('ffmpeg_path'))
+        if ffmpeg is None:
+            print("未找到 ffmpeg，由 yt-dlp 在下载进程中合并")
+        return ffmpeg
+
+    def download_video(self, link, save_path, prefer_low_quality=False, progress=None, controller=None,
+                       journal=None, metrics=None, jobs=None, bandwidth=None, storage=None):
+        """下载单个视频（失败时按重试策略在当前线程中等待后重试，批量下载见 download_videos）
+
+        参数含义见 download_attempt。返回 0 表示成功，-1 表示所有重试都失败，-2 表示被取消。
+        """
+        policy = self.create_retry_policy()
+        bandwidth = bandwidth or self.create_bandwidth_manager()
+        storage = storage or self.create_storage_manager()
+        retry_state = {}
+        while True:
+            result, category = self.download_attempt(link, save_path, retry_state, prefer_low_quality, progress,
+                                                     controller, journal, metrics, jobs, bandwidth, storage)
+            if result != -1:
+                return result
+            delay = policy.delay(category, retry_state['attempts'])
+            if delay is None:
+                return -1  # 不可恢复的错误或所有重试都失败
+            if jobs:
+                jobs.update(link, state=RETRY_WAIT, speed=None)
+            time.sleep(delay)
+            if metrics:
+                metrics.add_time(link, 'retry_wait', delay)
+
+    def download_attempt(self, link, save_path, retry_state, prefer_low_quality=False, progress=None,
+                         controller=None, journal=None, metrics=None, jobs=None, bandwidth=None, storage=None,
+                         defer_merge=False):
+        """下载单个视频的一次尝试
+
+        retry_state 为同一链接各次尝试共用的字典（尝试次数、输出文件名和已解析的格式），首次尝试传入空字典。
+        progress 为 BatchProgress 时实时汇报下载进度，controller 为 ConcurrencyController 时汇报吞吐量和限流，
+        journal 为 BatchJournal 时记录下载状态并沿用上次的输出路径以便续传，
+        metrics 为 BatchMetrics 时记录探测、下载、合并耗时和错误类别，
+        jobs 为 JobTable 时更新任务状态，界面取消任务时停止下载，
+        bandwidth 为 BandwidthManager 时按分配的带宽限速，
+        storage 为 StorageManager 时按预计大小预留磁盘空间并限制同一磁盘的写入数，配置了临时目录时先下载到临时目录，
+        完成后（分开下载时为合并后）移动到保存路径，
+        defer_merge 为 True 时视频和音频分开下载、不合并，下载的文件列表保存在 retry_state['parts']（由调用方合并）。
+
+        返回 (结果, 重试类别)：结果 0 表示成功，-1 表示失败（重试类别见 retry 模块），-2 表示被取消。
+        """
+        def cancel_requested():
+            return jobs is not None and jobs.is_cancel_requested(link)
+
+        attempt = retry_state.get('attempts', 0)
+        retry_state['attempts'] = attempt + 1
+        retry_state.pop('parts', None)
+        if cancel_requested():
+            return -2, None  # 用户取消
+
+        # 生成唯一文件名（重试时沿用，以便续传）
+        output_template = retry_state.get('output_template')
+        if output_template is None:
+            if self.config['behavior']['unique_filename']:
+                unique_suffix = os.urandom(4).hex()
+                filename_template = f"%(title)s_{unique_suffix}.%(ext)s"
+            else:
+                filename_template = "%(title)s.%(ext)s"
+            directory = save_path
+            if storage and storage.staging_dir:
+                # 每个视频使用临时目录中的一个子目录，完成后把其中的文件移动到保存路径
+                name = extract_video_id(link) or hashlib.md5(link.encode('utf-8')).hexdigest()[:12]
+                directory = storage.staging_path(name)
+            output_template = os.path.join(directory, filename_template)
+            if journal:
+                output_template = journal.output_template(link) or output_template
+            retry_state['output_template'] = output_template
+
+        try:
+            if attempt > 0:
+                print(f"重试下载 {link} (第 {attempt + 1} 次)")
+
+            # 格式只解析一次，重试时复用（命中缓存时无需探测；探测失败时下次尝试重新探测）
+            resolution = retry_state.get('resolution')
+            if resolution is None:
+                if journal:
+                    journal.record(link, 'resolving')
+                probe_started = time.time()
+                resolution = self.resolve_format(link, prefer_low_quality)
+                if controller and resolution.get('error'):
+                    controller.check_output(resolution['error'])
+                # 命中格式缓存时没有探测
+                if metrics and (resolution['info'] is not None or resolution.get('error')):
+                    metrics.add_time(link, 'probe', time.time() - probe_started)
+                    if resolution.get('error'):
+                        metrics.record_error(link, resolution['error'])
+                if jobs and resolution['title']:
+                    jobs.update(link, title=resolution['title'])
+                if resolution.get('error'):
+                    # 视频不存在、私享等错误下载也不会成功，直接失败
+                    category = classify_failure(resolution['error'])
+                    if category == PERMANENT:
+                        print(f"无法下载，不再重试: {link}")
+                        return -1, PERMANENT
+                    # 限流和网络错误按重试策略退避（并计入熔断）后重新探测；其他错误只在最后一次尝试时
+                    # 交给 yt-dlp 自行选择格式下载
+                    if category in (RATE_LIMITED, NETWORK) or attempt + 1 < self.config['behavior']['max_retries']:
+                        print(f"获取格式失败 (尝试 {attempt + 1}): {link}")
+                        return -1, category
+                else:
+                    retry_state['resolution'] = dict(resolution, info=None)
+
+            # 按预计大小在写入的磁盘上预留空间（需要合并时约为两倍：分开下载的文件和合并后的文件），
+            # 下载到临时目录时保存路径也要能容纳移动过来的文件；空间不足时等待其他下载结束释放预留
+            output_directory = os.path.dirname(output_template)
+            staged = storage is not None and not same_directory(output_directory, save_path)
+            if storage:
+                size = self.get_expected_size(resolution)
+                demands = [(output_directory, size * 2 if size and '+' in resolution['format'] else size)]
+                if staged:
+                    demands.append((save_path, size))
+                shortage = storage.reserve(link, demands, cancel_requested)
+                if shortage:
+                    print(f"下载失败 (尝试 {attempt + 1}): {shortage}")
+                    if metrics:
+                        metrics.record_error(link, shortage)
+                    return -1, TRANSIENT
+                if staged:
+                    os.makedirs(output_directory, exist_ok=True)
+
+            # 直接写入保存路径时占用该磁盘的一个写入名额（下载到临时目录时在移动时占用）；
+            # 在选择代理之前等待，等待期间被取消时没有需要交还的代理（名额在下载结束或 finally 中释放）
+            writer = storage is not None and not staged
+            if writer:
+                storage.acquire_writer(link, save_path, cancel_requested)
+
+            # 下载选项（反检测请求头和代理见 get_request_options，每次尝试从代理池重新选择代理）；
+            # yt-dlp 内部只对网络错误和分片做少量重试，整体重试由重试策略负责
+            ytdlp_retries = self.config.get('retry', {}).get('ytdlp_retries', 2)
+            proxy_pool = self.get_proxy_pool()
+            proxy = proxy_pool.acquire() if proxy_pool else None
+            # 分开下载时文件名中加入格式ID（标题.f137.mp4），合并由调用方完成
+            split = split_format(resolution['format']) if defer_merge else None
+            options = self.get_request_options(proxy)
+            options.update({
+                'format': split or resolution['format'],
+                'outtmpl': part_template(output_template) if split else output_template,
+                'merge_output_format': None if split else self.config['video']['output_format'],
+                'sleep_interval': self.config['behavior']['download_interval'],
+                'max_sleep_interval': self.config['behavior']['download_interval'] + 2,
+                'retries': ytdlp_retries,
+                'fragment_retries': ytdlp_retries,
+                'continuedl': True,
+                'noplaylist': True,
+                'ignoreerrors': self.config['behavior']['ignore_errors'],
+            })
+
+            # 刚探测时直接使用得到的元数据，避免再次解析页面；
+            # 重试时重新解析以获取新的下载地址
+            info = resolution['info'] if attempt == 0 else None
+
+            # 执行下载（流式读取输出，实时汇报进度；平均速度计入代理统计）
+            transfer = {'speed': 0.0, 'samples': 0}
+
+            def on_progress(downloaded, total, speed, eta):
+                if speed:
+                    transfer['speed'] += speed
+                    transfer['samples'] += 1
+                if storage:
+                    storage.written(link, downloaded)
+                if progress:
+                    self.on_download_progress(progress, link, downloaded, total, speed, controller, jobs)
+
+            if progress:
+                progress.start_job(link, resolution['filesize'])
+            if journal:
+                journal.record(link, 'downloading', output=output_template, attempt=attempt + 1)
+            if jobs:
+                jobs.update(link, state=DOWNLOADING, attempts=attempt + 1)
+            if metrics:
+                metrics.attempt(link)
+
+            # 合并等后处理开始的时间（用于区分下载和合并耗时）
+            timing = {'download': time.time(), 'postprocess': None}
+            parts = []
+
+            def on_output(line):
+                if controller:
+                    controller.check_output(line)
+                match = DESTINATION_PATTERN.match(line)
+                if match and journal:
+                    journal.record(link, 'downloading', partial=match.group(1))
+                if split:
+                    match = match or DOWNLOADED_PATTERN.match(line)
+                    if match and match.group(1) not in parts:
+                        parts.append(match.group(1))
+                if timing['postprocess'] is None and POSTPROCESS_PATTERN.match(line):
+                    timing['postprocess'] = time.time()
+                if cancel_requested():
+                    raise DownloadCancelled()
+
+            # 大文件并行下载分片；按全局带宽上限分配本次下载的限速（yt-dlp 对每个分片连接分别限速），
+            # 带宽不足时等待；进程内下载（不分片时）在其他下载开始或结束时调整限速
+            fragments = self.get_fragment_count(resolution, controller)
+            options['concurrent_fragment_downloads'] = fragments
+            options['ratelimit'] = None
+            if metrics and fragments > 1:
+                metrics.set_fragments(link, fragments)
+
+            def on_rate_change(rate):
+                options['ratelimit'] = rate
+                self.backend.set_rate_limit(link, rate)
+
+            category, error = TRANSIENT, None
+            try:
+                if bandwidth:
+                    live = self.backend.live_rate_limit and fragments == 1
+                    rate = bandwidth.acquire(link, on_rate_change if live else None, cancel_requested)
+                    options['ratelimit'] = rate // fragments if rate else None
+                returncode, output = self.backend.download(link, options, info, on_progress, on_output)
+                if returncode == 0:
+                    category = None
+                else:
+                    category = classify_failure(output)
+                    lines = output.strip().splitlines()
+                    error = lines[-1] if lines else None
+            finally:
+                if writer:
+                    storage.release_writer(link)
+                if controller and fragments > 1:
+                    controller.release_connections(fragments - 1)
+                if bandwidth:
+                    bandwidth.release(link)
+                if proxy:
+                    throughput = transfer['speed'] / transfer['samples'] if transfer['samples'] else None
+                    proxy_pool.release(proxy, category, throughput, error)
+
+            if metrics:
+                finished = time.time()
+                postprocess_started = timing['postprocess'] or finished
+                metrics.add_time(link, 'download', postprocess_started - timing['download'])
+                metrics.add_time(link, 'merge', finished - postprocess_started)
+
+            if returncode == 0 and split:
+                if len(parts) == split.count(',') + 1:
+                    retry_state['parts'] = parts
+                else:
+                    returncode, category = 1, TRANSIENT
+                    output = f"未找到分开下载的文件（{len(parts)} 个）"
+            elif returncode == 0 and staged:
+                try:
+                    storage.move_files(link, output_directory, save_path)
+                except OSError as e:
+                    # 文件保留在临时目录，重试时 yt-dlp 直接跳过下载，再次移动
+                    returncode, output = 1, f"移动到保存路径失败: {e}"
+                    category = classify_failure(output)
+            if returncode != 0 and classify_error(output) == 'format' and not retry_state.get('reprobed'):
+                # 缓存的格式ID可能已失效（格式列表有变化）：删除缓存，重试时重新探测一次，仍不可用才放弃
+                retry_state['reprobed'] = True
+                retry_state.pop('resolution', None)
+                self.forget_cached_format(link, prefer_low_quality)
+                category = TRANSIENT
+            if returncode == 0:
+                return 0, None  # 成功
+            print(f"下载失败 (尝试 {attempt + 1}): {output}")
+            if metrics:
+                metrics.record_error(link, output)
+            return -1, category
+
+        except DownloadCancelled:
+            print(f"已取消下载: {link}")
+            return -2, None
+        except Exception as e:
+            print(f"下载异常 (尝试 {attempt + 1}): {e}")
+            if metrics:
+                metrics.record_error(link, str(e))
+            return -1, classify_failure(str(e))
+        finally:
+            # 分开下载的文件交给合并阶段时，预留的空间在合并完成后释放
+            if storage:
+                storage.release_writer(link)
+                if 'parts' not in retry_state:
+                    storage.release(link)
+
+    def on_download_progress(self, progress, link, downloaded, total, speed, controller=None, jobs=None):
+        """单个任务的进度回调（在下载线程中调用，任务被取消时抛出 DownloadCancelled）"""
+        progress.update_job(link, downloaded, total, speed)
+        if controller:
+            controller.observe(progress.speed())
+        if jobs:
+            jobs.update(link, fraction=progress.job_fraction(link), speed=speed)
+            if jobs.is_cancel_requested(link):
+                raise DownloadCancelled()
+        self.report_progress(progress)
+
+    def report_progress(self, progress, force=False):
+        """汇报汇总进度和状态文本（进度行触发时限制频率）"""
+        if not force and not progress.should_report():
+            return
+        self.update_progress(progress)
+        status = progress.status_text()
+        if self.format_cache:
+            status += f" | {self.format_cache.stats_text()}"
+        self.update_status(status)
+
+    def validate_save_path(self, path):
+        """检查并创建保存路径（磁盘空间在下载时按预计大小检查，见 StorageManager）"""
+        if not os.path.exists(path):
+            try:
+                os.makedirs(path)
+                return True
+            except Exception as e:
+                self.update_status(f"无法创建路径: {e}")
+                return False
+        if not os.access(path, os.W_OK):
+            self.update_status(f"保存路径不可写: {path}")
+            return False
+        return True
+
+    def download_videos(self, file_path, links_list=None, journal_path=None, save_path=None,
+                        max_workers=None, prefer_low_quality=False, incremental=None):
+        """批量下载视频（指定 journal_path 时按日志继续未完成的批次）
+
+        链接来源为链接文件 file_path 或 links_list：链接列表，或逐行读取的流（如标准输入，边读边下载）。
+        播放列表和频道链接边枚举边下载，incremental 为 True 时只下载上次展开之后新增的视频。
+
+        返回批次汇总（completed、failed、skipped、cancelled、total、failed_links、failed_collections、failed_file、
+        breaker_trips、proxies、metrics），无法开始时返回None。failed_collections 为各播放列表/频道中失败的视频数。
+        """
+        # 线程池只在批量下载时使用，不在启动时导入
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+        save_path = save_path or self.config['download']['save_path']
+        max_workers = max_workers or self.config['download']['max_workers']
+
+        # 继续未完成的批次：沿用原来的链接来源、保存路径和画质设置
+        journal = None
+        spool_path = None
+        if journal_path:
+            try:
+                journal = BatchJournal(journal_path)
+            except Exception as e:
+                self.update_status(f"读取下载日志失败: {e}")
+                return
+            if not journal.header:
+                journal.finish()
+                self.update_status("下载日志已损坏，无法继续")
+                return
+            file_path = journal.header.get('file_path')
+            links_list = journal.header.get('links')
+            spool_path = journal.header.get('links_file')
+            save_path = journal.header.get('save_path', save_path)
+            prefer_low_quality = journal.header.get('low_quality', prefer_low_quality)
+
+        if not file_path and not links_list and not spool_path:
+            self.update_status("请先选择一个文件或输入链接")
+            return
+
+        if not self.validate_save_path(save_path):
+            return
+
+        # 读取链接：转换为规范链接，链接文件边读边解析（先只统计行数作为总数，不读入内存）；
+        # 无法识别的行不下载，从总数中扣除，按原因计数
+        rejected = Counter()
+
+        def on_reject(number, line, reason):
+            if sum(rejected.values()) < REJECTED_LINES_SHOWN:
+                print(f"忽略第 {number} 行（{reason}）: {line}")
+            rejected[reason] += 1
+            progress.add_total(-1)
+
+        stream = None
+        if isinstance(links_list, list):
+            total = sum(1 for line in links_list if is_link_line(line))
+            links = iter_links(links_list, on_reject)
+        elif links_list is not None:
+            # 流式来源（标准输入）：读到第一个链接就开始，总数随读取增加；
+            # 读到的行同时保存到下载日志目录中（续传时作为链接文件读取，批次结束后删除）
+            stream = iter(links_list)
+            head = []
+            for line in stream:
+                head.append(line)
+                if is_link_line(line):
+                    break
+            total = 1 if head and is_link_line(head[-1]) else 0
+
+            def read_stream():
+                counted = 0
+                for lines in (head, stream):
+                    for line in lines:
+                        if spool:
+                            spool.write(line.rstrip('\r\n') + '\n')
+                        if is_link_line(line):
+                            counted += 1
+                            if counted > 1:
+                                progress.add_total(1)
+                        yield line
+                if spool:
+                    spool.close()
+
+            links = iter_links(read_stream(), on_reject)
+        else:
+            try:
+                total = count_link_lines(file_path or spool_path)
+            except Exception as e:
+                self.update_status(f"读取文件失败: {e}")
+                return
+            links = iter_link_file(file_path or spool_path, on_reject)
+
+        if not total:
+            self.update_status("没有找到有效链接")
+            if journal:
+                journal.finish()
+            return
+
+        # 新批次创建下载日志（粘贴的链接直接写入日志，文件来源只记录路径，流式来源记录保存读到的行的文件）
+        spool = None
+        if journal is None:
+            directory = self.get_journal_directory()
+            if stream is not None and directory:
+                try:
+                    os.makedirs(directory, exist_ok=True)
+                    name = f"{time.strftime('%Y%m%d_%H%M%S')}_{os.urandom(4).hex()}.links.txt"
+                    spool_path = os.path.join(directory, name)
+                    spool = open(spool_path, 'w', encoding='utf-8', buffering=1)
+                except OSError as e:
+                    print(f"无法保存输入的链接，中断后不能继续: {e}")
+                    spool_path = None
+            journal = self.create_journal({
+                'file_path': file_path,
+                'links': links_list if isinstance(links_list, list) else None,
+                'links_file': spool_path,
+                'save_path': save_path,
+                'low_quality': prefer_low_quality,
+                'created': time.time(),
+            })
+
+        if journal:
+            self.active_journals.add(journal)
+
+        progress = BatchProgress(total)
+        failed_links = []
+        cancelled_links = []
+        metrics = self.metrics = self.create_metrics()
+        job_table = self.jobs = JobTable()
+        self.backend.on_process = metrics.count_process
+
+        # 展开播放列表/频道（惰性枚举，每得到一个视频就可以开始下载）
+        def iter_videos(link):
+            if not is_collection_url(link) or extract_video_id(link):
+                yield link
+                return
+            self.update_status(f"正在展开播放列表: {link}")
+            count = 0
+            try:
+                for video_id in self.expand_playlist(link, incremental):
+                    # 播放列表本身已计入总数一次
+                    if count:
+                        progress.add_total(1)
+                    count += 1
+                    url = video_url(video_id)
+                    collection_of.setdefault(url, link)
+                    yield url
+            except Exception as e:
+                print(f"展开播放列表失败: {link}, 错误: {e}")
+                if not count:
+                    progress.finish_job(link, False)
+                    metrics.record_error(link, str(e))
+                    metrics.finish(link, 'failed')
+                    failed_links.append(link)
+                    if journal:
+                        journal.record(link, 'failed')
+                return
+            if not count:
+                progress.skip()
+
+        # 展开得到的视频 -> 所属的播放列表/频道链接（汇总每个播放列表失败的视频数）
+        collection_of = {}
+
+        def mark_collection_done(link, video_id):
+            # 只有下载完成（或已下载过）的视频在增量展开时跳过，失败和取消的视频下次仍会生成
+            collection = collection_of.get(link)
+            if collection and video_id and self.playlist_cache:
+                self.playlist_cache.mark_done(normalize_collection_url(collection), video_id)
+
+        # 下载顺序：按排序策略（时长或大小）和链接后的 priority=N 标记排队
+        order_config = self.config['download'].get('order', {})
+        order_policy = order_config.get('policy', 'priority')
+        if order_policy not in ORDER_POLICIES:
+            print(f"未知的排序策略: {order_policy}，按链接顺序下载")
+            order_policy = 'priority'
+        # 格式缓存中没有时长和大小、需要提前探测的链接
+        unprobed = deque()
+
+        # 去重：合并批次内重复链接（watch?v= 和 youtu.be/ 视为同一视频），跳过已下载过的视频
+        def iter_jobs():
+            seen_ids = set()
+            for source in links:
+                source, priority = split_priority(source)
+                for link in iter_videos(source):
+                    video_id = extract_video_id(link)
+                    key = video_id or link
+                    if key in seen_ids:
+                        progress.skip()
+                        continue
+                    state = journal.state(link) if journal else None
+                    if (video_id and self.download_archive and video_id in self.download_archive) or state == 'done':
+                        mark_collection_done(link, video_id)
+                        progress.skip()
+                        continue
+                    if state == 'cancelled':
+                        progress.skip()
+                        continue
+                    seen_ids.add(key)
+                    weight = 0
+                    if order_policy != 'priority':
+                        cached = self.get_cached_format(link, prefer_low_quality)
+                        if cached:
+                            weight = order_weight(order_policy, cached['duration'], cached['filesize'])
+                        else:
+                            weight = UNKNOWN_WEIGHT
+                            unprobed.append(link)
+                    yield link, video_id, priority, weight
+
+        quality_text = "最低画质" if prefer_low_quality else "最佳画质"
+        self.update_status(f"开始下载 {total} 个链接 ({quality_text})...")
+        self.update_progress(progress)
+        if self.format_cache:
+            self.format_cache.reset_stats()
+
+        # 从配置的并发数开始，根据吞吐量和限流情况自动调整（不超过配置上限）
+        concurrency_config = self.config['download'].get('concurrency', {})
+        controller = ConcurrencyController(
+            max_workers,
+            concurrency_config.get('ceiling', 8),
+            adaptive=concurrency_config.get('adaptive', True),
+            adjust_interval=concurrency_config.get('adjust_interval', 15),
+            on_change=self.update_concurrency
+        )
+        self.update_concurrency(controller.limit)
+
+        # 按随机延迟的平均值限制任务启动速率（与下载并行，不阻塞结果处理）
+        delay_range = self.config['behavior']['random_delay_range']
+        average_delay = (delay_range[0] + delay_range[1]) / 2
+        bucket = TokenBucket(1 / average_delay if average_delay > 0 else 0, capacity=controller.limit)
+
+        # 失败的任务按错误类别决定是否重试，等待重试时放入延迟队列，不占用下载线程；
+        # 多个任务接连遇到限流时熔断，暂停派发新任务
+        policy = self.create_retry_policy()
+        breaker = self.create_circuit_breaker()
+        # 代理池在批次进行中定期检查各代理，连续失败的代理在恢复前不再使用
+        proxy_pool = self.get_proxy_pool()
+        if proxy_pool:
+            proxy_pool.start()
+        delay_queue = DelayQueue()
+        retry_states = {}
+        # 全局带宽上限按预计同时进行的下载数平均分配
+        bandwidth = self.create_bandwidth_manager()
+        if bandwidth and bandwidth.limit:
+            self.update_status(f"带宽上限 {format_rate(bandwidth.limit)}")
+        # 磁盘空间预留和写入数限制；保存路径或临时目录所在磁盘空间不足时暂停派发新任务
+        storage = self.create_storage_manager()
+        storage_paths = [save_path] + ([storage.staging_dir] if storage.staging_dir else [])
+        storage_paused = False
+
+        # 按时长或大小排序时，用单独的线程提前探测排队中的视频，探测结果供下载时直接使用
+        probe_workers = max(1, order_config.get('probe_workers', 2))
+        probe_executor = ThreadPoolExecutor(max_workers=probe_workers) if order_policy != 'priority' else None
+        probes = {}
+
+        # 视频和音频分开下载时，合并交给单独的 ffmpeg 进程（数量按 CPU 核数），下载线程不等待合并；
+        # 等待合并的视频过多时暂停开始新的下载
+        merge_config = self.config['download'].get('merge', {})
+        ffmpeg = self.get_merge_ffmpeg()
+        merge_workers = merge_config.get('workers', 0) or os.cpu_count() or 1
+        merge_limit = merge_workers + max(0, merge_config.get('max_pending', 4))
+        merge_executor = ThreadPoolExecutor(max_workers=merge_workers) if ffmpeg else None
+        merges = {}
+
+        def prefetch(link):
+            started = time.time()
+            resolution = self.resolve_format(link, prefer_low_quality)
+            if resolution['info'] is not None or resolution.get('error'):
+                metrics.add_time(link, 'probe', time.time() - started)
+            if resolution.get('error'):
+                return  # 下载时重新探测
+            retry_states.setdefault(link, {}).setdefault('resolution', dict(resolution, info=None))
+            if resolution['title']:
+                job_table.update(link, title=resolution['title'])
+            job_table.set_weight(link, order_weight(order_policy, resolution['duration'], resolution['filesize']))
+
+        def run_job(link):
+            # 提前探测尚未完成时等待结果，避免重复探测
+            probe = probes.get(link)
+            if probe:
+                wait([probe])
+            controller.acquire()
+            metrics.started_job(link)
+            try:
+                return self.download_attempt(link, save_path, retry_states.setdefault(link, {}), prefer_low_quality,
+                                             progress, controller, journal, metrics, job_table, bandwidth, storage,
+                                             defer_merge=merge_executor is not None)
+            finally:
+                controller.release()
+
+        def run_merge(link, parts):
+            started = time.time()
+            # 在临时目录中合并后移动到保存路径，直接在保存路径中合并时占用该磁盘的写入名额
+            directory = os.path.dirname(parts[0])
+            staged = not same_directory(directory, save_path)
+            try:
+                with storage.writing(link, None if staged else save_path):
+                    returncode, output = merge_parts(ffmpeg, parts,
+                                                     merged_path(parts[0], self.config['video']['output_format']))
+                if returncode == 0 and staged:
+                    storage.move_files(link, directory, save_path)
+            except OSError as e:
+                returncode, output = 1, f"移动到保存路径失败: {e}"
+            finally:
+                storage.release(link)
+            metrics.add_time(link, 'merge', time.time() - started)
+            return returncode, output
+
+        with ThreadPoolExecutor(max_workers=controller.ceiling) as executor:
+            # 链接在后台线程中读取和展开，读到的链接立即加入任务表（枚举播放列表时已开始的下载照常处理）
+            feeder = JobFeeder(iter_jobs())
+            futures = {}
+            feeding = True
+
+            while futures or merges or feeding or job_table.pending_count() or delay_queue \
+                    or job_table.has_cancelled():
+                while feeding:
+                    item = feeder.get()
+                    if item is JobFeeder.DONE:
+                        feeding = False
+                    if item is JobFeeder.DONE or item is JobFeeder.EMPTY:
+                        break
+                    job_table.add(*item)
+
+                # 提前探测排队任务（熔断时暂停）
+                for link, probe in list(probes.items()):
+                    if probe.done():
+                        del probes[link]
+                        if probe.exception():
+                            print(f"提前探测失败: {link}, 错误: {probe.exception()}")
+                while probe_executor and unprobed and len(probes) < probe_workers and not breaker.remaining():
+                    link = unprobed.popleft()
+                    job = job_table.get(link)
+                    if job is None:
+                        # 链接还在读取队列中，下一轮再探测
+                        unprobed.appendleft(link)
+                        break
+                    if job.state == QUEUED:
+                        probes[link] = probe_executor.submit(prefetch, link)
+
+                # 到期的重试任务重新排队
+                for link, since in delay_queue.pop_ready():
+                    if job_table.requeue(link):
+                        metrics.add_time(link, 'retry_wait', time.monotonic() - since)
+
+                # 排队中和等待重试时被界面取消的任务计入跳过
+                for job in job_table.take_cancelled():
+                    progress.cancel_job(job.link)
+                    retry_states.pop(job.link, None)
+                    metrics.finish(job.link, 'cancelled')
+                    cancelled_links.append(job.link)
+                    if journal:
+                        journal.record(job.link, 'cancelled')
+
+                # 磁盘剩余空间（扣除进行中的下载预留的空间）不足时暂停派发，等待下载结束或清理磁盘
+                if job_table.pending_count():
+                    space_message = storage.low_space(storage_paths)
+                    if space_message and not storage_paused:
+                        print(space_message)
+                        self.update_status(space_message)
+                    elif storage_paused and not space_message:
+                        self.update_status("磁盘空间已足够，继续派发任务")
+                    storage_paused = bool(space_message)
+
+                # 在途任务数不超过当前并发数，令牌不足或熔断时等待下一个令牌或已完成的任务；
+                # 等待合并的视频达到上限时不开始新的下载
+                wait_time = breaker.remaining() or (2.0 if storage_paused else 0)
+                while not wait_time and job_table.pending_count() and len(futures) < controller.limit \
+                        and len(merges) < merge_limit:
+                    wait_time = bucket.consume()
+                    if wait_time:
+                        break
+                    job = job_table.next_job()
+                    if job is None:
+                        break
+                    if journal:
+                        journal.record(job.link, 'queued')
+                    metrics.queued(job.link)
+                    futures[executor.submit(run_job, job.link)] = (job.link, job.video_id)
+                if bandwidth:
+                    bandwidth.set_slots(min(controller.limit, len(futures) + job_table.pending_count()))
+
+                if not futures and not merges:
+                    # 等待令牌、熔断结束、重试到期或播放列表继续枚举
+                    time.sleep(min(wait_time or 0.1, 1.0))
+                    continue
+
+                # 仍在读取链接时缩短等待，及时把新链接加入任务表
+                timeout = min(wait_time or 1.0, 0.2 if feeding else 1.0, delay_queue.next_delay() or 1.0)
+                done, _ = wait(list(futures) + list(merges), timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in merges:
+                        # 合并失败时按重试策略重新下载（已下载的文件由 yt-dlp 直接跳过）
+                        link, video_id = merges.pop(future)
+                        try:
+                            returncode, output = future.result()
+                        except Exception as e:
+                            returncode, output = 1, f"ffmpeg 合并异常: {e}"
+                        result, category = 0, None
+                        if returncode != 0:
+                            print(f"合并失败: {link}, 错误: {output}")
+                            metrics.record_error(link, output)
+                            result, category = -1, classify_failure(output)
+                    else:
+                        link, video_id = futures.pop(future)
+                        try:
+                            result, category = future.result()
+                        except Exception as e:
+                            result, category = -1, TRANSIENT
+                            print(f"下载异常: {link}, 错误: {e}")
+                        # 下载完成、等待合并，网络线程继续下一个下载
+                        parts = retry_states.get(link, {}).pop('parts', None)
+                        if result == 0 and parts:
+                            progress.hold_job(link)
+                            job_table.update(link, state=MERGING, speed=None)
+                            merges[merge_executor.submit(run_merge, link, parts)] = (link, video_id)
+                            continue
+
+                    if result == -1:
+                        if breaker.record(category):
+                            message = f"频繁遇到限流，暂停派发新任务 {breaker.remaining():.0f} 秒"
+                            print(message)
+                            self.update_status(message)
+                        delay = policy.delay(category, retry_states[link]['attempts'])
+                        if delay is not None and not job_table.is_cancel_requested(link):
+                            progress.suspend_job(link)
+                            job_table.update(link, state=RETRY_WAIT, speed=None)
+                            delay_queue.push((link, time.monotonic()), delay)
+                            print(f"{delay:.0f} 秒后重试: {link}")
+                            continue
+                    retry_states.pop(link, None)
+                    if result == 0:
+                        breaker.record_success()
+
+                    if result == -2:
+                        progress.cancel_job(link)
+                        metrics.finish(link, 'cancelled')
+                        job_table.update(link, state=CANCELLED, speed=None)
+                        cancelled_links.append(link)
+                        if journal:
+                            journal.record(link, 'cancelled')
+                        self.report_progress(progress, force=True)
+                        continue
+
+                    success = result == 0
+                    received = progress.finish_job(link, success)
+                    metrics.finish(link, 'completed' if success else 'failed', received)
+                    job_table.update(link, state=DONE if success else FAILED, speed=None)
+                    if success:
+                        if video_id and self.download_archive:
+                            self.download_archive.add(video_id)
+                        mark_collection_done(link, video_id)
+                    else:
+                        failed_links.append(link)
+                    if journal:
+                        journal.record(link, 'done' if success else 'failed')
+
+                    self.report_progress(progress, force=True)
+
+        if probe_executor:
+            probe_executor.shutdown()
+        if merge_executor:
+            merge_executor.shutdown()
+        if self.playlist_cache:
+            self.playlist_cache.flush()
+        if proxy_pool:
+            proxy_pool.stop()
+            if len(proxy_pool) > 1:
+                print(proxy_pool.summary_table())
+
+        # 批次正常结束，删除下载日志（和流式来源保存的链接）
+        if journal:
+            self.active_journals.discard(journal)
+            journal.finish()
+        if spool_path:
+            try:
+                os.remove(spool_path)
+            except OSError:
+                pass
+
+        # 批次指标汇总（各阶段耗时分布、进程数、错误分类）
+        self.backend.on_process = None
+        metrics_summary = metrics.finish_batch()
+        if metrics_summary['results']:
+            print(metrics.summary_table(metrics_summary))
+
+        completed_count = progress.completed
+        skipped_count = progress.skipped
+        total_count = progress.total - skipped_count
+        summary = {
+            'completed': completed_count,
+            'failed': len(failed_links),
+            'skipped': skipped_count,
+            'total': total_count,
+            'failed_links': failed_links,
+            'failed_collections': dict(Counter(collection_of[link] for link in failed_links if link in collection_of)),
+            'cancelled': len(cancelled_links),
+            'breaker_trips': breaker.trips,
+            'proxies': proxy_pool.stats() if proxy_pool else [],
+            'failed_file': None,
+            'rejected': sum(rejected.values()),
+            'metrics': metrics_summary,
+        }
+        if rejected:
+            print("无法识别的行: " + ", ".join(f"{reason} {count}" for reason, count in rejected.most_common()))
+        rejected_text = f"，忽略 {summary['rejected']} 行无法识别的链接" if rejected else ""
+
+        if not total_count:
+            self.update_status(f"所有视频均已下载过，跳过 {skipped_count} 个{rejected_text}")
+            return summary
+
+        # 保存失败的链接
+        if failed_links and not file_path:
+            self.update_status(f"下载完成: {completed_count}/{total_count} 成功，跳过 {skipped_count} 个，失败 {len(failed_links)} 个{rejected_text}")
+        elif failed_links:
+            try:
+                failed_file = summary['failed_file'] = self.save_failed_links(file_path, failed_links)
+                self.update_status(f"下载完成: {completed_count}/{total_count} 成功，跳过 {skipped_count} 个，失败链接已保存到 {failed_file}{rejected_text}")
+            except Exception as e:
+                self.update_status(f"下载完成: {completed_count}/{total_count} 成功，跳过 {skipped_count} 个，但无法保存失败链接: {e}")
+        else:
+            self.update_status(f"全部下载完成: {completed_count}/{total_count}，跳过 {skipped_count} 个{rejected_text}")
+        return summary
+
+    def save_failed_links(self, file_path, failed_links):
+        """把失败的链接保存到 <链接文件>_failed.txt（可直接作为链接文件重新下载），返回文件路径"""
+        failed_file = file_path + '_failed.txt'
+        with open(failed_file, 'w', encoding='utf-8') as f:
+            for link in failed_links:
+                f.write(link + '\n')
+        return failed_file
+
+    def cancel_job(self, link):
+        """取消当前批次中的任务（排队中或进行中），返回是否生效"""
+        return bool(self.jobs and self.jobs.cancel(link))
+
+    def move_job(self, link, to_front=True):
+        """将排队中的任务移到队首或队尾，返回是否生效"""
+        if not self.jobs:
+            return False
+        return self.jobs.move_to_front(link) if to_front else self.jobs.move_to_back(link)
+
+    def close_journals(self):
+        """关闭进行中批次的下载日志（已写入的状态保留，下次启动时可继续）"""
+        for journal in list(self.active_journals):
+            journal.close()
+
+    def get_ytdlp_version(self):
+        """获取yt-dlp版本，失败时返回None
+
+        版本按 yt-dlp 可执行文件的修改时间和大小缓存，文件未变化（未更新）时不再启动 yt-dlp。
+        """
+        stamp = self.backend.executable_stamp()
+        if stamp is None:
+            return self.backend.version()
+        cache = get_startup_cache(get_data_path(STARTUP_CACHE_FILE, self.config_path))
+        key = f"ytdlp_version:{os.path.abspath(self.yt_dlp_path)}"
+        version = cache.get(key, stamp)
+        if version is None:
+            version = self.backend.version()
+            if version:
+                cache.put(key, stamp, version)
+        return version
+
+    def update_ytdlp(self):
+        """更新yt-dlp，返回是否成功"""
+        return self.backend.update()
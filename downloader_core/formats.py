@@ -0,0 +1,97 @@
+"""
+视频ID提取和格式选择（基于 yt-dlp 探测得到的结构化格式列表）
+"""
+
+import re
+
+# 从各种YouTube链接中提取11位视频ID
+VIDEO_ID_PATTERN = re.compile(
+    r'(?:youtube\.com/(?:watch\?(?:[^#\s]*&)?v=|shorts/|embed/|live/|v/)|youtu\.be/)([A-Za-z0-9_-]{11})'
+)
+
+def extract_video_id(link):
+    """提取视频ID，无法识别时返回None"""
+    match = VIDEO_ID_PATTERN.search(link)
+    return match.group(1) if match else None
+
+# 格式选择器解析（如 bestvideo[height=1080][fps=60]、bestaudio、best[height<=720]）
+FORMAT_SPEC_PATTERN = re.compile(r'^(best|worst|b|w)(video|audio|v|a)?((?:\[[^\]]+\])*)$')
+FORMAT_FILTER_PATTERN = re.compile(r'\[\s*(\w+)\s*(<=|>=|!=|=|<|>)\s*([^\]]+?)\s*\]')
+
+def _compare_format_field(actual, op, expected):
+    """比较格式字段（数值字段按数值比较，其他按字符串比较）"""
+    if actual is None:
+        return False
+    try:
+        actual_value, expected_value = float(actual), float(expected)
+    except (TypeError, ValueError):
+        actual_value, expected_value = str(actual), expected.strip('\'"')
+        if op not in ('=', '!='):
+            return False
+    if op == '=':
+        return actual_value == expected_value
+    if op == '!=':
+        return actual_value != expected_value
+    if op == '<=':
+        return actual_value <= expected_value
+    if op == '>=':
+        return actual_value >= expected_value
+    if op == '<':
+        return actual_value < expected_value
+    return actual_value > expected_value
+
+def pick_format(formats, spec):
+    """按单个选择器（不含 + 和 /）从格式列表中挑选格式，formats 需按 yt-dlp 的顺序（由差到好）"""
+    spec = spec.strip()
+    match = FORMAT_SPEC_PATTERN.match(spec)
+    if not match:
+        # 直接指定的格式ID
+        return next((f for f in formats if f.get('format_id') == spec), None)
+
+    quality, kind, filters = match.groups()
+    candidates = []
+    for f in formats:
+        has_video = f.get('vcodec', 'none') != 'none'
+        has_audio = f.get('acodec', 'none') != 'none'
+        if kind in ('video', 'v'):
+            if not has_video or has_audio:
+                continue
+        elif kind in ('audio', 'a'):
+            if not has_audio or has_video:
+                continue
+        elif not (has_video and has_audio):
+            continue
+        if all(_compare_format_field(f.get(key), op, value)
+               for key, op, value in FORMAT_FILTER_PATTERN.findall(filters)):
+            candidates.append(f)
+
+    if not candidates:
+        return None
+    return candidates[-1] if quality in ('best', 'b') else candidates[0]
+
+def match_format_selector(formats, selector, allow_fallback=False):
+    """将格式选择器解析为具体格式ID（如 137+140），无法满足时返回None
+
+    默认只匹配第一个备选项（/ 之前的部分），否则 "/best" 这类兜底写法会让每个优先级都命中。
+    """
+    alternatives = selector.split('/')
+    if not allow_fallback:
+        alternatives = alternatives[:1]
+
+    for alternative in alternatives:
+        chosen = [pick_format(formats, part) for part in alternative.split('+')]
+        if chosen and all(chosen):
+            return chosen
+    return None
+
+def estimate_filesize(chosen_formats, duration=None):
+    """估算所选格式的总文件大小（字节）"""
+    total = 0
+    for f in chosen_formats:
+        size = f.get('filesize') or f.get('filesize_approx')
+        if not size and f.get('tbr') and duration:
+            size = f['tbr'] * 1000 / 8 * duration
+        if not size:
+            return None
+        total += size
+    return int(total)
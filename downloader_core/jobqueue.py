@@ -0,0 +1,287 @@
+"""
+持久化下载队列（SQLite，所有客户端提交的链接共用，服务重启后未完成的任务继续）
+
+任务可以由本机的调度线程按轮下载，也可以由其他下载节点按租约领取（worker、lease_until 列）：
+节点需在租约到期前续约，到期未续约的任务重新排队。
+"""
+
+import sqlite3
+import threading
+import time
+import uuid
+
+from .jobs import CANCELLED, DONE, FAILED, QUEUED, split_priority
+
+# 已交给下载引擎、正在进行的一轮中的任务
+RUNNING = 'running'
+QUEUE_STATES = (QUEUED, RUNNING, DONE, FAILED, CANCELLED)
+
+COLUMNS = ('id', 'link', 'priority', 'save_path', 'low_quality', 'client', 'state', 'journal', 'error',
+           'submitted', 'started', 'finished', 'worker', 'lease_until', 'source', 'batch', 'position')
+# 后来加入的列（打开旧版本的数据库时补上）
+ADDED_COLUMNS = {'worker': 'TEXT', 'lease_until': 'REAL', 'source': 'TEXT', 'batch': 'TEXT', 'position': 'INTEGER'}
+# 提交时每次写入的任务数（写入之间释放锁，提交大文件时不阻塞调度、下载节点和其他请求）
+SUBMIT_CHUNK = 1000
+
+def _row_dict(row):
+    item = dict(zip(COLUMNS, row))
+    item['low_quality'] = bool(item['low_quality'])
+    return item
+
+class JobQueue:
+    """下载队列（SQLite，线程安全）
+
+    每个链接一行。调度时按优先级取出保存路径、画质、下载日志和来源文件都相同的一组排队任务（最多 limit 个）作为一轮，
+    交给下载引擎的一个批次，其余任务留在队列中，下载节点可以同时领取；服务意外退出时进行中的任务在下次启动时重新排队。
+    source 为链接来源文件（失败的链接保存到 <来源文件>_failed.txt）。
+    每次提交的链接属于同一个 batch，按 position 编号；(batch, position) 唯一，客户端重发同一部分时不会重复入队。
+    """
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS queue ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, link TEXT NOT NULL, priority INTEGER NOT NULL DEFAULT 0, '
+            'save_path TEXT NOT NULL, low_quality INTEGER NOT NULL DEFAULT 0, client TEXT, '
+            'state TEXT NOT NULL, journal TEXT, error TEXT, '
+            'submitted REAL NOT NULL, started REAL, finished REAL, worker TEXT, lease_until REAL, source TEXT, '
+            'batch TEXT, position INTEGER)'
+        )
+        existing = {row[1] for row in self.conn.execute('PRAGMA table_info(queue)')}
+        for name, column_type in ADDED_COLUMNS.items():
+            if name not in existing:
+                self.conn.execute(f'ALTER TABLE queue ADD COLUMN {name} {column_type}')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS queue_state ON queue (state, priority, id)')
+        self.conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS queue_batch ON queue (batch, position)')
+        self.conn.commit()
+
+    def submit(self, links, save_path, low_quality=False, priority=0, client=None, journal=None, source=None,
+               batch=None, start=0):
+        """加入排队任务，返回任务ID列表
+
+        links 可以是边读边解析的生成器，链接后的 priority=N 标记优先于 priority 参数。
+        分多次提交同一批链接时使用相同的 batch，start 为之前已提交的链接数；重复提交的部分返回已有的任务ID。
+        """
+        now = time.time()
+        batch = batch or uuid.uuid4().hex
+        ids, rows = [], []
+        for line in links:
+            link, tag = split_priority(line)
+            if not link:
+                continue
+            rows.append((link, tag or priority, save_path, int(bool(low_quality)), client, QUEUED, journal, now, source,
+                         batch, start + len(ids) + len(rows)))
+            if len(rows) >= SUBMIT_CHUNK:
+                ids.extend(self._insert(rows))
+                rows = []
+        if rows:
+            ids.extend(self._insert(rows))
+        return ids
+
+    def _insert(self, rows):
+        with self.lock:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO queue (link, priority, save_path, low_quality, client, state, journal, submitted, '
+                'source, batch, position) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows
+            )
+            self.conn.commit()
+            found = self.conn.execute(
+                'SELECT id FROM queue WHERE batch = ? AND position BETWEEN ? AND ? ORDER BY position',
+                (rows[0][9], rows[0][10], rows[-1][10])
+            ).fetchall()
+        return [row[0] for row in found]
+
+    def recover(self):
+        """上次退出时本机进行中的任务重新排队（保留下载日志，继续时沿用原来的输出文件），返回任务数
+
+        其他节点领取的任务保持不变，租约到期后由 expire 重新排队。
+        """
+        with self.lock:
+            cursor = self.conn.execute('UPDATE queue SET state = ?, started = NULL WHERE state = ? AND worker IS NULL',
+                                       (QUEUED, RUNNING))
+            self.conn.commit()
+            return cursor.rowcount
+
+    def next_round(self, limit):
+        """取出下一轮任务并标记为进行中：优先级最高（相同时最早提交）的排队任务所在分组中最多 limit 个排队任务
+
+        按下载日志继续的分组一次全部取出（引擎按日志下载其中全部未完成的链接）。
+        """
+        with self.lock:
+            head = self.conn.execute(
+                'SELECT save_path, low_quality, journal, source FROM queue WHERE state = ? ORDER BY priority DESC, id LIMIT 1',
+                (QUEUED,)
+            ).fetchone()
+            if head is None:
+                return []
+            condition = 'state = ? AND save_path = ? AND low_quality = ? AND journal IS ? AND source IS ?'
+            rows = self.conn.execute(
+                f'SELECT {", ".join(COLUMNS)} FROM queue WHERE {condition} ORDER BY priority DESC, id LIMIT ?',
+                (QUEUED,) + head + (-1 if head[2] else limit,)
+            ).fetchall()
+            now = time.time()
+            self.conn.executemany('UPDATE queue SET state = ?, started = ? WHERE id = ?',
+                                  [(RUNNING, now, row[0]) for row in rows])
+            self.conn.commit()
+        return [dict(_row_dict(row), state=RUNNING) for row in rows]
+
+    def claim(self, worker, count, lease_seconds):
+        """下载节点领取任务：优先级最高（相同时最早提交）的排队任务及画质相同的其他排队任务，最多 count 个"""
+        now = time.time()
+        with self.lock:
+            head = self.conn.execute(
+                'SELECT low_quality FROM queue WHERE state = ? ORDER BY priority DESC, id LIMIT 1', (QUEUED,)
+            ).fetchone()
+            if head is None:
+                return []
+            rows = self.conn.execute(
+                f'SELECT {", ".join(COLUMNS)} FROM queue WHERE state = ? AND low_quality = ? '
+                'ORDER BY priority DESC, id LIMIT ?', (QUEUED, head[0], count)
+            ).fetchall()
+            lease_until = now + lease_seconds
+            self.conn.executemany(
+                'UPDATE queue SET state = ?, worker = ?, started = ?, lease_until = ? WHERE id = ?',
+                [(RUNNING, worker, now, lease_until, row[0]) for row in rows]
+            )
+            self.conn.commit()
+        return [dict(_row_dict(row), state=RUNNING, worker=worker, started=now, lease_until=lease_until)
+                for row in rows]
+
+    def renew(self, worker, ids, lease_seconds):
+        """续约，返回该节点仍持有的任务ID（已取消或租约已过期被重新分配的不在其中）"""
+        if not ids:
+            return []
+        placeholders = ', '.join('?' * len(ids))
+        with self.lock:
+            self.conn.execute(
+                f'UPDATE queue SET lease_until = ? WHERE worker = ? AND state = ? AND id IN ({placeholders})',
+                [time.time() + lease_seconds, worker, RUNNING] + list(ids)
+            )
+            self.conn.commit()
+            rows = self.conn.execute(
+                f'SELECT id FROM queue WHERE worker = ? AND state = ? AND id IN ({placeholders})',
+                [worker, RUNNING] + list(ids)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def report(self, worker, job_id, state, error=None):
+        """下载节点汇报结果（queued 表示交还任务），只接受仍由该节点持有的任务，返回是否接受"""
+        with self.lock:
+            if state == QUEUED:
+                cursor = self.conn.execute(
+                    'UPDATE queue SET state = ?, worker = NULL, started = NULL, lease_until = NULL '
+                    'WHERE id = ? AND worker = ? AND state = ?', (QUEUED, job_id, worker, RUNNING)
+                )
+            else:
+                cursor = self.conn.execute(
+                    'UPDATE queue SET state = ?, error = ?, finished = ?, lease_until = NULL '
+                    'WHERE id = ? AND worker = ? AND state = ?', (state, error, time.time(), job_id, worker, RUNNING)
+                )
+            self.conn.commit()
+            return cursor.rowcount > 0
+
+    def expire(self):
+        """租约到期的任务重新排队，返回任务ID列表"""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT id FROM queue WHERE state = ? AND worker IS NOT NULL AND lease_until < ?', (RUNNING, time.time())
+            ).fetchall()
+            self.conn.executemany(
+                'UPDATE queue SET state = ?, worker = NULL, started = NULL, lease_until = NULL WHERE id = ?',
+                [(QUEUED, row[0]) for row in rows]
+            )
+            self.conn.commit()
+        return [row[0] for row in rows]
+
+    def worker_counts(self):
+        """每个下载节点各状态的任务数"""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT worker, state, COUNT(*) FROM queue WHERE worker IS NOT NULL GROUP BY worker, state'
+            ).fetchall()
+        counts = {}
+        for worker, state, count in rows:
+            counts.setdefault(worker, {})[state] = count
+        return counts
+
+    def set_journal(self, ids, journal):
+        """记录一轮任务使用的下载日志"""
+        with self.lock:
+            self.conn.executemany('UPDATE queue SET journal = ? WHERE id = ?', [(journal, job_id) for job_id in ids])
+            self.conn.commit()
+
+    def has_journal(self, journal):
+        """下载日志是否已有未完成的任务在队列中"""
+        with self.lock:
+            row = self.conn.execute('SELECT 1 FROM queue WHERE journal = ? AND state IN (?, ?) LIMIT 1',
+                                    (journal, QUEUED, RUNNING)).fetchone()
+        return row is not None
+
+    def journal_links(self, journal, state):
+        """使用该下载日志、处于指定状态的任务链接"""
+        with self.lock:
+            rows = self.conn.execute('SELECT link FROM queue WHERE journal = ? AND state = ?', (journal, state)).fetchall()
+        return [row[0] for row in rows]
+
+    def failed_links(self, source):
+        """来源文件最近一次提交中失败的链接（按提交顺序）"""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT link FROM queue WHERE state = ? AND batch = '
+                '(SELECT batch FROM queue WHERE source = ? ORDER BY id DESC LIMIT 1) ORDER BY id', (FAILED, source)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def finish(self, job_id, state, error=None):
+        """任务结束（done、failed、cancelled）"""
+        with self.lock:
+            self.conn.execute('UPDATE queue SET state = ?, error = ?, finished = ? WHERE id = ?',
+                              (state, error, time.time(), job_id))
+            self.conn.commit()
+
+    def cancel(self, job_id):
+        """取消排队中或进行中的任务（进行中的需由调用方停止下载），返回取消前的状态（任务不存在时返回None）"""
+        with self.lock:
+            row = self.conn.execute('SELECT state FROM queue WHERE id = ?', (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row[0] in (QUEUED, RUNNING):
+                self.conn.execute('UPDATE queue SET state = ?, finished = ? WHERE id = ?',
+                                  (CANCELLED, time.time(), job_id))
+                self.conn.commit()
+            return row[0]
+
+    def get(self, job_id):
+        """单个任务，不存在时返回None"""
+        with self.lock:
+            row = self.conn.execute(f'SELECT {", ".join(COLUMNS)} FROM queue WHERE id = ?', (job_id,)).fetchone()
+        return _row_dict(row) if row else None
+
+    def list(self, state=None, client=None, limit=100, offset=0):
+        """按提交顺序列出任务（可按状态和客户端筛选）"""
+        conditions, params = [], []
+        if state:
+            conditions.append('state = ?')
+            params.append(state)
+        if client:
+            conditions.append('client = ?')
+            params.append(client)
+        where = f'WHERE {" AND ".join(conditions)} ' if conditions else ''
+        with self.lock:
+            rows = self.conn.execute(
+                f'SELECT {", ".join(COLUMNS)} FROM queue {where}ORDER BY id LIMIT ? OFFSET ?',
+                params + [limit, offset]
+            ).fetchall()
+        return [_row_dict(row) for row in rows]
+
+    def counts(self):
+        """各状态的任务数"""
+        with self.lock:
+            rows = self.conn.execute('SELECT state, COUNT(*) FROM queue GROUP BY state').fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
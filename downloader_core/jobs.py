@@ -0,0 +1,229 @@
+"""
+批次任务表：每个链接的状态、进度和优先级（供界面逐个显示，并支持取消和调整顺序）
+"""
+
+import heapq
+import itertools
+import re
+import threading
+import time
+
+# 任务状态
+QUEUED = 'queued'
+RESOLVING = 'resolving'
+DOWNLOADING = 'downloading'
+MERGING = 'merging'
+RETRY_WAIT = 'retry_wait'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+# 排序策略：priority 按链接顺序，shortest 时长短的优先，largest 文件大的优先（优先级标记始终优先生效）
+ORDER_POLICIES = ('priority', 'shortest', 'largest')
+# 尚未探测到时长和大小的任务排在已知任务之后
+UNKNOWN_WEIGHT = float('inf')
+# 无法估算文件大小时按时长换算（字节/秒，约为 1080p 的码率）
+NOMINAL_BYTE_RATE = 512 * 1024
+
+# 链接文件中的优先级标记，如 "https://youtu.be/xxxxxxxxxxx priority=5"（数值越大越先下载）
+PRIORITY_TAG_PATTERN = re.compile(r'\s+priority=(-?\d+)\s*$', re.IGNORECASE)
+
+def split_priority(line):
+    """拆分链接和优先级标记，返回 (链接, 优先级)"""
+    match = PRIORITY_TAG_PATTERN.search(line)
+    if not match:
+        return line.strip(), 0
+    return line[:match.start()].strip(), int(match.group(1))
+
+def order_weight(policy, duration=None, filesize=None):
+    """按排序策略计算任务权重（越小越先下载）"""
+    if policy == 'shortest':
+        return duration if duration is not None else UNKNOWN_WEIGHT
+    if policy == 'largest':
+        if filesize is None and duration is not None:
+            filesize = duration * NOMINAL_BYTE_RATE
+        return -filesize if filesize is not None else UNKNOWN_WEIGHT
+    return 0
+
+class Job:
+    """单个任务（使用 __slots__，上万个排队链接也只占用少量内存）"""
+
+    __slots__ = ('link', 'video_id', 'title', 'state', 'fraction', 'speed', 'attempts',
+                 'priority', 'weight', 'seq', 'version', 'cancel_requested', 'updated')
+
+    def __init__(self, link, video_id, priority, weight, seq):
+        self.link = link
+        self.video_id = video_id
+        self.title = None
+        self.state = QUEUED
+        self.fraction = None
+        self.speed = None
+        self.attempts = 0
+        self.priority = priority
+        self.weight = weight
+        self.seq = seq
+        # 优先级或权重每调整一次加1，堆中旧版本的条目出队时忽略
+        self.version = 0
+        self.cancel_requested = False
+        self.updated = time.time()
+
+    def heap_entry(self):
+        return (-self.priority, self.weight, self.seq, self.version, self)
+
+    def percent(self):
+        """下载百分比，未知时返回None"""
+        if self.state == DONE:
+            return 100.0
+        if self.fraction is None:
+            return None
+        return self.fraction * 100
+
+class JobTable:
+    """批次任务表（线程安全）
+
+    下载线程更新任务状态，界面线程读取并发出取消、调整优先级的请求。
+    排队中的任务按（优先级从高到低、权重从小到大、加入顺序）出队。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.order = []
+        self.heap = []
+        self.counter = itertools.count()
+        self.pending = 0
+        self.cancelled_pending = []
+
+    def __len__(self):
+        return len(self.order)
+
+    def add(self, link, video_id=None, priority=0, weight=0):
+        """加入一个排队任务"""
+        with self.lock:
+            job = Job(link, video_id, priority, weight, next(self.counter))
+            self.jobs[link] = job
+            self.order.append(job)
+            heapq.heappush(self.heap, job.heap_entry())
+            self.pending += 1
+            return job
+
+    def get(self, link):
+        return self.jobs.get(link)
+
+    def pending_count(self):
+        """排队中的任务数"""
+        return self.pending
+
+    def next_job(self):
+        """取出下一个要开始的任务，没有时返回None"""
+        with self.lock:
+            while self.heap:
+                version, job = heapq.heappop(self.heap)[3:]
+                if version == job.version and job.state == QUEUED:
+                    self.pending -= 1
+                    job.state = RESOLVING
+                    job.updated = time.time()
+                    return job
+            return None
+
+    def update(self, link, **fields):
+        """更新任务字段（如 state、title、fraction、speed、attempts）"""
+        job = self.jobs.get(link)
+        if job is None:
+            return
+        for name, value in fields.items():
+            setattr(job, name, value)
+        job.updated = time.time()
+
+    def requeue(self, link):
+        """等待重试的任务到期，重新排队（保留原来的优先级和顺序）"""
+        with self.lock:
+            job = self.jobs.get(link)
+            if job is None or job.state != RETRY_WAIT:
+                return False
+            job.state = QUEUED
+            job.version += 1
+            heapq.heappush(self.heap, job.heap_entry())
+            self.pending += 1
+            job.updated = time.time()
+            return True
+
+    def cancel(self, link):
+        """取消任务：排队中和等待重试的直接取消，进行中的请求下载线程停止（合并中的不能取消）；返回是否生效"""
+        with self.lock:
+            job = self.jobs.get(link)
+            if job is None or job.state in FINISHED_STATES or job.state == MERGING or job.cancel_requested:
+                return False
+            job.cancel_requested = True
+            if job.state in (QUEUED, RETRY_WAIT):
+                if job.state == QUEUED:
+                    self.pending -= 1
+                job.state = CANCELLED
+                self.cancelled_pending.append(job)
+            return True
+
+    def has_cancelled(self):
+        """是否有尚未取出的已取消任务"""
+        return bool(self.cancelled_pending)
+
+    def take_cancelled(self):
+        """取出排队中和等待重试时被取消的任务（由调度循环计入跳过）"""
+        with self.lock:
+            cancelled, self.cancelled_pending = self.cancelled_pending, []
+            return cancelled
+
+    def is_cancel_requested(self, link):
+        job = self.jobs.get(link)
+        return job is not None and job.cancel_requested
+
+    def set_priority(self, link, priority):
+        """调整排队中任务的优先级，返回是否生效"""
+        with self.lock:
+            job = self.jobs.get(link)
+            if job is None or job.state != QUEUED:
+                return False
+            job.priority = priority
+            job.version += 1
+            heapq.heappush(self.heap, job.heap_entry())
+            return True
+
+    def set_weight(self, link, weight):
+        """更新任务权重（探测到时长和大小后按排序策略调整），返回是否生效"""
+        with self.lock:
+            job = self.jobs.get(link)
+            if job is None or job.weight == weight:
+                return False
+            job.weight = weight
+            if job.state != QUEUED:
+                return True
+            job.version += 1
+            heapq.heappush(self.heap, job.heap_entry())
+            return True
+
+    def move_to_front(self, link):
+        """排到所有排队任务之前"""
+        with self.lock:
+            top = max((job.priority for job in self.order if job.state == QUEUED), default=0)
+        return self.set_priority(link, top + 1)
+
+    def move_to_back(self, link):
+        """排到所有排队任务之后"""
+        with self.lock:
+            bottom = min((job.priority for job in self.order if job.state == QUEUED), default=0)
+        return self.set_priority(link, bottom - 1)
+
+    def select(self, states=None):
+        """按加入顺序返回任务（states 为状态集合时只返回这些状态的任务）"""
+        with self.lock:
+            if states is None:
+                return list(self.order)
+            return [job for job in self.order if job.state in states]
+
+    def counts(self):
+        """各状态的任务数"""
+        counts = {}
+        with self.lock:
+            for job in self.order:
+                counts[job.state] = counts.get(job.state, 0) + 1
+        return counts
@@ -0,0 +1,105 @@
+"""
+批量下载日志（用于中断后继续下载）
+"""
+
+import json
+import os
+import threading
+import time
+
+from .jobs import split_priority
+from .links import iter_link_file, iter_links
+
+class BatchJournal:
+    """批量下载日志（追加写入的JSONL，每次状态变化立即落盘，用于程序退出或崩溃后继续下载）
+
+    第一行为批次信息，之后每行记录一个链接的状态：queued、resolving、downloading、done、failed、cancelled。
+    """
+
+    def __init__(self, path, header=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.header = None
+        self.links = {}  # 链接 -> 合并后的最新记录
+        if os.path.exists(path):
+            self._replay()
+        self.file = open(path, 'a', encoding='utf-8')
+        if header and self.header is None:
+            self.header = dict(header, event='batch')
+            self._write(self.header, sync=True)
+
+    def _replay(self):
+        with open(self.path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 崩溃时最后一行可能不完整
+                    continue
+                if record.get('event') == 'batch':
+                    self.header = record
+                elif 'link' in record:
+                    self.links.setdefault(record['link'], {}).update(record)
+
+    def _write(self, record, sync=False):
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.file.flush()
+        if sync:
+            os.fsync(self.file.fileno())
+
+    def record(self, link, state, **fields):
+        """记录链接状态（done/failed/cancelled 会同步到磁盘）"""
+        record = dict(fields, link=link, state=state, time=time.time())
+        with self.lock:
+            if self.file.closed:
+                return
+            self.links.setdefault(link, {}).update(record)
+            self._write(record, sync=state in ('done', 'failed', 'cancelled'))
+
+    def state(self, link):
+        """链接的最新状态，未记录时返回None"""
+        return self.links.get(link, {}).get('state')
+
+    def output_template(self, link):
+        """上次使用的输出路径模板（续传时沿用，yt-dlp 才能找到对应的 .part 文件）"""
+        return self.links.get(link, {}).get('output')
+
+    def unfinished_links(self):
+        """未完成的链接（批次信息中有完整链接列表时按列表计算）"""
+        links = self.header.get('links') if self.header else None
+        file_path = self.header.get('file_path') if self.header else None
+        # 与下载时相同，按规范链接查找状态
+        if links is not None:
+            links = iter_links(links)
+        elif file_path and os.path.exists(file_path):
+            links = iter_link_file(file_path)
+        else:
+            links = list(self.links)
+        # 链接后可能带有优先级标记，状态按链接本身记录
+        return [link for link in links if self.state(split_priority(link)[0]) not in ('done', 'cancelled')]
+
+    def unfinished_count(self):
+        """未完成的链接数"""
+        return len(self.unfinished_links())
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                self.file.close()
+
+    def finish(self):
+        """批次结束，删除日志"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def find_unfinished(directory):
+        """查找目录中未完成批次的日志文件"""
+        if not os.path.isdir(directory):
+            return []
+        return sorted(
+            os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.jsonl')
+        )
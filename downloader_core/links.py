@@ -0,0 +1,114 @@
+"""
+链接解析：从链接文件或粘贴的文本中逐行识别 YouTube 链接，转换为规范链接（边读边解析，不把文件读入内存）
+"""
+
+import re
+
+from .jobs import split_priority
+from .playlists import VIDEO_URL_PREFIX, video_url
+
+VIDEO_ID = r'[A-Za-z0-9_-]{11}(?![A-Za-z0-9_-])'
+# 链接只能出现在行首或空白、引号、括号、标点之后，notyoutube.com 等相似域名和
+# 其他链接参数中的 YouTube 链接（?u=https://www.youtube.com/...）不识别
+LINK_START = r'(?<![^\s"\'<>()\[\]{},;，。、；：（）【】])'
+# 支持的链接形式（www.、m.、music. 子域名，可省略 https://）:
+#   watch?v=ID（v 可在任意参数位置）、youtu.be/ID、shorts/ID、embed/ID、live/ID、v/ID
+#   playlist?list=ID、channel/UC...、c/名称、user/名称、@handle（可带 /videos 等标签页）
+# watch?v=...&list=... 视为单个视频，si=、t=、feature= 等参数不保留
+LINK_PATTERN = re.compile(
+    LINK_START + r'(?:https?://)?(?:(?:www|m|music)\.)?(?:'
+    rf'youtu\.be/(?P<short>{VIDEO_ID})'
+    r'|youtube(?:-nocookie)?\.com/(?:'
+    rf'watch/?\?(?:[^#\s]*?&)?v=(?P<watch>{VIDEO_ID})'
+    rf'|(?:shorts|embed|live|v)/(?P<path>{VIDEO_ID})'
+    r'|playlist\?(?:[^#\s]*?&)?list=(?P<list>[A-Za-z0-9_-]+)'
+    r'|(?P<channel>channel/UC[A-Za-z0-9_-]{22}|c/[^/?#\s]+|user/[^/?#\s]+|@[^/?#\s]+)'
+    r'(?P<tab>/(?:videos|shorts|streams|live|playlists|featured|podcasts)(?![^/?#\s]))?'
+    r'))',
+    re.IGNORECASE
+)
+
+# 最常见的情况（一行一个视频链接）先用较简单的正则整行匹配，不符合时再按 LINK_PATTERN 完整解析
+VIDEO_LINE_PATTERN = re.compile(
+    r'[ \t]*(?:https?://)?(?:www\.|m\.|music\.)?(?:youtube\.com/(?:watch\?v=|shorts/|live/|embed/)|youtu\.be/)'
+    r'([A-Za-z0-9_-]{11})(?:[?&#][^\s]*)?\s*$'
+)
+
+# YouTube 域名（用于区分"不是YouTube链接"和其他拒绝原因）
+HOST_PATTERN = re.compile(
+    LINK_START + r'(?:https?://)?(?:(?:www|m|music)\.)?(?:youtu\.be|youtube(?:-nocookie)?\.com)(?![\w.-])',
+    re.IGNORECASE
+)
+
+# 有视频ID位置但ID不是11位的链接（复制时被截断等）
+VIDEO_ID_POSITION_PATTERN = re.compile(r'(?:[?&]v=|youtu\.be/|/(?:shorts|embed|live|v)/)', re.IGNORECASE)
+
+REJECT_NOT_YOUTUBE = "不是YouTube链接"
+REJECT_BAD_VIDEO_ID = "视频ID不完整或无效"
+REJECT_UNSUPPORTED = "不是视频、播放列表或频道链接"
+
+def _canonical(match):
+    """匹配结果对应的规范链接"""
+    video_id = match.group('watch') or match.group('short') or match.group('path')
+    if video_id:
+        return video_url(video_id)
+    if match.group('list'):
+        return f"https://www.youtube.com/playlist?list={match.group('list')}"
+    return f"https://www.youtube.com/{match.group('channel')}{match.group('tab') or ''}"
+
+def is_link_line(line):
+    """是否为需要解析的行（空行和 # 开头的注释行不计入）"""
+    line = line.strip()
+    return bool(line) and not line.startswith('#')
+
+def parse_line(line):
+    """解析一行，返回 (规范链接列表, 拒绝原因)；一行中可以有多个链接，链接后的 priority=N 对该行全部链接生效"""
+    priority = None
+    if 'priority=' in line:
+        line, priority = split_priority(line)
+    links = [_canonical(match) for match in LINK_PATTERN.finditer(line)]
+    if not links:
+        if 'youtu' not in line.lower() or not HOST_PATTERN.search(line):
+            return [], REJECT_NOT_YOUTUBE
+        return [], REJECT_BAD_VIDEO_ID if VIDEO_ID_POSITION_PATTERN.search(line) else REJECT_UNSUPPORTED
+    if priority:
+        links = [f"{link} priority={priority}" for link in links]
+    return links, None
+
+def iter_links(lines, on_reject=None):
+    """逐行解析（lines 可以是打开的文件），按顺序生成规范链接
+
+    无法识别的行调用 on_reject(行号, 行内容, 原因)，空行和注释行直接跳过。
+    """
+    match_video = VIDEO_LINE_PATTERN.match
+    for number, line in enumerate(lines, 1):
+        match = match_video(line)
+        if match:
+            # 直接拼接规范链接（每行省去一次函数调用，百万行的文件约快两成）
+            yield VIDEO_URL_PREFIX + match.group(1)
+            continue
+        line = line.strip()
+        if not line or line[0] == '#':
+            continue
+        links, reason = parse_line(line)
+        if reason:
+            if on_reject:
+                on_reject(number, line, reason)
+            continue
+        yield from links
+
+def iter_link_file(file_path, on_reject=None):
+    """逐行读取并解析链接文件（兼容带 BOM 的 UTF-8 文件）"""
+    with open(file_path, 'r', encoding='utf-8-sig', errors='replace') as file:
+        yield from iter_links(file, on_reject)
+
+def count_link_lines(file_path):
+    """链接文件中需要解析的行数（用作批次总数，边下载边按实际链接数修正）"""
+    with open(file_path, 'r', encoding='utf-8-sig', errors='replace') as file:
+        return sum(1 for line in file if is_link_line(line))
+
+def find_links(text):
+    """从粘贴的文本中找出全部链接（空格或换行分隔均可），返回 (规范链接列表, [(行号, 行内容, 原因)])"""
+    rejected = []
+    links = list(iter_links(text.splitlines(), lambda number, line, reason: rejected.append((number, line, reason))))
+    return links, rejected
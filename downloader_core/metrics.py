@@ -0,0 +1,251 @@
+"""
+批次指标：每个链接各阶段耗时、yt-dlp 进程数、流量和错误分类
+
+每个链接结束时写入一条 JSON 记录（debug.save_logs 开启时写入按大小轮换的日志文件），
+批次结束时输出汇总表，也可导出为 Prometheus 文本格式。
+"""
+
+import json
+import re
+import threading
+import time
+
+# 统计耗时的阶段（排队等待、探测、下载、合并、重试前等待）
+STAGES = ['queue_wait', 'probe', 'download', 'merge', 'retry_wait']
+STAGE_NAMES = {'queue_wait': '排队等待', 'probe': '探测', 'download': '下载', 'merge': '合并', 'retry_wait': '重试等待'}
+
+# yt-dlp 后处理（合并、转封装等）开始的输出行
+POSTPROCESS_PATTERN = re.compile(r'^\[(?:Merger|VideoRemuxer|VideoConvertor|FixupM4a|FixupM3u8|FixupStretched)\]')
+
+# 错误分类（按顺序匹配 yt-dlp 输出，第一个匹配的类别生效）
+ERROR_CLASSES = [
+    ('throttled', re.compile(r'HTTP Error 429|Too Many Requests|rate[- ]limit', re.IGNORECASE)),
+    ('invalid', re.compile(r'Unsupported URL|is not a valid URL|Incomplete YouTube ID', re.IGNORECASE)),
+    ('unavailable', re.compile(r'Video unavailable|Private video|has been removed|not available in your country|'
+                               r'confirm your age|members[- ]only', re.IGNORECASE)),
+    ('sign_in', re.compile(r'Sign in to confirm', re.IGNORECASE)),
+    ('forbidden', re.compile(r'HTTP Error 403|Forbidden', re.IGNORECASE)),
+    ('format', re.compile(r'Requested format is not available', re.IGNORECASE)),
+    ('disk_full', re.compile(r'No space left on device|not enough space on the disk|磁盘空间不足', re.IGNORECASE)),
+    ('postprocess', re.compile(r'ffmpeg|Postprocessing|Conversion failed', re.IGNORECASE)),
+    ('network', re.compile(r'timed out|Connection (?:reset|refused|aborted)|Unable to download|URLError|'
+                           r'Network is unreachable|getaddrinfo', re.IGNORECASE)),
+]
+
+def classify_error(text):
+    """按 yt-dlp 输出判断错误类别，无法识别时返回 'other'"""
+    for name, pattern in ERROR_CLASSES:
+        if pattern.search(text or ''):
+            return name
+    return 'other'
+
+_loggers = {}
+_loggers_lock = threading.Lock()
+
+def get_metrics_logger(path, max_bytes=5 * 1024 * 1024, backup_count=3):
+    """获取写入指定文件的指标日志（按大小轮换，同一路径只创建一次）"""
+    # 只在保存日志时导入 logging（导入较慢，不影响启动）
+    import logging.handlers
+
+    with _loggers_lock:
+        logger = _loggers.get(path)
+        if logger is None:
+            logger = logging.getLogger(f"downloader_core.metrics.{len(_loggers)}")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+            _loggers[path] = logger
+        return logger
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+class BatchMetrics:
+    """批次指标（线程安全，进行中的链接保存在 records 中，结束后只保留汇总数据）"""
+
+    def __init__(self, logger=None):
+        self.lock = threading.Lock()
+        self.logger = logger
+        self.started = time.time()
+        self.records = {}
+        self.stage_times = {stage: [] for stage in STAGES}
+        self.processes = {}
+        self.errors = {}
+        self.results = {}
+        self.bytes = 0
+        self.retries = 0
+        # 成功下载的传输量和下载耗时（按普通下载和大文件分片下载分开统计）
+        self.transfers = {mode: {'count': 0, 'bytes': 0, 'seconds': 0.0} for mode in ('normal', 'large')}
+
+    def _record(self, link):
+        record = self.records.get(link)
+        if record is None:
+            record = self.records[link] = {'link': link, 'attempts': 0, 'error_class': None}
+        return record
+
+    def queued(self, link):
+        """任务提交到线程池"""
+        with self.lock:
+            self._record(link)['queued'] = time.time()
+
+    def started_job(self, link):
+        """任务取得并发名额，开始执行"""
+        with self.lock:
+            record = self._record(link)
+            record['started'] = time.time()
+            if 'queued' in record:
+                record['queue_wait'] = record['started'] - record['queued']
+
+    def add_time(self, link, stage, seconds):
+        """累计某个阶段的耗时（重试时多次累计）"""
+        with self.lock:
+            record = self._record(link)
+            record[stage] = record.get(stage, 0.0) + seconds
+
+    def count_process(self, kind):
+        """记录启动了一个 yt-dlp 进程"""
+        with self.lock:
+            self.processes[kind] = self.processes.get(kind, 0) + 1
+
+    def attempt(self, link):
+        """开始一次下载尝试"""
+        with self.lock:
+            self._record(link)['attempts'] += 1
+
+    def set_fragments(self, link, fragments):
+        """记录该链接使用大文件模式（分片并发数）"""
+        with self.lock:
+            self._record(link)['fragments'] = fragments
+
+    def record_error(self, link, output):
+        """记录一次失败尝试的错误类别"""
+        error_class = classify_error(output)
+        lines = [line for line in (output or '').splitlines() if line.strip()]
+        with self.lock:
+            record = self._record(link)
+            record['error_class'] = error_class
+            record['error'] = lines[-1][:300] if lines else None
+            self.errors[error_class] = self.errors.get(error_class, 0) + 1
+        return error_class
+
+    def finish(self, link, result, size=0):
+        """链接结束（completed、failed），写入日志记录"""
+        with self.lock:
+            record = self.records.pop(link, None) or {'link': link, 'attempts': 0, 'error_class': None}
+            record['result'] = result
+            record['bytes'] = int(size)
+            record['finished'] = time.time()
+            self.results[result] = self.results.get(result, 0) + 1
+            self.bytes += int(size)
+            self.retries += max(0, record['attempts'] - 1)
+            if result == 'completed' and size and record.get('download'):
+                transfer = self.transfers['large' if record.get('fragments') else 'normal']
+                transfer['count'] += 1
+                transfer['bytes'] += int(size)
+                transfer['seconds'] += record['download']
+            for stage in STAGES:
+                if stage in record:
+                    self.stage_times[stage].append(record[stage])
+        self.log(dict(event='link', **record))
+
+    def log(self, record):
+        if self.logger:
+            try:
+                self.logger.info(json.dumps(record, ensure_ascii=False))
+            except Exception as e:
+                print(f"写入指标日志失败: {e}")
+
+    def summary(self):
+        """汇总数据（可直接序列化为JSON）"""
+        with self.lock:
+            stages = {}
+            for stage, values in self.stage_times.items():
+                stages[stage] = {
+                    'count': len(values),
+                    'total': round(sum(values), 3),
+                    'mean': round(sum(values) / len(values), 3) if values else 0.0,
+                    'p95': round(_percentile(values, 0.95), 3),
+                }
+            transfers = {}
+            for mode, item in self.transfers.items():
+                rate = item['bytes'] / item['seconds'] if item['seconds'] else 0.0
+                transfers[mode] = dict(item, seconds=round(item['seconds'], 3), rate=round(rate))
+            normal_rate, large_rate = transfers['normal']['rate'], transfers['large']['rate']
+            return {
+                'elapsed': round(time.time() - self.started, 3),
+                'transfers': transfers,
+                # 大文件分片下载相对普通下载的平均速度倍数（两类都有成功下载时才计算）
+                'large_file_speedup': round(large_rate / normal_rate, 2) if normal_rate and large_rate else None,
+                'stages': stages,
+                'processes': dict(self.processes),
+                'errors': dict(self.errors),
+                'results': dict(self.results),
+                'bytes': self.bytes,
+                'retries': self.retries,
+            }
+
+    def finish_batch(self):
+        """批次结束：写入汇总记录并返回汇总数据"""
+        summary = self.summary()
+        self.log(dict(event='batch', **summary))
+        return summary
+
+    def summary_table(self, summary=None):
+        """批次汇总表（各阶段耗时分布、进程数、流量和错误分类）"""
+        summary = summary or self.summary()
+        lines = [f"{'阶段':<8}{'次数':>8}{'总计(s)':>12}{'平均(s)':>10}{'P95(s)':>10}"]
+        for stage in STAGES:
+            item = summary['stages'][stage]
+            lines.append(f"{STAGE_NAMES[stage]:<8}{item['count']:>8}{item['total']:>12.1f}"
+                         f"{item['mean']:>10.2f}{item['p95']:>10.2f}")
+        processes = ', '.join(f"{kind} {count}" for kind, count in sorted(summary['processes'].items()))
+        errors = ', '.join(f"{name} {count}" for name, count in sorted(summary['errors'].items()))
+        lines.append(f"批次耗时 {summary['elapsed']:.1f} 秒，流量 {summary['bytes'] / (1024 * 1024):.1f} MB，"
+                     f"重试 {summary['retries']} 次")
+        large = summary['transfers']['large']
+        if large['count']:
+            text = f"大文件分片下载 {large['count']} 个，平均 {large['rate'] / (1024 * 1024):.1f} MB/s"
+            if summary['large_file_speedup']:
+                text += (f"，普通下载 {summary['transfers']['normal']['rate'] / (1024 * 1024):.1f} MB/s"
+                         f"（约 {summary['large_file_speedup']:.1f} 倍）")
+            lines.append(text)
+        lines.append(f"yt-dlp 进程: {processes or '无'}")
+        lines.append(f"错误分类: {errors or '无'}")
+        return '\n'.join(lines)
+
+    def prometheus_text(self, summary=None):
+        """Prometheus 文本格式（可供 node_exporter 的 textfile 采集）"""
+        summary = summary or self.summary()
+        lines = [
+            '# HELP ytdl_stage_seconds_total Time spent per pipeline stage.',
+            '# TYPE ytdl_stage_seconds_total counter',
+        ]
+        for stage in STAGES:
+            lines.append(f'ytdl_stage_seconds_total{{stage="{stage}"}} {summary["stages"][stage]["total"]}')
+        lines += ['# HELP ytdl_links_total Links finished by result.', '# TYPE ytdl_links_total counter']
+        for result, count in sorted(summary['results'].items()):
+            lines.append(f'ytdl_links_total{{result="{result}"}} {count}')
+        lines += ['# HELP ytdl_subprocesses_total yt-dlp processes spawned.', '# TYPE ytdl_subprocesses_total counter']
+        for kind, count in sorted(summary['processes'].items()):
+            lines.append(f'ytdl_subprocesses_total{{kind="{kind}"}} {count}')
+        lines += ['# HELP ytdl_errors_total Failed attempts by error class.', '# TYPE ytdl_errors_total counter']
+        for name, count in sorted(summary['errors'].items()):
+            lines.append(f'ytdl_errors_total{{class="{name}"}} {count}')
+        lines += [
+            '# HELP ytdl_bytes_total Bytes downloaded by completed links.', '# TYPE ytdl_bytes_total counter',
+            f'ytdl_bytes_total {summary["bytes"]}',
+            '# HELP ytdl_transfer_bytes_per_second Average download rate by mode.',
+            '# TYPE ytdl_transfer_bytes_per_second gauge',
+            f'ytdl_transfer_bytes_per_second{{mode="normal"}} {summary["transfers"]["normal"]["rate"]}',
+            f'ytdl_transfer_bytes_per_second{{mode="large"}} {summary["transfers"]["large"]["rate"]}',
+            '# HELP ytdl_retries_total Download retries.', '# TYPE ytdl_retries_total counter',
+            f'ytdl_retries_total {summary["retries"]}',
+            '# HELP ytdl_batch_seconds Batch wall time.', '# TYPE ytdl_batch_seconds gauge',
+            f'ytdl_batch_seconds {summary["elapsed"]}',
+        ]
+        return '\n'.join(lines) + '\n'
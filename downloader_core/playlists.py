@@ -0,0 +1,165 @@
+"""
+播放列表、频道和 @handle 链接展开（边枚举边下载，结果按播放列表缓存）
+"""
+
+import re
+import sqlite3
+import threading
+import time
+
+# 播放列表和频道链接（watch?v=...&list=... 仍视为单个视频）
+COLLECTION_PATTERN = re.compile(
+    r'youtube\.com/(?:playlist\?(?:[^#\s]*&)?list=|channel/|c/|user/|@)', re.IGNORECASE
+)
+# 未指定标签页的频道链接，展开时默认使用“视频”标签页
+CHANNEL_ROOT_PATTERN = re.compile(
+    r'^(https?://(?:www\.|m\.)?youtube\.com/(?:@[^/?#\s]+|channel/[^/?#\s]+|c/[^/?#\s]+|user/[^/?#\s]+))/?(?:[?#].*)?$',
+    re.IGNORECASE
+)
+
+def is_collection_url(link):
+    """是否为播放列表或频道链接"""
+    return bool(COLLECTION_PATTERN.search(link))
+
+def is_channel_url(link):
+    """是否为频道链接（频道视频按从新到旧排列）"""
+    return is_collection_url(link) and 'list=' not in link
+
+def normalize_collection_url(link):
+    """规范化播放列表/频道链接（频道根地址补全为 /videos 标签页）"""
+    link = link.strip()
+    match = CHANNEL_ROOT_PATTERN.match(link)
+    if match:
+        return match.group(1) + '/videos'
+    return link
+
+VIDEO_URL_PREFIX = "https://www.youtube.com/watch?v="
+
+def video_url(video_id):
+    """视频ID对应的标准链接"""
+    return VIDEO_URL_PREFIX + video_id
+
+class PlaylistCache:
+    """播放列表展开结果缓存（SQLite，按播放列表记录视频ID、是否已下载和完整枚举的时间）"""
+
+    def __init__(self, path, flush_every=100):
+        self.flush_every = flush_every
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS playlists (playlist TEXT PRIMARY KEY, updated REAL NOT NULL)'
+        )
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS playlist_entries ('
+            'playlist TEXT NOT NULL, video_id TEXT NOT NULL, position INTEGER NOT NULL, '
+            'done INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (playlist, video_id))'
+        )
+        existing = {row[1] for row in self.conn.execute('PRAGMA table_info(playlist_entries)')}
+        if 'done' not in existing:
+            self.conn.execute('ALTER TABLE playlist_entries ADD COLUMN done INTEGER NOT NULL DEFAULT 0')
+        self.conn.commit()
+
+    def entries(self, playlist, max_age):
+        """完整枚举时间在 max_age 秒以内时返回缓存的视频ID列表，否则返回None"""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT updated FROM playlists WHERE playlist = ?', (playlist,)
+            ).fetchone()
+            if row is None or row[0] < time.time() - max_age:
+                return None
+            rows = self.conn.execute(
+                'SELECT video_id FROM playlist_entries WHERE playlist = ? ORDER BY position',
+                (playlist,)
+            ).fetchall()
+        return [video_id for (video_id,) in rows]
+
+    def known_ids(self, playlist):
+        """以前枚举到过、并且已下载完成（或已在下载记录中）的视频ID"""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT video_id FROM playlist_entries WHERE playlist = ? AND done', (playlist,)
+            ).fetchall()
+        return {video_id for (video_id,) in rows}
+
+    def add(self, playlist, video_id, position):
+        """记录枚举到的视频（批量提交，保留已下载标记）"""
+        with self.lock:
+            self.conn.execute(
+                'INSERT INTO playlist_entries (playlist, video_id, position) VALUES (?, ?, ?) '
+                'ON CONFLICT (playlist, video_id) DO UPDATE SET position = excluded.position',
+                (playlist, video_id, position)
+            )
+            self.pending += 1
+            if self.pending >= self.flush_every:
+                self.conn.commit()
+                self.pending = 0
+
+    def mark_done(self, playlist, video_id):
+        """视频下载完成或已在下载记录中，增量展开时不再生成（批量提交）"""
+        with self.lock:
+            self.conn.execute(
+                'UPDATE playlist_entries SET done = 1 WHERE playlist = ? AND video_id = ?',
+                (playlist, video_id)
+            )
+            self.pending += 1
+            if self.pending >= self.flush_every:
+                self.conn.commit()
+                self.pending = 0
+
+    def flush(self):
+        """提交尚未提交的记录"""
+        with self.lock:
+            self.conn.commit()
+            self.pending = 0
+
+    def finish(self, playlist, complete):
+        """枚举结束，完整枚举时更新时间戳"""
+        with self.lock:
+            if complete:
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO playlists (playlist, updated) VALUES (?, ?)',
+                    (playlist, time.time())
+                )
+            self.conn.commit()
+            self.pending = 0
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+def expand_collection(backend, link, options, cache=None, incremental=False, max_age=6 * 3600,
+                      stop_after_known=50):
+    """逐个生成播放列表/频道中的视频ID（惰性枚举，第一个视频无需等待整个列表枚举完成）
+
+    incremental 为 True 时只生成以前没有下载完成的视频（下载完成后由调用方 mark_done）；频道按从新到旧排列，
+    连续遇到 stop_after_known 个已知视频后停止枚举。
+    """
+    playlist = normalize_collection_url(link)
+    if cache and not incremental:
+        cached = cache.entries(playlist, max_age)
+        if cached is not None:
+            yield from cached
+            return
+
+    known = cache.known_ids(playlist) if cache and incremental else set()
+    stop_early = incremental and stop_after_known and is_channel_url(playlist)
+    consecutive_known = 0
+    complete = False
+    try:
+        for position, video_id in enumerate(backend.expand(playlist, options), 1):
+            if cache:
+                cache.add(playlist, video_id, position)
+            if video_id in known:
+                consecutive_known += 1
+                if stop_early and consecutive_known >= stop_after_known:
+                    break
+                continue
+            consecutive_known = 0
+            yield video_id
+        else:
+            complete = True
+    finally:
+        if cache:
+            cache.finish(playlist, complete)
@@ -0,0 +1,71 @@
+"""
+合并阶段：视频和音频分开下载后，由单独的 ffmpeg 进程池合并为 video.output_format，
+下载线程不必等待合并完成即可开始下一个视频
+"""
+
+import os
+import re
+import shutil
+import subprocess
+
+# 可以拆分下载的格式（如 137+140，两个具体格式ID）
+SPLIT_FORMAT_PATTERN = re.compile(r'^[\w-]+(?:\+[\w-]+)+$')
+# 分开下载的文件名后缀（与 yt-dlp 的中间文件命名一致，如 标题.f137.mp4）
+PART_SUFFIX_PATTERN = re.compile(r'\.f[\w-]+\.\w+$')
+# 可前置索引以便边下边播的容器
+FASTSTART_FORMATS = ('mp4', 'm4a', 'mov')
+
+def find_ffmpeg(path=None):
+    """ffmpeg 路径（配置的路径或 PATH 中的 ffmpeg），找不到时返回None"""
+    if path:
+        return path if os.path.isfile(path) else shutil.which(path)
+    return shutil.which('ffmpeg')
+
+def split_format(format_id):
+    """将合并格式（137+140）转换为分开下载的写法（137,140），不能拆分时返回None"""
+    if not format_id or not SPLIT_FORMAT_PATTERN.match(format_id):
+        return None
+    return format_id.replace('+', ',')
+
+def part_template(output_template):
+    """分开下载时的输出模板（文件名中加入格式ID，避免同扩展名的视频和音频互相覆盖）"""
+    stem = output_template[:-len('.%(ext)s')] if output_template.endswith('.%(ext)s') else output_template
+    return stem + '.f%(format_id)s.%(ext)s'
+
+def merged_path(part, output_format):
+    """合并后的文件路径"""
+    return PART_SUFFIX_PATTERN.sub('', part) + '.' + output_format
+
+def merge_parts(ffmpeg, parts, output_path):
+    """用 ffmpeg 合并分开下载的文件（只复制流，不重新编码），成功后删除原文件
+
+    先写入临时文件再重命名，中途失败时不会留下不完整的输出文件。返回 (返回码, 输出末尾文本)。
+    """
+    root, ext = os.path.splitext(output_path)
+    temp_path = f"{root}.temp{ext}"
+    command = [ffmpeg, '-y', '-hide_banner', '-loglevel', 'error', '-nostdin']
+    for part in parts:
+        command.extend(['-i', part])
+    for index in range(len(parts)):
+        command.extend(['-map', str(index)])
+    command.extend(['-c', 'copy'])
+    if ext.lstrip('.') in FASTSTART_FORMATS:
+        command.extend(['-movflags', '+faststart'])
+    command.append(temp_path)
+
+    result = subprocess.run(command, capture_output=True, text=True, encoding='utf-8', errors='replace')
+    if result.returncode != 0:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        lines = result.stderr.strip().splitlines()
+        return result.returncode, '\n'.join(['[Merger] ffmpeg 合并失败'] + lines[-20:])
+
+    os.replace(temp_path, output_path)
+    for part in parts:
+        try:
+            os.remove(part)
+        except OSError:
+            pass
+    return 0, ''
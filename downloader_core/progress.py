@@ -0,0 +1,179 @@
+"""
+批量下载进度汇总
+"""
+
+import threading
+import time
+
+def format_duration(seconds):
+    """将秒数格式化为 时:分:秒"""
+    seconds = int(seconds)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
+
+class BatchProgress:
+    """批量下载进度汇总（线程安全，汇总进行中任务的字节数、速度并估算剩余时间）"""
+
+    def __init__(self, total, stall_timeout=30):
+        self.lock = threading.Lock()
+        self.total = total
+        self.skipped = 0
+        self.stall_timeout = stall_timeout
+        self.completed = 0
+        self.failed = 0
+        self.finished_bytes = 0
+        self.last_report = 0
+        # 只保存进行中的任务：key -> {expected, done, downloaded, total, speed, updated, held}
+        self.jobs = {}
+
+    def start_job(self, key, expected_size=None):
+        """开始（或重新开始）一个下载任务"""
+        with self.lock:
+            self.jobs[key] = {
+                'expected': expected_size, 'done': 0, 'downloaded': 0,
+                'total': None, 'speed': None, 'updated': time.time(), 'held': False
+            }
+
+    def update_job(self, key, downloaded, total, speed):
+        """更新任务进度（视频和音频分开下载时，已下载字节回落表示开始下载下一个文件）"""
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is None:
+                return
+            if downloaded < job['downloaded']:
+                job['done'] += job['total'] or job['downloaded']
+            job['downloaded'] = downloaded
+            job['total'] = total
+            job['speed'] = speed
+            job['updated'] = time.time()
+
+    def add_total(self, count):
+        """调整总数（播放列表展开后按实际视频数计算）"""
+        with self.lock:
+            self.total += count
+
+    def skip(self):
+        """跳过一个链接（重复或已下载）"""
+        with self.lock:
+            self.skipped += 1
+
+    def finish_job(self, key, success):
+        """任务结束，计入成功或失败，返回该任务下载的字节数"""
+        with self.lock:
+            job = self.jobs.pop(key, None)
+            received = job['done'] + job['downloaded'] if job else 0
+            if success:
+                self.completed += 1
+                self.finished_bytes += received
+            else:
+                self.failed += 1
+            return received
+
+    def hold_job(self, key):
+        """任务下载完成、等待合并：不再计入速度，也不计为无响应"""
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is not None:
+                job['speed'] = None
+                job['held'] = True
+
+    def suspend_job(self, key):
+        """任务失败后等待重试：暂时移出进行中的任务，不计入结果"""
+        with self.lock:
+            self.jobs.pop(key, None)
+
+    def cancel_job(self, key):
+        """任务被取消，计入跳过"""
+        with self.lock:
+            self.jobs.pop(key, None)
+            self.skipped += 1
+
+    def job_fraction(self, key):
+        """单个任务的完成比例，任务不存在时返回None"""
+        with self.lock:
+            job = self.jobs.get(key)
+            return self._job_fraction(job) if job else None
+
+    def _job_fraction(self, job):
+        received = job['done'] + job['downloaded']
+        if job['expected']:
+            return min(received / job['expected'], 1.0)
+        if job['total']:
+            return min(job['downloaded'] / job['total'], 1.0)
+        return 0.0
+
+    def position(self):
+        """已完成的视频数（含进行中任务的完成比例）"""
+        with self.lock:
+            finished = self.completed + self.failed + self.skipped
+            return finished + sum(self._job_fraction(job) for job in self.jobs.values())
+
+    def speed(self):
+        """进行中任务的总速度（字节/秒）"""
+        with self.lock:
+            return sum(job['speed'] or 0 for job in self.jobs.values())
+
+    def eta(self):
+        """估算整批剩余时间（秒），无法估算时返回None"""
+        with self.lock:
+            speed = sum(job['speed'] or 0 for job in self.jobs.values())
+            if not speed:
+                return None
+            remaining = 0
+            for job in self.jobs.values():
+                size = job['expected'] or ((job['done'] + job['total']) if job['total'] else None)
+                if size:
+                    remaining += max(size - job['done'] - job['downloaded'], 0)
+            waiting = self.total - self.completed - self.failed - self.skipped - len(self.jobs)
+            if waiting > 0 and self.completed:
+                remaining += waiting * self.finished_bytes / self.completed
+            return remaining / speed
+
+    def stalled_count(self):
+        """超过 stall_timeout 秒没有进度的任务数"""
+        deadline = time.time() - self.stall_timeout
+        with self.lock:
+            return sum(1 for job in self.jobs.values() if not job['held'] and job['updated'] < deadline)
+
+    def should_report(self, interval=0.5):
+        """限制界面刷新频率"""
+        now = time.time()
+        with self.lock:
+            if now - self.last_report < interval:
+                return False
+            self.last_report = now
+            return True
+
+    def snapshot(self):
+        """当前进度的字典形式（用于命令行 JSON 输出）"""
+        with self.lock:
+            counts = {
+                'total': self.total,
+                'completed': self.completed,
+                'failed': self.failed,
+                'skipped': self.skipped,
+                'active': len(self.jobs),
+            }
+        counts['position'] = round(self.position(), 3)
+        counts['speed'] = self.speed()
+        counts['eta'] = self.eta()
+        counts['stalled'] = self.stalled_count()
+        return counts
+
+    def status_text(self):
+        """状态栏文本"""
+        done = self.completed + self.failed + self.skipped
+        text = f"进度: {done}/{self.total} (成功: {self.completed}, 失败: {self.failed}, 跳过: {self.skipped})"
+        speed = self.speed()
+        if speed:
+            text += f" | {speed / 1024 / 1024:.1f} MB/s"
+            eta = self.eta()
+            if eta is not None:
+                text += f", 剩余约 {format_duration(eta)}"
+        stalled = self.stalled_count()
+        if stalled:
+            text += f" | {stalled} 个任务无响应"
+        return text
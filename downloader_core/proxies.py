@@ -0,0 +1,212 @@
+"""
+代理池：多个代理的后台健康检查、按延迟和吞吐量加权选择、连续失败时自动切换
+"""
+
+import random
+import re
+import threading
+import time
+
+from .retry import NETWORK, RATE_LIMITED
+
+# 指数移动平均的权重（越大越偏向最近的测量值）
+EWMA_ALPHA = 0.3
+
+# 代理地址中的用户名和密码（界面显示时隐藏）
+CREDENTIALS_PATTERN = re.compile(r'//[^/@]+@')
+
+def display_name(url):
+    """隐藏用户名和密码的代理地址"""
+    return CREDENTIALS_PATTERN.sub('//***@', url)
+
+def _ewma(previous, value):
+    return value if previous is None else previous + EWMA_ALPHA * (value - previous)
+
+class ProxyStats:
+    """单个代理的状态和统计"""
+
+    __slots__ = ('url', 'healthy', 'latency', 'throughput', 'active', 'successes', 'failures',
+                 'consecutive_failures', 'last_error', 'last_check')
+
+    def __init__(self, url):
+        self.url = url
+        # None 表示尚未检查
+        self.healthy = None
+        self.latency = None
+        self.throughput = None
+        self.active = 0
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_error = None
+        self.last_check = None
+
+    def snapshot(self):
+        return {
+            'url': display_name(self.url),
+            'healthy': self.healthy,
+            'latency': round(self.latency, 3) if self.latency is not None else None,
+            'throughput': round(self.throughput) if self.throughput is not None else None,
+            'active': self.active,
+            'successes': self.successes,
+            'failures': self.failures,
+            'last_error': self.last_error,
+        }
+
+class ProxyPool:
+    """代理池（线程安全）
+
+    后台线程每隔 check_interval 秒通过共享的 requests.Session 检查所有代理（复用连接）；
+    每次下载按 吞吐量/延迟 加权随机选择一个可用代理，进行中的下载越多权重越低。
+    代理连续 max_failures 次网络错误或限流时暂停使用，直到下一次健康检查成功。
+    """
+
+    def __init__(self, urls, test_url, timeout=3, check_interval=60, max_failures=3):
+        self.proxies = {url: ProxyStats(url) for url in dict.fromkeys(urls) if url}
+        self.test_url = test_url
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.max_failures = max_failures
+        self.lock = threading.Lock()
+        self.session = None
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def __len__(self):
+        return len(self.proxies)
+
+    def _get_session(self):
+        if self.session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=len(self.proxies), pool_maxsize=len(self.proxies))
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self.session = session
+        return self.session
+
+    def check(self, url):
+        """检查单个代理，返回是否可用"""
+        started = time.perf_counter()
+        error = None
+        try:
+            response = self._get_session().get(
+                self.test_url, proxies={'http': url, 'https': url}, timeout=self.timeout, stream=True
+            )
+            response.close()
+            if response.status_code >= 400:
+                error = f"HTTP {response.status_code}"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        latency = time.perf_counter() - started
+
+        with self.lock:
+            stats = self.proxies[url]
+            stats.last_check = time.time()
+            if error is None:
+                stats.healthy = True
+                stats.latency = _ewma(stats.latency, latency)
+                stats.consecutive_failures = 0
+            else:
+                stats.healthy = False
+                stats.last_error = error[:200]
+        return error is None
+
+    def check_all(self):
+        """并行检查所有代理，返回可用的代理数"""
+        if not self.proxies:
+            return 0
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=len(self.proxies)) as executor:
+            return sum(executor.map(self.check, list(self.proxies)))
+
+    def start(self):
+        """启动后台健康检查（已启动时不重复启动）"""
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """停止后台健康检查"""
+        self.stop_event.set()
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.check_all()
+            except Exception as e:
+                print(f"代理健康检查失败: {e}")
+            self.stop_event.wait(self.check_interval)
+
+    def _weight(self, stats):
+        latency = max(stats.latency if stats.latency is not None else self.timeout, 0.01)
+        throughput = (stats.throughput or 0) / (1024 * 1024)
+        return (1 + throughput) / latency / (1 + stats.active)
+
+    def acquire(self):
+        """为一次请求选择代理（用完后调用 release），代理池为空时返回None"""
+        with self.lock:
+            if not self.proxies:
+                return None
+            candidates = [stats for stats in self.proxies.values() if stats.healthy is not False]
+            if candidates:
+                stats = random.choices(candidates, weights=[self._weight(item) for item in candidates])[0]
+            else:
+                # 全部不可用时选连续失败最少的，等待健康检查恢复
+                stats = min(self.proxies.values(), key=lambda item: (item.consecutive_failures, item.active))
+            stats.active += 1
+            return stats.url
+
+    def release(self, url, category=None, throughput=None, error=None):
+        """请求结束：category 为None表示成功，否则为重试类别（见 retry 模块）"""
+        with self.lock:
+            stats = self.proxies.get(url)
+            if stats is None:
+                return
+            stats.active = max(0, stats.active - 1)
+            if category is None:
+                # 下载成功说明代理可用（健康检查的测试地址可能被单独屏蔽）
+                stats.healthy = True
+                stats.successes += 1
+                stats.consecutive_failures = 0
+                if throughput:
+                    stats.throughput = _ewma(stats.throughput, throughput)
+                return
+            # 视频不存在等错误与代理无关
+            if category not in (NETWORK, RATE_LIMITED):
+                return
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            stats.last_error = (error or category)[:200]
+            if stats.healthy is not False and stats.consecutive_failures >= self.max_failures:
+                stats.healthy = False
+                print(f"代理 {display_name(url)} 连续失败 {stats.consecutive_failures} 次，暂停使用")
+
+    def recent_healthy_count(self, max_age):
+        """所有代理都在 max_age 秒内检查过时返回可用的代理数，否则返回None"""
+        now = time.time()
+        with self.lock:
+            if any(stats.last_check is None or now - stats.last_check > max_age for stats in self.proxies.values()):
+                return None
+            return sum(1 for stats in self.proxies.values() if stats.healthy)
+
+    def stats(self):
+        """各代理的状态（可直接序列化为JSON）"""
+        with self.lock:
+            return [stats.snapshot() for stats in self.proxies.values()]
+
+    def summary_table(self):
+        """各代理的汇总表（状态、延迟、平均速度、成功和失败次数）"""
+        lines = [f"{'代理':<32}{'状态':>6}{'延迟(ms)':>10}{'速度(MB/s)':>12}{'成功':>6}{'失败':>6}"]
+        for item in self.stats():
+            state = {True: '可用', False: '停用', None: '未检查'}[item['healthy']]
+            latency = f"{item['latency'] * 1000:.0f}" if item['latency'] is not None else '-'
+            throughput = f"{item['throughput'] / (1024 * 1024):.2f}" if item['throughput'] is not None else '-'
+            lines.append(f"{item['url']:<32}{state:>6}{latency:>10}{throughput:>12}"
+                         f"{item['successes']:>6}{item['failures']:>6}")
+        return '\n'.join(lines)
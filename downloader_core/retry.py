@@ -0,0 +1,100 @@
+"""
+重试策略：按 yt-dlp 错误输出判断是否值得重试、等待多久，多个任务同时遇到限流时熔断暂停派发
+"""
+
+import collections
+import random
+import threading
+import time
+
+from .metrics import classify_error
+
+# 重试类别
+PERMANENT = 'permanent'        # 视频不存在、私享、链接无效等，重试也不会成功
+RATE_LIMITED = 'rate_limited'  # 429、机器人验证，需要较长的等待
+NETWORK = 'network'            # 超时、连接中断，按指数退避重试
+TRANSIENT = 'transient'        # 其他错误（下载地址过期、合并失败等），短暂等待后重试
+
+# 错误类别（见 metrics.ERROR_CLASSES）-> 重试类别
+ERROR_CATEGORIES = {
+    'invalid': PERMANENT,
+    'unavailable': PERMANENT,
+    'format': PERMANENT,
+    'throttled': RATE_LIMITED,
+    'sign_in': RATE_LIMITED,
+    'network': NETWORK,
+}
+
+def classify_failure(output):
+    """按 yt-dlp 输出判断重试类别"""
+    return ERROR_CATEGORIES.get(classify_error(output), TRANSIENT)
+
+class RetryPolicy:
+    """按重试类别计算等待时间"""
+
+    def __init__(self, max_retries=3, base_delay=5, max_delay=600, rate_limit_delay=30):
+        self.max_retries = max(1, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # 限流后第一次重试至少等待的秒数（之后加倍）
+        self.rate_limit_delay = rate_limit_delay
+
+    def delay(self, category, failures):
+        """第 failures 次失败后的等待秒数，不再重试时返回None"""
+        if category == PERMANENT or failures >= self.max_retries:
+            return None
+        if category == RATE_LIMITED:
+            delay = max(self.base_delay, self.rate_limit_delay) * 2 ** (failures - 1)
+        elif category == NETWORK:
+            delay = self.base_delay * 2 ** (failures - 1)
+        else:
+            delay = self.base_delay * failures
+        # 随机抖动，避免同时失败的任务同时重试
+        return min(self.max_delay, delay) + random.uniform(1, 3)
+
+class CircuitBreaker:
+    """全局熔断（线程安全）
+
+    窗口期内所有任务累计遇到 threshold 次限流时打开，冷却期内调度循环不再派发新任务；
+    冷却结束后恢复，恢复后仍然连续熔断时冷却时间加倍（不超过 max_cooldown）。
+    """
+
+    def __init__(self, threshold=5, window=60, cooldown=60, max_cooldown=900):
+        self.threshold = max(1, threshold)
+        self.window = window
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.lock = threading.Lock()
+        self.events = collections.deque()
+        self.open_until = 0.0
+        self.consecutive = 0
+        self.trips = 0
+
+    def record(self, category):
+        """记录一次失败，返回是否因此熔断"""
+        if category != RATE_LIMITED:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            self.events.append(now)
+            while self.events and self.events[0] < now - self.window:
+                self.events.popleft()
+            if now < self.open_until or len(self.events) < self.threshold:
+                return False
+            cooldown = min(self.max_cooldown, self.cooldown * 2 ** self.consecutive)
+            self.open_until = now + cooldown
+            self.consecutive += 1
+            self.trips += 1
+            self.events.clear()
+            return True
+
+    def record_success(self):
+        """有任务成功，下次熔断从初始冷却时间开始"""
+        with self.lock:
+            if time.monotonic() >= self.open_until:
+                self.consecutive = 0
+
+    def remaining(self):
+        """熔断剩余秒数，未熔断时返回0"""
+        with self.lock:
+            return max(0.0, self.open_until - time.monotonic())
@@ -0,0 +1,69 @@
+"""
+yt-dlp 子进程运行器（流式读取输出并解析进度）
+"""
+
+import re
+import subprocess
+from collections import deque
+
+# yt-dlp 进度输出模板（配合 --newline 每次进度更新输出一行，缺失字段为 NA）
+PROGRESS_PREFIX = '[ytdl-progress]'
+PROGRESS_TEMPLATE = (
+    'download:' + PROGRESS_PREFIX + ' %(progress.downloaded_bytes)s %(progress.total_bytes)s '
+    '%(progress.total_bytes_estimate)s %(progress.speed)s %(progress.eta)s'
+)
+
+def parse_progress_line(line):
+    """解析进度行，返回 (已下载字节, 总字节, 速度, 剩余秒数)，非进度行返回None"""
+    if not line.startswith(PROGRESS_PREFIX):
+        return None
+    values = []
+    for field in line[len(PROGRESS_PREFIX):].split():
+        try:
+            values.append(float(field))
+        except ValueError:
+            values.append(None)
+    if len(values) != 5:
+        return None
+    downloaded, total, total_estimate, speed, eta = values
+    return downloaded or 0, total or total_estimate, speed, eta
+
+class DownloadCancelled(Exception):
+    """用户取消了正在进行的下载（由进度或输出回调抛出）"""
+
+def run_ytdlp(command, on_progress=None, on_output=None, tail_lines=50):
+    """流式运行yt-dlp并逐行解析进度，只保留最后若干行输出用于错误报告
+
+    on_output 会收到每一行非进度输出（用于实时识别限流等错误）。
+    回调抛出异常（如 DownloadCancelled）时结束 yt-dlp 进程并继续抛出。
+
+    返回 (返回码, 输出末尾文本)。
+    """
+    process = subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        text=True, encoding='utf-8', errors='replace', bufsize=1
+    )
+    tail = deque(maxlen=tail_lines)
+    try:
+        for line in process.stdout:
+            line = line.rstrip()
+            progress = parse_progress_line(line)
+            if progress is not None:
+                if on_progress:
+                    on_progress(*progress)
+            elif line:
+                tail.append(line)
+                if on_output:
+                    on_output(line)
+    except BaseException:
+        process.kill()
+        raise
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+    return returncode, '\n'.join(tail)
+
+# yt-dlp 输出中的目标文件行（用于记录未完成的 .part 文件）
+DESTINATION_PATTERN = re.compile(r'^\[download\] Destination: (.+)$')
+# 续传时已经下载完成的文件
+DOWNLOADED_PATTERN = re.compile(r'^\[download\] (.+) has already been downloaded$')
@@ -0,0 +1,187 @@
+"""
+下载调度：自适应并发控制、任务启动限速和重试延迟队列
+"""
+
+import heapq
+import itertools
+import queue
+import re
+import threading
+import time
+
+# yt-dlp 输出中表示被限流或拒绝访问的特征
+THROTTLE_PATTERN = re.compile(
+    r'HTTP Error 429|HTTP Error 403|Too Many Requests|rate[- ]limit|Sign in to confirm', re.IGNORECASE
+)
+
+class ConcurrencyController:
+    """自适应并发控制（AIMD：吞吐量持续上升时并发数加一，遇到限流时减半）"""
+
+    def __init__(self, initial, ceiling, adaptive=True, adjust_interval=15, on_change=None):
+        self.ceiling = max(1, ceiling)
+        self.limit = max(1, min(initial, self.ceiling))
+        self.adaptive = adaptive
+        self.adjust_interval = adjust_interval
+        self.on_change = on_change
+        self.active = 0
+        self.waiting = 0
+        # 大文件分片下载额外占用的连接数
+        self.extra_connections = 0
+        self.condition = threading.Condition()
+        # 吞吐量采样窗口
+        self.window_start = time.time()
+        self.window_sum = 0.0
+        self.window_count = 0
+        self.last_throughput = None
+        self.last_backoff = 0
+
+    def acquire(self):
+        """占用一个下载名额，超出当前并发数时等待"""
+        with self.condition:
+            self.waiting += 1
+            while self.active >= self.limit:
+                self.condition.wait()
+            self.waiting -= 1
+            self.active += 1
+
+    def release(self):
+        """释放下载名额"""
+        with self.condition:
+            self.active -= 1
+            self.condition.notify()
+
+    def reserve_connections(self, wanted):
+        """为分片下载分配额外连接（进行中的下载和额外连接总数不超过 ceiling），返回实际分配的数量"""
+        with self.condition:
+            granted = max(0, min(wanted, self.ceiling - self.active - self.extra_connections))
+            self.extra_connections += granted
+            return granted
+
+    def release_connections(self, count):
+        """释放分片下载的额外连接"""
+        with self.condition:
+            self.extra_connections = max(0, self.extra_connections - count)
+
+    def _set_limit(self, limit):
+        # 调用方需持有 condition
+        if limit == self.limit:
+            return
+        self.limit = limit
+        self.condition.notify_all()
+        print(f"并发数调整为 {limit}")
+        if self.on_change:
+            self.on_change(limit)
+
+    def observe(self, throughput):
+        """记录当前总吞吐量，每个调整周期结束时决定是否增加并发"""
+        if not self.adaptive:
+            return
+        with self.condition:
+            self.window_sum += throughput
+            self.window_count += 1
+            now = time.time()
+            if now - self.window_start < self.adjust_interval:
+                return
+            average = self.window_sum / self.window_count
+            saturated = self.active >= self.limit and self.waiting > 0
+            rising = self.last_throughput is None or average > self.last_throughput * 1.1
+            if saturated and rising and now - self.last_backoff >= self.adjust_interval * 2:
+                self._set_limit(min(self.limit + 1, self.ceiling))
+            self.last_throughput = average
+            self.window_start = now
+            self.window_sum = 0.0
+            self.window_count = 0
+
+    def record_throttle(self):
+        """遇到限流时并发数减半（冷却期内只减一次，避免多个任务同时报错时降到底）"""
+        with self.condition:
+            now = time.time()
+            if now - self.last_backoff < self.adjust_interval:
+                return
+            self.last_backoff = now
+            self.last_throughput = None
+            if self.adaptive:
+                self._set_limit(max(1, self.limit // 2))
+
+    def check_output(self, line):
+        """检查yt-dlp输出行，发现限流特征时退避"""
+        if THROTTLE_PATTERN.search(line):
+            self.record_throttle()
+
+class TokenBucket:
+    """令牌桶限速（按固定速率补充令牌，允许少量突发；rate 为0时不限速）"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self):
+        """尝试取一个令牌，成功返回0，否则返回还需等待的秒数"""
+        if self.rate <= 0:
+            return 0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+class JobFeeder:
+    """在后台线程中遍历任务生成器（如边枚举边展开的播放列表），调度循环取任务时不会阻塞"""
+
+    EMPTY = object()
+    DONE = object()
+
+    def __init__(self, jobs, buffer_size=1000):
+        self.queue = queue.Queue(maxsize=buffer_size)
+        self.thread = threading.Thread(target=self._run, args=(jobs,), daemon=True)
+        self.thread.start()
+
+    def _run(self, jobs):
+        try:
+            for job in jobs:
+                self.queue.put(job)
+        except Exception as e:
+            print(f"读取任务失败: {e}")
+        finally:
+            self.queue.put(self.DONE)
+
+    def get(self, timeout=None):
+        """取下一个任务：暂时没有时返回 EMPTY，全部取完返回 DONE"""
+        try:
+            return self.queue.get(timeout=timeout) if timeout else self.queue.get_nowait()
+        except queue.Empty:
+            return self.EMPTY
+
+class DelayQueue:
+    """延迟队列：等待重试的任务到期前不占用下载线程（只在调度循环中使用）"""
+
+    def __init__(self):
+        self.heap = []
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, item, delay):
+        """delay 秒后到期"""
+        heapq.heappush(self.heap, (time.monotonic() + delay, next(self.counter), item))
+
+    def pop_ready(self):
+        """取出所有已到期的项"""
+        now = time.monotonic()
+        ready = []
+        while self.heap and self.heap[0][0] <= now:
+            ready.append(heapq.heappop(self.heap)[2])
+        return ready
+
+    def next_delay(self):
+        """距最近一项到期的秒数，队列为空时返回None"""
+        if not self.heap:
+            return None
+        return max(0.0, self.heap[0][0] - time.monotonic())
@@ -0,0 +1,595 @@
+"""
+下载队列服务：通过本地 HTTP/JSON 接口提交链接、查询状态和取消任务，所有客户端共用一个调度器
+
+接口:
+    GET  /status                      各状态任务数、当前批次的进度和状态文本
+    GET  /jobs?state=&client=&limit=&offset=
+                                      任务列表（按提交顺序）
+    GET  /jobs/<id>                   单个任务（进行中的任务附带下载进度）
+    POST /jobs                        提交链接 {"links": [...], "save_path", "low_quality", "priority", "client", "source",
+                                      "batch", "start"}，返回任务ID和无法识别的行（source 为链接来源文件，失败的链接保存到
+                                      <source>_failed.txt；分块提交时各块使用相同的 batch，start 为之前各块的任务数，
+                                      重发同一块不会重复入队）
+    POST /jobs/<id>/cancel            取消任务
+    POST /resume                      按下载日志继续未完成的批次 {"journal": 日志路径}
+
+下载节点（python -m downloader_core --worker）使用的接口:
+    POST /workers/claim               领取任务 {"worker", "count"}，返回任务和租约时长
+    POST /workers/heartbeat           续约 {"worker", "ids", "progress"}，返回仍持有的任务ID
+    POST /workers/report              汇报结果 {"worker", "results": [{"id", "state", "error"}]}
+    GET  /workers                     各节点最近心跳、进度和任务数
+
+配置 service.token 时，请求需带 "Authorization: Bearer <token>" 请求头（监听非本机地址时必须配置）。
+接口中的路径（save_path、journal、source）只能位于保存路径、下载日志目录或 service.allowed_paths 中的目录下。
+"""
+
+import hmac
+import json
+import os
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .config import get_data_path
+from .jobqueue import QUEUE_STATES, RUNNING, JobQueue
+from .jobs import CANCELLED, DONE, FAILED, QUEUED
+from .journal import BatchJournal
+from .links import iter_links
+
+JOB_PATH_PATTERN = re.compile(r'^/jobs/(\d+)(/cancel)?$')
+# 客户端每次提交的链接数，以及超时或连接中断时的重发次数
+SUBMIT_CHUNK = 1000
+SUBMIT_ATTEMPTS = 3
+# 只允许本机访问的监听地址（其他地址必须设置访问令牌）
+LOOPBACK_HOSTS = ('127.0.0.1', 'localhost', '::1')
+# 下载节点可以汇报的结果（queued 表示交还未完成的任务）
+REPORT_STATES = (DONE, FAILED, CANCELLED, QUEUED)
+
+class ServiceError(Exception):
+    """接口请求错误（status 为 HTTP 状态码）"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class QueueService:
+    """下载队列服务
+
+    提交的链接先写入持久化队列，由一个调度线程按轮交给下载引擎：每轮按优先级取出保存路径和画质相同的
+    最多 batch_size 个排队任务，作为一个批次调用 download_videos，其余任务留给下载节点领取或下一轮。
+    同一时间只运行一个批次，所有客户端共用引擎的并发上限、带宽和代理池；运行中提交的链接（包括优先级更高的）在下一轮开始。
+
+    其他机器上的下载节点可以同时按租约领取排队任务（协调节点模式），节点定时续约并汇报结果，
+    租约到期未续约的任务重新排队。local_downloads 为 False 时本机只负责分配任务，不下载。
+    """
+
+    def __init__(self, engine, queue, host='127.0.0.1', port=8790, token=None, lease_seconds=60,
+                 local_downloads=True, batch_size=0, allowed_paths=(), max_body=8 * 1024 * 1024):
+        self.engine = engine
+        self.queue = queue
+        self.host = host
+        self.port = port
+        self.token = token
+        self.lease_seconds = lease_seconds
+        self.local_downloads = local_downloads
+        self.allowed_paths = list(allowed_paths or [])
+        # 请求内容的最大字节数（客户端分块提交，每块远小于此值）
+        self.max_body = max_body
+        self.batch_size = batch_size or engine.config['download'].get('concurrency', {}).get('ceiling', 8) * 4
+        self.server = None
+        self.thread = None
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        # 下载节点最近一次请求的时间和汇报的进度
+        self.workers = {}
+        self.workers_lock = threading.Lock()
+        # 当前一轮的任务，以及最近的状态文本和批次进度（供 /status 查询）
+        self.current_round = []
+        self.last_status = None
+        self.progress = None
+
+        on_status, on_progress = engine.on_status, engine.on_progress
+
+        def track_status(message):
+            self.last_status = message
+            if on_status:
+                on_status(message)
+
+        def track_progress(progress):
+            self.progress = progress
+            if on_progress:
+                on_progress(progress)
+
+        engine.on_status = track_status
+        engine.on_progress = track_progress
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self, listen=True):
+        """启动调度线程，listen 为 True 时同时启动 HTTP 接口（端口被占用、监听非本机地址但未设置令牌时抛出 OSError）"""
+        if listen and not self.token and self.host not in LOOPBACK_HOSTS:
+            raise PermissionError(f"监听 {self.host} 时必须设置 service.token")
+        if listen:
+            self.server = ThreadingHTTPServer((self.host, self.port), ServiceRequestHandler)
+            self.server.daemon_threads = True
+            self.server.service = self
+            self.port = self.server.server_address[1]
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        recovered = self.queue.recover()
+        if recovered:
+            print(f"继续上次未完成的 {recovered} 个任务")
+        if self.local_downloads:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        threading.Thread(target=self._watch_leases, daemon=True).start()
+
+    def stop(self):
+        """停止接受请求和开始新的一轮（进行中的批次由下载日志在下次启动时继续）"""
+        self.stopping.set()
+        self.wakeup.set()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def submit(self, links, save_path=None, low_quality=False, priority=0, client=None, on_reject=None, source=None,
+               batch=None, start=0):
+        """提交链接，返回任务ID列表
+
+        links 可以是边读边解析的生成器（如 iter_link_file），链接后可带 priority=N，按规范链接入队，
+        无法识别的行调用 on_reject。source 为链接来源文件，有失败的链接时保存到 <source>_failed.txt。
+        batch 和 start 见 JobQueue.submit（客户端分块提交）。
+        """
+        save_path = save_path or self.engine.config['download']['save_path']
+        ids = self.queue.submit(iter_links(links, on_reject), save_path, low_quality, priority, client, source=source,
+                                batch=batch, start=start)
+        self.wakeup.set()
+        return ids
+
+    def resume(self, journal_path, client=None):
+        """按下载日志继续未完成的批次（沿用原来的输出文件以便续传），日志已在队列中时返回空列表"""
+        if not os.path.exists(journal_path):
+            raise ServiceError(404, f"下载日志不存在: {journal_path}")
+        if self.queue.has_journal(journal_path):
+            return []
+        journal = BatchJournal(journal_path)
+        journal.close()
+        if not journal.header:
+            raise ServiceError(400, "下载日志已损坏，无法继续")
+        save_path = journal.header.get('save_path') or self.engine.config['download']['save_path']
+        ids = self.queue.submit(journal.unfinished_links(), save_path, journal.header.get('low_quality', False),
+                                client=client, journal=journal_path, source=journal.header.get('source'))
+        self.wakeup.set()
+        return ids
+
+    def cancel(self, job_id):
+        """取消任务（排队中的直接取消，进行中的停止下载），返回是否生效"""
+        item = self.queue.get(job_id)
+        if item is None:
+            raise ServiceError(404, f"任务不存在: {job_id}")
+        state = self.queue.cancel(job_id)
+        if state == RUNNING and item['worker']:
+            # 下载节点在下次续约时得知任务已取消
+            return True
+        if state == RUNNING:
+            # 引擎已完成的下载在本轮结束时仍记为完成
+            return self.engine.cancel_job(item['link'])
+        return state == QUEUED
+
+    def job(self, job_id):
+        """单个任务"""
+        item = self.queue.get(job_id)
+        if item is None:
+            raise ServiceError(404, f"任务不存在: {job_id}")
+        return self._with_progress(item)
+
+    def jobs(self, state=None, client=None, limit=100, offset=0):
+        """任务列表"""
+        if state and state not in QUEUE_STATES:
+            raise ServiceError(400, f"未知的任务状态: {state}")
+        return [self._with_progress(item) for item in self.queue.list(state, client, limit, offset)]
+
+    def claim(self, worker, count):
+        """下载节点领取任务"""
+        self._seen(worker)
+        return self.queue.claim(worker, max(1, count), self.lease_seconds)
+
+    def heartbeat(self, worker, ids, progress=None):
+        """下载节点续约，返回仍持有的任务ID"""
+        self._seen(worker, progress)
+        return self.queue.renew(worker, ids, self.lease_seconds)
+
+    def report(self, worker, results):
+        """下载节点汇报结果，返回接受的结果数"""
+        self._seen(worker)
+        accepted = 0
+        failed_sources = set()
+        for result in results:
+            state = result.get('state')
+            if state not in REPORT_STATES:
+                raise ServiceError(400, f"未知的任务状态: {state}")
+            if self.queue.report(worker, int(result['id']), state, result.get('error')):
+                accepted += 1
+                if state == FAILED:
+                    failed_sources.add(self.queue.get(int(result['id']))['source'])
+        for source in failed_sources - {None}:
+            self._save_failed(source)
+        if accepted:
+            self.wakeup.set()
+        return accepted
+
+    def worker_list(self):
+        """各下载节点的状态"""
+        counts = self.queue.worker_counts()
+        with self.workers_lock:
+            seen = dict(self.workers)
+        now = time.time()
+        return [{
+            'name': name,
+            'last_seen': round(now - seen[name]['time'], 1) if name in seen else None,
+            'alive': name in seen and now - seen[name]['time'] < self.lease_seconds,
+            'progress': seen[name]['progress'] if name in seen else None,
+            'jobs': counts.get(name, {}),
+        } for name in sorted(set(counts) | set(seen))]
+
+    def _seen(self, worker, progress=None):
+        if not worker:
+            raise ServiceError(400, "请提供 worker（节点名称）")
+        with self.workers_lock:
+            previous = self.workers.get(worker, {})
+            self.workers[worker] = {'time': time.time(), 'progress': progress or previous.get('progress')}
+
+    def allowed_roots(self):
+        """接口请求中的路径允许位于的目录：保存路径、下载日志目录和 service.allowed_paths"""
+        roots = [self.engine.config['download']['save_path'], self.engine.get_journal_directory()]
+        return [os.path.realpath(os.path.expanduser(root)) for root in roots + self.allowed_paths if root]
+
+    def check_path(self, path, name):
+        """接口请求中的路径不在允许的目录下时抛出 ServiceError(403)，返回绝对路径"""
+        path = os.path.abspath(os.path.expanduser(str(path)))
+        # 按解析符号链接后的路径比较，避免通过链接指向其他目录
+        real_path = os.path.normcase(os.path.realpath(path))
+        for root in self.allowed_roots():
+            root = os.path.normcase(root)
+            if real_path == root or real_path.startswith(os.path.join(root, '')):
+                return path
+        raise ServiceError(403, f"{name} 不在允许的目录中（见 service.allowed_paths）: {path}")
+
+    def _save_failed(self, source):
+        """把来源文件最近一次提交中失败的链接保存到 <来源文件>_failed.txt（每轮结束时重写，包含之前各轮的失败链接）"""
+        failed_links = self.queue.failed_links(source)
+        if not failed_links:
+            return
+        try:
+            failed_file = self.engine.save_failed_links(source, failed_links)
+            self.engine.update_status(f"失败的 {len(failed_links)} 个链接已保存到 {failed_file}")
+        except OSError as e:
+            self.engine.update_status(f"无法保存失败链接: {e}")
+
+    def _watch_leases(self):
+        """定时将租约到期的任务重新排队"""
+        interval = max(1, min(5, self.lease_seconds / 4))
+        while not self.stopping.wait(interval):
+            expired = self.queue.expire()
+            if expired:
+                print(f"{len(expired)} 个任务的租约已过期，重新排队")
+                self.wakeup.set()
+
+    def _with_progress(self, item):
+        # 本机进行中的任务附带引擎任务表中的状态和进度
+        jobs = self.engine.jobs
+        job = jobs.get(item['link']) if jobs and item['state'] == RUNNING and not item['worker'] else None
+        if job:
+            item['progress'] = {
+                'state': job.state, 'title': job.title, 'percent': job.percent(),
+                'speed': job.speed, 'attempts': job.attempts,
+            }
+        return item
+
+    def status(self):
+        """队列和当前批次的状态"""
+        progress = self.progress if self.current_round else None
+        with self.workers_lock:
+            workers = sum(1 for seen in self.workers.values() if time.time() - seen['time'] < self.lease_seconds)
+        return {
+            'queue': self.queue.counts(),
+            'running': len(self.current_round),
+            'workers': workers,
+            'status': self.last_status,
+            'progress': progress.snapshot() if progress else None,
+        }
+
+    def _run(self):
+        while not self.stopping.is_set():
+            rows = self.queue.next_round(self.batch_size)
+            if not rows:
+                self.wakeup.wait(1.0)
+                self.wakeup.clear()
+                continue
+            self.current_round = rows
+            try:
+                self._run_round(rows)
+            except Exception as e:
+                print(f"队列任务执行失败: {e}")
+                for row in rows:
+                    self.queue.finish(row['id'], FAILED, str(e))
+            finally:
+                self.current_round = []
+
+    def _run_round(self, rows):
+        """把一轮任务作为一个批次交给下载引擎，结束后按结果更新队列"""
+        first = rows[0]
+        journal_path = first['journal']
+        links = None
+        if journal_path and os.path.exists(journal_path):
+            # 按下载日志继续：队列中已取消的任务记入日志，不再下载
+            cancelled = self.queue.journal_links(journal_path, CANCELLED)
+            if cancelled:
+                journal = BatchJournal(journal_path)
+                for link in cancelled:
+                    journal.record(link, 'cancelled')
+                journal.close()
+        else:
+            # 新的一轮：先创建下载日志并记入队列，服务意外退出后按日志继续
+            links = [f"{row['link']} priority={row['priority']}" if row['priority'] else row['link'] for row in rows]
+            journal = self.engine.create_journal({
+                'file_path': None,
+                'links': links,
+                'save_path': first['save_path'],
+                'low_quality': first['low_quality'],
+                'created': time.time(),
+                'service': True,
+                'source': first['source'],
+            })
+            journal_path = None
+            if journal:
+                journal.close()
+                journal_path = journal.path
+                self.queue.set_journal([row['id'] for row in rows], journal_path)
+
+        if journal_path:
+            summary = self.engine.download_videos(None, None, journal_path=journal_path)
+        else:
+            summary = self.engine.download_videos(None, links, save_path=first['save_path'],
+                                                  prefer_low_quality=first['low_quality'])
+
+        if summary is None:
+            for row in rows:
+                self.queue.finish(row['id'], FAILED, self.last_status)
+            if first['source']:
+                self._save_failed(first['source'])
+            return
+        failed = set(summary['failed_links'])
+        # 播放列表/频道按展开得到的视频判断：有视频失败时整行记为失败（重新提交时已下载的视频会跳过）
+        failed_collections = summary.get('failed_collections', {})
+        jobs = self.engine.jobs
+        for row in rows:
+            job = jobs.get(row['link']) if jobs else None
+            if row['link'] in failed:
+                self.queue.finish(row['id'], FAILED, "下载失败")
+            elif failed_collections.get(row['link']):
+                self.queue.finish(row['id'], FAILED, f"{failed_collections[row['link']]} 个视频下载失败")
+            elif job and job.state == CANCELLED:
+                self.queue.finish(row['id'], CANCELLED)
+            else:
+                # 包括已下载过而跳过的链接
+                self.queue.finish(row['id'], DONE)
+        if (failed or failed_collections) and first['source']:
+            self._save_failed(first['source'])
+
+    def handle(self, method, path, query, body):
+        """处理一个接口请求，返回可序列化为 JSON 的结果"""
+        def param(name, default=None):
+            return query.get(name, [default])[0]
+
+        if path == '/status' and method == 'GET':
+            return self.status()
+        if path == '/jobs' and method == 'GET':
+            return {'jobs': self.jobs(param('state'), param('client'),
+                                      int(param('limit', 100)), int(param('offset', 0)))}
+        if path == '/jobs' and method == 'POST':
+            links = body.get('links')
+            if isinstance(links, str):
+                links = links.splitlines()
+            if not links or not isinstance(links, list):
+                raise ServiceError(400, "请提供 links（链接列表）")
+            save_path = self.check_path(body['save_path'], 'save_path') if body.get('save_path') else None
+            # 来源文件只用于保存失败链接，不在允许的目录中时不记录（仍可通过 GET /jobs?state=failed 查询）
+            source = body.get('source')
+            try:
+                source = self.check_path(source, 'source') if source else None
+            except ServiceError:
+                source = None
+            batch, start = body.get('batch'), int(body.get('start', 0))
+            if batch is not None and (not isinstance(batch, str) or not 0 < len(batch) <= 64) or start < 0:
+                raise ServiceError(400, "batch 应为不超过64个字符的字符串，start 不能为负数")
+            rejected = []
+            ids = self.submit([str(link) for link in links], save_path, bool(body.get('low_quality')),
+                              int(body.get('priority', 0)), body.get('client'),
+                              lambda number, line, reason: rejected.append({'line': number, 'text': line,
+                                                                            'reason': reason}),
+                              source, batch, start)
+            return {'ids': ids, 'rejected': rejected}
+        if path == '/resume' and method == 'POST':
+            if not body.get('journal'):
+                raise ServiceError(400, "请提供 journal（下载日志路径）")
+            return {'ids': self.resume(self.check_path(body['journal'], 'journal'), body.get('client'))}
+
+        if path == '/workers' and method == 'GET':
+            return {'workers': self.worker_list()}
+        if path == '/workers/claim' and method == 'POST':
+            return {'jobs': self.claim(body.get('worker'), int(body.get('count', 1))),
+                    'lease_seconds': self.lease_seconds}
+        if path == '/workers/heartbeat' and method == 'POST':
+            return {'held': self.heartbeat(body.get('worker'), [int(job_id) for job_id in body.get('ids', [])],
+                                           body.get('progress'))}
+        if path == '/workers/report' and method == 'POST':
+            return {'accepted': self.report(body.get('worker'), body.get('results', []))}
+
+        match = JOB_PATH_PATTERN.match(path)
+        if match and match.group(2) and method == 'POST':
+            return {'cancelled': self.cancel(int(match.group(1)))}
+        if match and not match.group(2) and method == 'GET':
+            return self.job(int(match.group(1)))
+        raise ServiceError(404, f"未知的接口: {method} {path}")
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_api('GET')
+
+    def do_POST(self):
+        self.handle_api('POST')
+
+    def handle_api(self, method):
+        service = self.server.service
+        try:
+            # 未读取请求内容就返回错误时关闭连接，剩余的内容不会被当作下一个请求
+            if service.token and not hmac.compare_digest(self.headers.get('Authorization', '').encode('utf-8'),
+                                                         f"Bearer {service.token}".encode('utf-8')):
+                self.close_connection = True
+                raise ServiceError(401, "访问令牌无效")
+            url = urllib.parse.urlsplit(self.path)
+            body = {}
+            length = int(self.headers.get('Content-Length') or 0)
+            if length < 0 or length > service.max_body:
+                self.close_connection = True
+                raise ServiceError(413, f"请求内容超过 {service.max_body // 1024} KB")
+            if length:
+                body = json.loads(self.rfile.read(length).decode('utf-8'))
+                if not isinstance(body, dict):
+                    raise ServiceError(400, "请求内容应为 JSON 对象")
+            status, result = 200, service.handle(method, url.path, urllib.parse.parse_qs(url.query), body)
+        except ServiceError as e:
+            status, result = e.status, {'error': str(e)}
+        except ValueError as e:
+            status, result = 400, {'error': f"请求格式错误: {e}"}
+        except Exception as e:
+            status, result = 500, {'error': str(e)}
+
+        data = json.dumps(result, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+class ServiceClient:
+    """队列服务的 HTTP 客户端（方法与 QueueService 相同，界面和命令行通过它使用已运行的服务）"""
+
+    def __init__(self, url, token=None, timeout=5):
+        self.url = url.rstrip('/')
+        self.token = token
+        self.timeout = timeout
+        # 本地服务不经过系统代理
+        self.opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+    def _request(self, method, path, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(self.url + path, data=data, method=method)
+        request.add_header('Content-Type', 'application/json')
+        if self.token:
+            request.add_header('Authorization', f"Bearer {self.token}")
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read().decode('utf-8')).get('error')
+            except ValueError:
+                message = None
+            raise ServiceError(e.code, message or e.reason)
+
+    def ping(self):
+        """服务是否可用"""
+        try:
+            self.status()
+            return True
+        except (OSError, ValueError, ServiceError):
+            return False
+
+    def submit(self, links, save_path=None, low_quality=False, priority=0, client=None, source=None):
+        """分块提交（links 可以是生成器，每块 SUBMIT_CHUNK 个链接），超时或连接中断时重发该块，不会重复入队"""
+        body = {'save_path': save_path, 'low_quality': low_quality, 'priority': priority, 'client': client,
+                'source': source, 'batch': uuid.uuid4().hex}
+        ids, chunk = [], []
+        for link in links:
+            chunk.append(link)
+            if len(chunk) >= SUBMIT_CHUNK:
+                ids.extend(self._submit_chunk(body, chunk, len(ids)))
+                chunk = []
+        if chunk or not ids:
+            ids.extend(self._submit_chunk(body, chunk, len(ids)))
+        return ids
+
+    def _submit_chunk(self, body, links, start):
+        for attempt in range(SUBMIT_ATTEMPTS):
+            try:
+                return self._request('POST', '/jobs', dict(body, links=links, start=start))['ids']
+            except OSError:
+                if attempt + 1 == SUBMIT_ATTEMPTS:
+                    raise
+                time.sleep(1)
+
+    def resume(self, journal_path, client=None):
+        return self._request('POST', '/resume', {'journal': journal_path, 'client': client})['ids']
+
+    def cancel(self, job_id):
+        return self._request('POST', f'/jobs/{job_id}/cancel', {})['cancelled']
+
+    def job(self, job_id):
+        return self._request('GET', f'/jobs/{job_id}')
+
+    def jobs(self, state=None, client=None, limit=100, offset=0):
+        query = {'limit': limit, 'offset': offset}
+        if state:
+            query['state'] = state
+        if client:
+            query['client'] = client
+        return self._request('GET', '/jobs?' + urllib.parse.urlencode(query))['jobs']
+
+    def status(self):
+        return self._request('GET', '/status')
+
+    def claim(self, worker, count):
+        """领取任务，返回 (任务列表, 租约时长)"""
+        result = self._request('POST', '/workers/claim', {'worker': worker, 'count': count})
+        return result['jobs'], result['lease_seconds']
+
+    def heartbeat(self, worker, ids, progress=None):
+        return self._request('POST', '/workers/heartbeat', {'worker': worker, 'ids': list(ids), 'progress': progress})['held']
+
+    def report(self, worker, results):
+        return self._request('POST', '/workers/report', {'worker': worker, 'results': list(results)})['accepted']
+
+    def workers(self):
+        return self._request('GET', '/workers')['workers']
+
+def create_service(engine):
+    """按配置（service 部分）创建队列服务"""
+    service_config = engine.config.get('service', {})
+    queue = JobQueue(get_data_path(service_config.get('database', 'youtube_downloader_queue.db'), engine.config_path))
+    return QueueService(engine, queue, service_config.get('host', '127.0.0.1'), service_config.get('port', 8790),
+                        service_config.get('token') or None, service_config.get('lease_seconds', 60),
+                        service_config.get('local_downloads', True), service_config.get('batch_size', 0),
+                        service_config.get('allowed_paths') or [], service_config.get('max_body_kb', 8192) * 1024)
+
+def connect_service(config):
+    """连接已运行的队列服务（配置关闭或无法连接时返回None）"""
+    service_config = config.get('service', {})
+    if not service_config.get('enabled', True):
+        return None
+    client = ServiceClient(f"http://{service_config.get('host', '127.0.0.1')}:{service_config.get('port', 8790)}",
+                           service_config.get('token') or None, timeout=2)
+    return client if client.ping() else None
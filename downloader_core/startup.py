@@ -0,0 +1,164 @@
+"""
+启动加速：缓存上次启动时解析的配置和 yt-dlp 版本（按文件修改时间和大小判断是否有效），
+以及 --profile-startup 使用的启动耗时分析
+"""
+
+import builtins
+import json
+import os
+import sys
+import threading
+import time
+
+# 启动缓存文件和启动耗时分析的输出文件（与配置文件同目录）
+STARTUP_CACHE_FILE = 'youtube_downloader_startup.json'
+STARTUP_PROFILE_FILE = 'youtube_downloader_startup_profile.txt'
+
+def file_stamp(path):
+    """文件的修改时间和大小（文件变化时缓存失效），文件不存在时返回None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+class StartupCache:
+    """启动缓存（JSON 文件）：每项记录对应文件的 stamp，读取时 stamp 不一致视为失效"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = None
+
+    def _load(self):
+        if self.entries is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as file:
+                    self.entries = json.load(file)
+            except (OSError, ValueError):
+                self.entries = {}
+        return self.entries
+
+    def get(self, key, stamp):
+        """读取缓存（返回副本，调用方可以修改），失效或不存在时返回None"""
+        with self.lock:
+            entry = self._load().get(key)
+        if not entry or entry.get('stamp') != stamp:
+            return None
+        return json.loads(json.dumps(entry.get('value')))
+
+    def put(self, key, stamp, value):
+        """写入缓存（先写临时文件再替换，写入失败时只影响下次启动的速度）"""
+        with self.lock:
+            # 重新读取，保留其他进程写入的项
+            self.entries = None
+            self._load()[key] = {'stamp': stamp, 'value': json.loads(json.dumps(value))}
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(temp_path, 'w', encoding='utf-8') as file:
+                    json.dump(self.entries, file, ensure_ascii=False)
+                os.replace(temp_path, self.path)
+            except OSError as e:
+                print(f"无法保存启动缓存: {e}")
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_startup_cache(path):
+    """获取指定路径的启动缓存（同一路径只创建一次）"""
+    path = os.path.abspath(path)
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = _caches[path] = StartupCache(path)
+        return cache
+
+class StartupProfiler:
+    """启动耗时分析（--profile-startup）：记录每个模块的导入耗时和启动各阶段的时间点
+
+    打包后的程序无法使用 python -X importtime，因此在导入其他模块之前替换 __import__ 记录耗时。
+    没有控制台时（无窗口的打包程序）结果写入 output_path。未启用时 mark 和 report 不做任何事。
+    """
+
+    def __init__(self, enabled=True, output_path=None):
+        self.enabled = enabled
+        self.output_path = output_path
+        self.started = time.perf_counter()
+        self.marks = []
+        # (模块名, 嵌套深度, 累计耗时, 自身耗时)
+        self.imports = []
+        self.depth = 0
+        self.reported = False
+        self.original_import = None
+        if enabled:
+            self.original_import = builtins.__import__
+            builtins.__import__ = self._timed_import
+
+    @classmethod
+    def from_args(cls, args, output_path=None):
+        """命令行参数中有 --profile-startup 时启用"""
+        return cls('--profile-startup' in args, output_path)
+
+    def _output(self, lines):
+        if sys.stdout is not None or not self.output_path:
+            print('\n'.join(lines))
+            return
+        try:
+            with open(self.output_path, 'a', encoding='utf-8') as file:
+                file.write('\n'.join(lines) + '\n')
+        except OSError:
+            pass
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level and globals:
+            full_name = f"{globals.get('__package__') or ''}.{name}".strip('.')
+        else:
+            full_name = name
+        if full_name in sys.modules:
+            return self.original_import(name, globals, locals, fromlist, level)
+        index = len(self.imports)
+        self.imports.append(None)
+        self.depth += 1
+        started = time.perf_counter()
+        try:
+            return self.original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.depth -= 1
+            children = sum(entry[2] for entry in self.imports[index + 1:] if entry and entry[1] == self.depth + 1)
+            self.imports[index] = (full_name, self.depth, elapsed, elapsed - children)
+
+    def mark(self, name):
+        """记录启动阶段的结束时间（输出报告之后的阶段直接输出）"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.marks.append((name, now))
+        if self.reported:
+            self._output([f"[启动] {name}: {(now - self.started) * 1000:.0f} ms"])
+
+    def report(self, top=15, target_ms=None):
+        """输出各阶段耗时和导入最慢的模块，并停止记录导入"""
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        builtins.__import__ = self.original_import
+        imports = [entry for entry in self.imports if entry]
+
+        lines = ["启动耗时分析:"]
+        previous = self.started
+        for name, moment in self.marks:
+            lines.append(f"  {name:<16}{(moment - previous) * 1000:>8.1f} ms   累计 {(moment - self.started) * 1000:>7.1f} ms")
+            previous = moment
+        if target_ms and self.marks:
+            total = (self.marks[-1][1] - self.started) * 1000
+            lines.append(f"  {'达到' if total <= target_ms else '超过'}目标 {target_ms} ms")
+
+        direct = sorted((entry for entry in imports if entry[1] == 0), key=lambda entry: -entry[2])
+        lines.append(f"直接导入的模块（共导入 {len(imports)} 个模块，{sum(entry[2] for entry in direct) * 1000:.1f} ms）:")
+        for name, _, elapsed, _ in direct[:top]:
+            lines.append(f"  {name:<36}{elapsed * 1000:>8.1f} ms")
+        lines.append("自身耗时最多的模块:")
+        for name, _, elapsed, own in sorted(imports, key=lambda entry: -entry[3])[:top]:
+            lines.append(f"  {name:<36}{own * 1000:>8.1f} ms   含子模块 {elapsed * 1000:.1f} ms")
+        self._output(lines)
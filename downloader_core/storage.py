@@ -0,0 +1,216 @@
+"""
+存储管理：按探测得到的文件大小在写入的磁盘上预留空间，剩余空间不足时暂停派发；
+限制同一磁盘同时写入的下载数；可先下载到本地临时目录，完成后移动到保存路径
+"""
+
+import contextlib
+import errno
+import os
+import shutil
+import threading
+import time
+
+from .runner import DownloadCancelled
+
+# 大小和时长都未知时按此预留
+UNKNOWN_SIZE = 500 * 1024 * 1024
+# 探测得到的大小多为估计值（按码率估算），预留时多留一些
+RESERVE_MARGIN = 1.1
+# 磁盘剩余空间的查询结果缓存秒数（调度循环每轮都会检查）
+FREE_SPACE_TTL = 2.0
+# 下载中的临时文件（移动到保存路径时跳过）
+PARTIAL_SUFFIXES = ('.part', '.ytdl')
+
+def format_size(size):
+    """文件大小的显示文本"""
+    if size >= 1024 ** 3:
+        return f"{size / 1024 ** 3:.1f} GB"
+    return f"{size / 1024 ** 2:.0f} MB"
+
+def volume_of(path):
+    """路径所在磁盘（设备号），路径不存在时使用最近的已存在的上级目录"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return os.stat(path).st_dev
+
+def same_directory(first, second):
+    """两个路径是否为同一目录"""
+    return os.path.normcase(os.path.abspath(first)) == os.path.normcase(os.path.abspath(second))
+
+def move_file(path, directory):
+    """把文件移动到目录中，返回新路径
+
+    同一磁盘直接改名；不同磁盘时先复制为目标目录中的临时文件再改名，保存路径中不会出现不完整的文件。
+    """
+    target = os.path.join(directory, os.path.basename(path))
+    try:
+        os.replace(path, target)
+        return target
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    temp_path = f"{target}.moving"
+    try:
+        shutil.copy2(path, temp_path)
+        os.replace(temp_path, target)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    os.remove(path)
+    return target
+
+class StorageManager:
+    """磁盘空间预留和写入并发（线程安全）
+
+    每个下载开始前按预计大小在写入的磁盘上预留空间，剩余空间扣除其他下载的预留后低于 min_free 时等待
+    （其他下载结束后释放预留），该磁盘上没有其他预留、等待也不会有空间时返回失败原因；
+    调度循环在磁盘剩余空间不足时暂停派发（见 low_space）。下载过程中已写入的部分从预留中扣除。
+    writers_per_volume 限制同一保存路径磁盘同时写入的下载、合并和移动数（机械硬盘避免磁头来回寻道），
+    临时目录视为本地高速磁盘，不限制。
+    """
+
+    def __init__(self, min_free=1024 ** 3, writers_per_volume=0, staging_dir=None):
+        self.min_free = min_free
+        self.writers_per_volume = writers_per_volume
+        self.staging_dir = staging_dir or None
+        self.condition = threading.Condition()
+        # 下载 -> {'demands': [(磁盘, 字节数)], 'written': 已写入的字节数}（已写入的部分从第一个磁盘的预留中扣除）
+        self.reservations = {}
+        # 下载 -> 占用写入名额的磁盘
+        self.writers = {}
+        # 磁盘 -> (查询时间, 剩余空间)
+        self.free_cache = {}
+
+    def staging_path(self, name):
+        """临时目录中单个下载的子目录（下载完成后其中的文件移动到保存路径）"""
+        return os.path.join(self.staging_dir, name)
+
+    def _free(self, volume, path):
+        now = time.monotonic()
+        cached = self.free_cache.get(volume)
+        if cached and now - cached[0] < FREE_SPACE_TTL:
+            return cached[1]
+        path = os.path.abspath(path)
+        while not os.path.exists(path) and os.path.dirname(path) != path:
+            path = os.path.dirname(path)
+        free = shutil.disk_usage(path).free
+        self.free_cache[volume] = (now, free)
+        return free
+
+    def _reserved(self, volume, exclude=None):
+        total = 0
+        for key, reservation in self.reservations.items():
+            if key == exclude:
+                continue
+            for index, (demand_volume, size) in enumerate(reservation['demands']):
+                if demand_volume == volume:
+                    total += max(0, size - reservation['written']) if index == 0 else size
+        return total
+
+    def available(self, path):
+        """路径所在磁盘扣除预留和 min_free 后可用的空间"""
+        volume = volume_of(path)
+        with self.condition:
+            return self._free(volume, path) - self._reserved(volume) - self.min_free
+
+    def low_space(self, paths):
+        """剩余空间（扣除预留）低于 min_free 的磁盘的说明（调度循环据此暂停派发），都充足时返回None"""
+        for path in paths:
+            volume = volume_of(path)
+            with self.condition:
+                free = self._free(volume, path)
+                reserved = self._reserved(volume)
+            if free - reserved < self.min_free:
+                return (f"磁盘空间不足（{path} 剩余 {format_size(free)}，进行中的下载预留 {format_size(reserved)}，"
+                        f"至少保留 {format_size(self.min_free)}），暂停派发新任务")
+        return None
+
+    def reserve(self, key, demands, cancelled=None):
+        """为一个下载预留空间，demands 为 [(目录, 字节数)]（字节数为None时按 UNKNOWN_SIZE）
+
+        成功返回None，空间不足且无法等到时返回原因；等待期间 cancelled() 为 True 时抛出 DownloadCancelled。
+        """
+        demands = [(volume_of(path), path, int((size or UNKNOWN_SIZE) * RESERVE_MARGIN)) for path, size in demands]
+        with self.condition:
+            while True:
+                shortage = None
+                for volume, path, size in demands:
+                    free = self._free(volume, path)
+                    others = self._reserved(volume, exclude=key)
+                    if free - others - size < self.min_free:
+                        shortage = (volume, path, free, size)
+                        break
+                if shortage is None:
+                    self.reservations[key] = {'demands': [(volume, size) for volume, _, size in demands], 'written': 0}
+                    return None
+                volume, path, free, size = shortage
+                if not self._reserved(volume, exclude=key):
+                    return (f"磁盘空间不足: {path} 剩余 {format_size(free)}，"
+                            f"需要 {format_size(size)}（至少保留 {format_size(self.min_free)}）")
+                if cancelled and cancelled():
+                    raise DownloadCancelled()
+                self.condition.wait(1.0)
+
+    def written(self, key, size):
+        """下载已写入的字节数（从预留中扣除）"""
+        with self.condition:
+            reservation = self.reservations.get(key)
+            if reservation:
+                reservation['written'] = size
+
+    def release(self, key):
+        """下载结束（或交给合并阶段的文件合并完成），释放预留的空间"""
+        with self.condition:
+            if self.reservations.pop(key, None) is not None:
+                # 已写入的文件计入剩余空间，下次检查时重新查询
+                self.free_cache.clear()
+                self.condition.notify_all()
+
+    def acquire_writer(self, key, path, cancelled=None):
+        """占用 path 所在磁盘的一个写入名额，名额用完时等待；等待期间 cancelled() 为 True 时抛出 DownloadCancelled"""
+        if not self.writers_per_volume:
+            return
+        volume = volume_of(path)
+        with self.condition:
+            while sum(1 for writer in self.writers.values() if writer == volume) >= self.writers_per_volume:
+                if cancelled and cancelled():
+                    raise DownloadCancelled()
+                self.condition.wait(1.0)
+            self.writers[key] = volume
+
+    def release_writer(self, key):
+        with self.condition:
+            if self.writers.pop(key, None) is not None:
+                self.condition.notify_all()
+
+    @contextlib.contextmanager
+    def writing(self, key, path):
+        """在 with 块中占用 path 所在磁盘的一个写入名额（path 为None时不占用）"""
+        if path:
+            self.acquire_writer(key, path)
+        try:
+            yield
+        finally:
+            if path:
+                self.release_writer(key)
+
+    def move_files(self, key, directory, save_path):
+        """把临时目录中下载完成的文件移动到保存路径并删除临时目录，返回移动后的路径列表"""
+        moved = []
+        with self.writing(key, save_path):
+            for name in sorted(os.listdir(directory)):
+                path = os.path.join(directory, name)
+                if os.path.isfile(path) and not name.endswith(PARTIAL_SUFFIXES):
+                    moved.append(move_file(path, save_path))
+        try:
+            os.rmdir(directory)
+        except OSError:
+            pass
+        return moved
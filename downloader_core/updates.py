@@ -0,0 +1,36 @@
+"""
+界面更新队列：工作线程只写入最新值，界面主线程按固定频率批量取出
+"""
+
+import threading
+import time
+
+class UpdateQueue:
+    """按键合并的更新队列（线程安全）
+
+    同一个键（如状态栏、进度条）在两次取出之间多次写入时只保留最新的值，
+    界面每次刷新的开销与进行中的下载数和事件数无关。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> (最新值, 第一次写入尚未取出的时间)
+        self.pending = {}
+        # 最近一次取出的更新中等待最久的时间（秒）
+        self.last_delay = 0.0
+
+    def put(self, key, value):
+        """写入一个更新（可在任意线程调用）"""
+        with self.lock:
+            previous = self.pending.get(key)
+            self.pending[key] = (value, previous[1] if previous else time.monotonic())
+
+    def drain(self):
+        """取出所有待处理的更新，返回 {key: 最新值}"""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return {}
+        now = time.monotonic()
+        self.last_delay = max(now - since for _, since in pending.values())
+        return {key: value for key, (value, _) in pending.items()}
@@ -0,0 +1,182 @@
+"""
+下载节点：从协调节点（其他机器上的队列服务）按租约领取链接，用本机的下载引擎、代理和磁盘下载，
+定时续约并汇报结果
+"""
+
+import os
+import socket
+import threading
+
+from .jobs import CANCELLED, DONE, FAILED, FINISHED_STATES, QUEUED
+from .service import ServiceClient, ServiceError
+
+class DistributedWorker:
+    """下载节点
+
+    每次领取 batch_size 个链接作为本机的一个批次，下载期间按租约时长的三分之一定时续约，
+    并汇报已结束的任务；协调节点已取消或重新分配的任务在续约时得知，随即停止下载。
+    节点意外退出后租约到期，任务由协调节点重新排队，交给其他节点下载。
+    """
+
+    def __init__(self, engine, client, name=None, batch_size=0, poll_interval=5):
+        self.engine = engine
+        self.client = client
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = batch_size or engine.config['download']['max_workers'] * 2
+        self.poll_interval = poll_interval
+        self.stopping = threading.Event()
+        # 当前批次：链接 -> 任务ID列表（同一链接可能被提交多次），以及已汇报的任务ID
+        self.links = {}
+        self.reported = set()
+        self.lock = threading.Lock()
+        # 未能送达的结果，下次请求时重新汇报
+        self.pending_results = []
+        # 当前批次的进度（随心跳发给协调节点）
+        self.progress = None
+        # 节点的批次互不相关，意外退出后不按下载日志继续（任务已重新分配）
+        engine.config['journal'] = dict(engine.config.get('journal', {}), enabled=False)
+
+        on_progress = engine.on_progress
+
+        def track_progress(progress):
+            self.progress = progress
+            if on_progress:
+                on_progress(progress)
+
+        engine.on_progress = track_progress
+
+    def run(self):
+        """领取并下载任务，直到 stop"""
+        while not self.stopping.is_set():
+            self.flush_results()
+            try:
+                jobs, lease_seconds = self.client.claim(self.name, self.batch_size)
+            except (OSError, ServiceError) as e:
+                print(f"无法连接协调节点: {e}")
+                self.stopping.wait(self.poll_interval)
+                continue
+            if not jobs:
+                self.stopping.wait(self.poll_interval)
+                continue
+            self.run_batch(jobs, lease_seconds)
+        self.flush_results()
+
+    def stop(self):
+        """停止领取新任务，并停止当前批次（未完成的任务交还协调节点）"""
+        self.stopping.set()
+        with self.lock:
+            links = list(self.links)
+        for link in links:
+            self.engine.cancel_job(link)
+
+    def run_batch(self, jobs, lease_seconds):
+        """把领取的任务作为一个批次下载（保存到本机配置的保存路径）"""
+        with self.lock:
+            self.links = {}
+            self.reported = set()
+            for job in jobs:
+                self.links.setdefault(job['link'], []).append(job['id'])
+        links = [f"{job['link']} priority={job['priority']}" if job['priority'] else job['link'] for job in jobs]
+        if self.engine.on_status:
+            self.engine.on_status(f"领取 {len(jobs)} 个任务")
+
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(done, lease_seconds / 3), daemon=True)
+        heartbeat.start()
+        try:
+            summary = self.engine.download_videos(None, links, prefer_low_quality=jobs[0]['low_quality'])
+        except Exception as e:
+            print(f"批次执行失败: {e}")
+            summary = None
+        finally:
+            done.set()
+            heartbeat.join()
+
+        failed = set(summary['failed_links']) if summary else set()
+        failed_collections = summary.get('failed_collections', {}) if summary else {}
+        results = []
+        for link, state, error in self._finished(final=True):
+            if summary is None:
+                state, error = FAILED, "批次执行失败"
+            elif link in failed:
+                state, error = FAILED, "下载失败"
+            elif failed_collections.get(link):
+                # 播放列表/频道中有视频失败
+                state, error = FAILED, f"{failed_collections[link]} 个视频下载失败"
+            results.append((link, state, error))
+        self._queue_results(results)
+        with self.lock:
+            self.links = {}
+        self.flush_results()
+
+    def _finished(self, final=False):
+        """尚未汇报的已结束任务 (链接, 状态, 错误)；final 为 True 时返回全部未汇报的任务"""
+        jobs = self.engine.jobs
+        finished = []
+        with self.lock:
+            for link, ids in self.links.items():
+                if all(job_id in self.reported for job_id in ids):
+                    continue
+                job = jobs.get(link) if jobs else None
+                state = job.state if job else None
+                if state == CANCELLED:
+                    # 协调节点取消的任务在续约时已不再持有，这里只有节点停止时取消的，交还协调节点
+                    finished.append((link, QUEUED, None))
+                elif state in FINISHED_STATES:
+                    finished.append((link, state, "下载失败" if state == FAILED else None))
+                elif final:
+                    # 包括已下载过而跳过的链接、展开的播放列表和频道
+                    finished.append((link, QUEUED if self.stopping.is_set() else DONE, None))
+        return finished
+
+    def _queue_results(self, finished):
+        with self.lock:
+            for link, state, error in finished:
+                for job_id in self.links.get(link, []):
+                    if job_id not in self.reported:
+                        self.reported.add(job_id)
+                        self.pending_results.append({'id': job_id, 'state': state, 'error': error})
+
+    def flush_results(self):
+        """汇报结果（协调节点不可用时保留，下次重试）"""
+        with self.lock:
+            results, self.pending_results = self.pending_results, []
+        if not results:
+            return
+        try:
+            self.client.report(self.name, results)
+        except (OSError, ServiceError) as e:
+            print(f"汇报结果失败，稍后重试: {e}")
+            with self.lock:
+                self.pending_results = results + self.pending_results
+
+    def _heartbeat(self, done, interval):
+        """下载期间定时汇报已结束的任务并续约"""
+        while not done.wait(interval):
+            self._queue_results(self._finished())
+            self.flush_results()
+            with self.lock:
+                held = {job_id for link, ids in self.links.items() for job_id in ids if job_id not in self.reported}
+            progress = self.progress.snapshot() if self.progress else None
+            if not held:
+                continue
+            try:
+                kept = set(self.client.heartbeat(self.name, sorted(held), progress))
+            except (OSError, ServiceError) as e:
+                print(f"续约失败: {e}")
+                continue
+            # 已取消或已重新分配的任务停止下载，结果不再汇报
+            with self.lock:
+                lost = held - kept
+                self.reported |= lost
+                links = [link for link, ids in self.links.items()
+                         if lost.intersection(ids) and all(job_id in self.reported for job_id in ids)]
+            for link in links:
+                self.engine.cancel_job(link)
+
+def create_worker(engine, coordinator=None):
+    """按配置（worker 部分）创建下载节点，coordinator 为协调节点地址（默认使用配置）"""
+    worker_config = engine.config.get('worker', {})
+    token = worker_config.get('token') or engine.config.get('service', {}).get('token') or None
+    client = ServiceClient(coordinator or worker_config.get('coordinator', 'http://127.0.0.1:8790'), token)
+    return DistributedWorker(engine, client, worker_config.get('name') or None, worker_config.get('batch_size', 0))
@@ -0,0 +1,114 @@
+"""
+带宽解析、时间段上限和带宽分配
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloader_core.bandwidth import BandwidthManager, BandwidthSchedule, parse_rate  # noqa: E402
+from downloader_core.runner import DownloadCancelled  # noqa: E402
+
+K = 1024
+M = 1024 * 1024
+
+def moment(day, hour, minute=0):
+    """2024年1月 day 日的本地时间（1月1日为周一）"""
+    return time.mktime((2024, 1, day, hour, minute, 0, 0, 0, -1))
+
+class ParseRateTest(unittest.TestCase):
+    def test_units(self):
+        self.assertEqual(parse_rate('5M'), 5 * M)
+        self.assertEqual(parse_rate('800K'), 800 * K)
+        self.assertEqual(parse_rate('1.5MB/s'), int(1.5 * M))
+        self.assertEqual(parse_rate(2048), 2048)
+        self.assertEqual(parse_rate(0), 0)
+        with self.assertRaises(ValueError):
+            parse_rate('fast')
+
+class BandwidthScheduleTest(unittest.TestCase):
+    def test_daytime_window(self):
+        schedule = BandwidthSchedule([{'start': '09:00', 'end': '18:00', 'limit': '2M'}], default='10M')
+        self.assertEqual(schedule.limit_at(moment(1, 9)), 2 * M)
+        self.assertEqual(schedule.limit_at(moment(1, 17, 59)), 2 * M)
+        self.assertEqual(schedule.limit_at(moment(1, 18)), 10 * M)
+
+    def test_window_wrapping_midnight(self):
+        schedule = BandwidthSchedule([{'start': '22:00', 'end': '06:00', 'limit': '1M'}])
+        self.assertEqual(schedule.limit_at(moment(1, 23)), M)
+        self.assertEqual(schedule.limit_at(moment(2, 5, 59)), M)
+        self.assertEqual(schedule.limit_at(moment(2, 6)), 0)
+        self.assertEqual(schedule.limit_at(moment(2, 12)), 0)
+
+    def test_days_after_midnight_belong_to_previous_day(self):
+        # 只在周一晚上限速：周二凌晨仍属于周一的时间段，周一凌晨属于周日
+        schedule = BandwidthSchedule([{'start': '22:00', 'end': '06:00', 'limit': '1M', 'days': [1]}])
+        self.assertEqual(schedule.limit_at(moment(1, 23)), M)
+        self.assertEqual(schedule.limit_at(moment(2, 3)), M)
+        self.assertEqual(schedule.limit_at(moment(1, 3)), 0)
+        self.assertEqual(schedule.limit_at(moment(2, 23)), 0)
+        # 周日晚上到周一凌晨（days 中的 7）
+        sunday = BandwidthSchedule([{'start': '22:00', 'end': '06:00', 'limit': '1M', 'days': [7]}])
+        self.assertEqual(sunday.limit_at(moment(1, 3)), M)
+
+    def test_first_matching_rule_wins(self):
+        schedule = BandwidthSchedule([
+            {'start': '00:00', 'end': '12:00', 'limit': '1M'},
+            {'start': '06:00', 'end': '18:00', 'limit': '3M'},
+        ])
+        self.assertEqual(schedule.limit_at(moment(1, 8)), M)
+        self.assertEqual(schedule.limit_at(moment(1, 13)), 3 * M)
+
+class BandwidthManagerTest(unittest.TestCase):
+    def test_unlimited(self):
+        manager = BandwidthManager(BandwidthSchedule())
+        self.assertIsNone(manager.acquire('a'))
+
+    def test_shares_never_exceed_limit(self):
+        manager = BandwidthManager(BandwidthSchedule(default='1M'), min_rate='100K')
+        manager.set_slots(4)
+        budgets = [manager.acquire(key) for key in 'abcd']
+        self.assertEqual(budgets, [M // 4] * 4)
+        self.assertLessEqual(manager.allocated(), M)
+        manager.release('a')
+        self.assertEqual(manager.allocated(), 3 * M // 4)
+
+    def test_waits_instead_of_exceeding_limit(self):
+        manager = BandwidthManager(BandwidthSchedule(default='1M'), min_rate='100K')
+        self.assertEqual(manager.acquire('a'), M)
+        results = []
+        thread = threading.Thread(target=lambda: results.append(manager.acquire('b')))
+        thread.start()
+        thread.join(0.2)
+        self.assertEqual(results, [])
+        manager.release('a')
+        thread.join(5)
+        self.assertEqual(results, [M])
+
+    def test_cancel_while_waiting(self):
+        manager = BandwidthManager(BandwidthSchedule(default='1M'), min_rate='100K')
+        manager.acquire('a')
+        with self.assertRaises(DownloadCancelled):
+            manager.acquire('b', cancelled=lambda: True)
+        self.assertEqual(manager.allocated(), M)
+
+    def test_adjustable_downloads_are_rebalanced(self):
+        manager = BandwidthManager(BandwidthSchedule(default='1M'), min_rate='100K')
+        rates = {}
+
+        def adjuster(key):
+            return lambda rate: rates.__setitem__(key, rate)
+
+        self.assertEqual(manager.acquire('a', adjuster('a')), M)
+        self.assertEqual(manager.acquire('b', adjuster('b')), M // 2)
+        self.assertEqual(rates, {'a': M // 2})
+        manager.release('b')
+        self.assertEqual(rates, {'a': M})
+        self.assertLessEqual(manager.allocated(), M)
+
+if __name__ == '__main__':
+    unittest.main()
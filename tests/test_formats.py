@@ -0,0 +1,26 @@
+"""
+格式选择和文件大小估算
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloader_core.formats import estimate_filesize  # noqa: E402
+
+class EstimateFilesizeTest(unittest.TestCase):
+    def test_sums_filesizes(self):
+        self.assertEqual(estimate_filesize([{'filesize': 100}, {'filesize': 50}]), 150)
+
+    def test_uses_approx_and_bitrate(self):
+        # filesize_approx 和按码率估算（tbr 单位 kbit/s）
+        chosen = [{'filesize_approx': 1000}, {'tbr': 8, 'filesize': None}]
+        self.assertEqual(estimate_filesize(chosen, duration=10), 1000 + 10000)
+
+    def test_unknown_size(self):
+        self.assertIsNone(estimate_filesize([{'filesize': 100}, {}]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+持久化下载队列：分轮、领取、租约和恢复
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloader_core.jobqueue import RUNNING, JobQueue  # noqa: E402
+from downloader_core.jobs import CANCELLED, DONE, FAILED, QUEUED  # noqa: E402
+
+def video(index):
+    return f'https://www.youtube.com/watch?v=video{index:06d}'
+
+class JobQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'queue.db')
+        self.queue = JobQueue(self.path)
+
+    def tearDown(self):
+        self.queue.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_submit_is_idempotent_per_batch(self):
+        links = [video(index) for index in range(5)]
+        ids = self.queue.submit(links[:3], '/downloads', batch='b1')
+        # 重发同一块返回已有的任务ID，后续块按 start 接着编号
+        self.assertEqual(self.queue.submit(links[:3], '/downloads', batch='b1'), ids)
+        ids += self.queue.submit(links[3:], '/downloads', batch='b1', start=3)
+        self.assertEqual(len(set(ids)), 5)
+        self.assertEqual(self.queue.counts(), {QUEUED: 5})
+
+    def test_next_round_groups_and_limits(self):
+        self.queue.submit([video(0), video(1), video(2)], '/a')
+        self.queue.submit([video(3)], '/b', priority=5)
+        # 优先级最高的任务所在分组先取出
+        first = self.queue.next_round(10)
+        self.assertEqual([row['link'] for row in first], [video(3)])
+        second = self.queue.next_round(2)
+        self.assertEqual([row['link'] for row in second], [video(0), video(1)])
+        self.assertTrue(all(row['state'] == RUNNING for row in second))
+        self.assertEqual([row['link'] for row in self.queue.next_round(2)], [video(2)])
+        self.assertEqual(self.queue.next_round(2), [])
+
+    def test_journal_group_taken_whole(self):
+        self.queue.submit([video(index) for index in range(5)], '/a', journal='/journals/1.jsonl')
+        self.assertEqual(len(self.queue.next_round(2)), 5)
+
+    def test_claim_renew_and_report(self):
+        ids = self.queue.submit([video(0), video(1)], '/a')
+        claimed = self.queue.claim('node-1', 5, lease_seconds=60)
+        self.assertEqual([row['id'] for row in claimed], ids)
+        self.assertEqual(self.queue.claim('node-2', 5, lease_seconds=60), [])
+        self.assertEqual(self.queue.renew('node-1', ids, 60), ids)
+        # 只接受仍由该节点持有的任务
+        self.assertFalse(self.queue.report('node-2', ids[0], DONE))
+        self.assertTrue(self.queue.report('node-1', ids[0], DONE))
+        # 交还的任务重新排队
+        self.assertTrue(self.queue.report('node-1', ids[1], QUEUED))
+        self.assertEqual(self.queue.get(ids[1])['state'], QUEUED)
+        self.assertIsNone(self.queue.get(ids[1])['worker'])
+
+    def test_expire_requeues_lapsed_leases(self):
+        ids = self.queue.submit([video(0), video(1)], '/a')
+        self.queue.claim('node-1', 1, lease_seconds=-1)
+        self.queue.claim('node-2', 1, lease_seconds=60)
+        self.assertEqual(self.queue.expire(), [ids[0]])
+        self.assertEqual(self.queue.get(ids[0])['state'], QUEUED)
+        # 过期后原节点不能再续约或汇报
+        self.assertEqual(self.queue.renew('node-1', [ids[0]], 60), [])
+        self.assertFalse(self.queue.report('node-1', ids[0], DONE))
+        self.assertEqual(self.queue.get(ids[1])['worker'], 'node-2')
+
+    def test_recover_requeues_local_rounds_only(self):
+        local, remote = self.queue.submit([video(0), video(1)], '/a')
+        self.queue.claim('node-1', 1, lease_seconds=60)
+        self.queue.next_round(10)
+        self.queue.close()
+        # 重新打开（相当于服务重启）：本机进行中的任务重新排队，节点领取的保留到租约到期
+        self.queue = JobQueue(self.path)
+        self.assertEqual(self.queue.recover(), 1)
+        self.assertEqual(self.queue.get(remote)['state'], QUEUED)
+        self.assertEqual(self.queue.get(local)['state'], RUNNING)
+
+    def test_cancel_and_failed_links(self):
+        ids = self.queue.submit([video(0), video(1), video(2)], '/a', source='/links.txt')
+        self.assertEqual(self.queue.cancel(ids[0]), QUEUED)
+        self.assertEqual(self.queue.get(ids[0])['state'], CANCELLED)
+        self.assertEqual(self.queue.cancel(ids[0]), CANCELLED)
+        self.assertIsNone(self.queue.cancel(12345))
+        self.queue.finish(ids[1], FAILED, 'Video unavailable')
+        self.queue.finish(ids[2], DONE)
+        self.assertEqual(self.queue.failed_links('/links.txt'), [video(1)])
+        # 同一来源重新提交后只看最近一次提交
+        self.queue.submit([video(1)], '/a', source='/links.txt')
+        self.assertEqual(self.queue.failed_links('/links.txt'), [])
+
+    def test_lease_seconds_are_honoured(self):
+        ids = self.queue.submit([video(0)], '/a')
+        before = time.time()
+        row = self.queue.claim('node-1', 1, lease_seconds=30)[0]
+        self.assertEqual(row['id'], ids[0])
+        self.assertGreaterEqual(row['lease_until'], before + 30)
+        self.assertEqual(self.queue.expire(), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+批次任务表：出队顺序、取消、重新排队和优先级调整
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloader_core.jobs import (CANCELLED, DOWNLOADING, MERGING, QUEUED, RETRY_WAIT,  # noqa: E402
+                                  UNKNOWN_WEIGHT, JobTable, order_weight, split_priority)
+
+def drain(table):
+    links = []
+    job = table.next_job()
+    while job:
+        links.append(job.link)
+        job = table.next_job()
+    return links
+
+class SplitPriorityTest(unittest.TestCase):
+    def test_priority_tag(self):
+        self.assertEqual(split_priority('https://youtu.be/x priority=5\n'), ('https://youtu.be/x', 5))
+        self.assertEqual(split_priority('https://youtu.be/x PRIORITY=-2'), ('https://youtu.be/x', -2))
+        self.assertEqual(split_priority('  https://youtu.be/x  '), ('https://youtu.be/x', 0))
+
+    def test_order_weight(self):
+        self.assertEqual(order_weight('shortest', duration=30), 30)
+        self.assertEqual(order_weight('largest', filesize=100), -100)
+        self.assertEqual(order_weight('shortest'), UNKNOWN_WEIGHT)
+        self.assertEqual(order_weight('priority', duration=30), 0)
+
+class JobTableTest(unittest.TestCase):
+    def test_order_by_priority_weight_and_arrival(self):
+        table = JobTable()
+        table.add('a')
+        table.add('b', priority=1)
+        table.add('c', weight=5)
+        table.add('d', weight=-1)
+        self.assertEqual(drain(table), ['b', 'd', 'a', 'c'])
+        self.assertEqual(table.pending_count(), 0)
+
+    def test_stale_heap_entries_are_skipped(self):
+        # 调整优先级和权重会留下旧的堆条目，按版本号跳过，每个任务只出队一次
+        table = JobTable()
+        table.add('a')
+        table.add('b')
+        self.assertTrue(table.set_priority('b', 3))
+        self.assertTrue(table.set_weight('b', 10))
+        self.assertTrue(table.move_to_back('b'))
+        self.assertEqual(drain(table), ['a', 'b'])
+
+    def test_cancel_queued_and_retry_wait(self):
+        table = JobTable()
+        table.add('a')
+        table.add('b')
+        self.assertTrue(table.cancel('a'))
+        self.assertFalse(table.cancel('a'))
+        self.assertEqual(table.pending_count(), 1)
+        self.assertTrue(table.has_cancelled())
+        self.assertEqual([job.link for job in table.take_cancelled()], ['a'])
+        self.assertFalse(table.has_cancelled())
+        self.assertEqual(drain(table), ['b'])
+
+        table.update('b', state=RETRY_WAIT)
+        self.assertTrue(table.cancel('b'))
+        self.assertEqual(table.get('b').state, CANCELLED)
+        # 已取消的任务不再重新排队
+        self.assertFalse(table.requeue('b'))
+
+    def test_cancel_running_requests_stop(self):
+        table = JobTable()
+        table.add('a')
+        table.add('m')
+        table.next_job()
+        table.update('a', state=DOWNLOADING)
+        self.assertTrue(table.cancel('a'))
+        self.assertTrue(table.is_cancel_requested('a'))
+        self.assertEqual(table.get('a').state, DOWNLOADING)
+        self.assertFalse(table.has_cancelled())
+        # 合并中的任务不能取消
+        table.next_job()
+        table.update('m', state=MERGING)
+        self.assertFalse(table.cancel('m'))
+
+    def test_requeue_keeps_position(self):
+        table = JobTable()
+        table.add('a')
+        table.add('b', priority=-1)
+        first = table.next_job()
+        table.update(first.link, state=RETRY_WAIT)
+        self.assertFalse(table.requeue('b'))
+        self.assertTrue(table.requeue('a'))
+        self.assertEqual(table.get('a').state, QUEUED)
+        self.assertEqual(drain(table), ['a', 'b'])
+
+    def test_priority_only_changes_queued_jobs(self):
+        table = JobTable()
+        table.add('a')
+        table.next_job()
+        self.assertFalse(table.set_priority('a', 5))
+        self.assertFalse(table.set_priority('missing', 5))
+        self.assertEqual(table.counts(), {'resolving': 1})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+链接解析
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloader_core.links import (REJECT_BAD_VIDEO_ID, REJECT_NOT_YOUTUBE, REJECT_UNSUPPORTED,  # noqa: E402
+                                   find_links, iter_links, parse_line)
+
+VIDEO = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+
+class ParseLineTest(unittest.TestCase):
+    def test_video_forms(self):
+        for line in ('https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+                     'youtube.com/watch?feature=share&v=dQw4w9WgXcQ&t=42s',
+                     'https://youtu.be/dQw4w9WgXcQ?si=Xk3aP0q9LmNbVc2d',
+                     'https://m.youtube.com/watch?v=dQw4w9WgXcQ',
+                     'https://music.youtube.com/watch?v=dQw4w9WgXcQ',
+                     'https://www.youtube-nocookie.com/embed/dQw4w9WgXcQ',
+                     'https://www.youtube.com/shorts/dQw4w9WgXcQ?feature=share',
+                     'https://m.youtube.com/shorts/dQw4w9WgXcQ',
+                     'https://www.youtube.com/live/dQw4w9WgXcQ',
+                     'https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PLrAXtmErZgOeiKm4sgNOknGvNjby9efdf'):
+            self.assertEqual(parse_line(line), ([VIDEO], None), line)
+
+    def test_collections(self):
+        self.assertEqual(parse_line('https://www.youtube.com/playlist?list=PL123abc')[0],
+                         ['https://www.youtube.com/playlist?list=PL123abc'])
+        self.assertEqual(parse_line('https://www.youtube.com/@someone/videos?view=0')[0],
+                         ['https://www.youtube.com/@someone/videos'])
+
+    def test_lookalike_hosts(self):
+        for line in ('https://notyoutube.com/watch?v=dQw4w9WgXcQ',
+                     'fakeyoutu.be/dQw4w9WgXcQ',
+                     'https://youtube.com.example.net/watch?v=dQw4w9WgXcQ',
+                     'https://vimeo.com/123456'):
+            self.assertEqual(parse_line(line), ([], REJECT_NOT_YOUTUBE), line)
+
+    def test_embedded_url_is_not_a_link(self):
+        line = 'https://example.com/redirect?u=https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+        self.assertEqual(parse_line(line), ([], REJECT_NOT_YOUTUBE))
+
+    def test_links_in_text(self):
+        line = '看这个（https://youtu.be/dQw4w9WgXcQ），还有 "https://m.youtube.com/shorts/aaaaaaaaaa1"'
+        self.assertEqual(parse_line(line)[0], [VIDEO, 'https://www.youtube.com/watch?v=aaaaaaaaaa1'])
+
+    def test_reject_reasons(self):
+        self.assertEqual(parse_line('https://youtu.be/truncated')[1], REJECT_BAD_VIDEO_ID)
+        self.assertEqual(parse_line('https://www.youtube.com/feed/subscriptions')[1], REJECT_UNSUPPORTED)
+
+    def test_priority_tag(self):
+        self.assertEqual(parse_line('https://youtu.be/dQw4w9WgXcQ priority=5')[0], [VIDEO + ' priority=5'])
+
+class IterLinksTest(unittest.TestCase):
+    def test_skips_comments_and_reports_rejected(self):
+        rejected = []
+        lines = ['# 注释\n', '\n', 'https://youtu.be/dQw4w9WgXcQ\n', 'junk\n',
+                 'https://notyoutube.com/watch?v=dQw4w9WgXcQ\n']
+        links = list(iter_links(lines, lambda number, line, reason: rejected.append((number, reason))))
+        self.assertEqual(links, [VIDEO])
+        self.assertEqual(rejected, [(4, REJECT_NOT_YOUTUBE), (5, REJECT_NOT_YOUTUBE)])
+
+    def test_find_links(self):
+        links, rejected = find_links('https://youtu.be/dQw4w9WgXcQ https://youtu.be/aaaaaaaaaa1\nhello')
+        self.assertEqual(len(links), 2)
+        self.assertEqual([reason for _, _, reason in rejected], [REJECT_NOT_YOUTUBE])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+重试策略和限流熔断
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloader_core.retry import (NETWORK, PERMANENT, RATE_LIMITED, TRANSIENT,  # noqa: E402
+                                   CircuitBreaker, RetryPolicy, classify_failure)
+
+class ClassifyFailureTest(unittest.TestCase):
+    def test_categories(self):
+        self.assertEqual(classify_failure('ERROR: [youtube] abc: Video unavailable'), PERMANENT)
+        self.assertEqual(classify_failure('ERROR: HTTP Error 429: Too Many Requests'), RATE_LIMITED)
+        self.assertEqual(classify_failure('something unexpected'), TRANSIENT)
+
+class RetryPolicyTest(unittest.TestCase):
+    def setUp(self):
+        # 去掉随机抖动（1~3 秒）以便比较
+        patcher = mock.patch('downloader_core.retry.random.uniform', return_value=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_permanent_and_exhausted(self):
+        policy = RetryPolicy(max_retries=3, base_delay=5)
+        self.assertIsNone(policy.delay(PERMANENT, 1))
+        self.assertIsNone(policy.delay(TRANSIENT, 3))
+
+    def test_backoff_by_category(self):
+        policy = RetryPolicy(max_retries=5, base_delay=5, rate_limit_delay=30)
+        self.assertEqual([policy.delay(TRANSIENT, n) for n in (1, 2, 3)], [5, 10, 15])
+        self.assertEqual([policy.delay(NETWORK, n) for n in (1, 2, 3)], [5, 10, 20])
+        self.assertEqual([policy.delay(RATE_LIMITED, n) for n in (1, 2)], [30, 60])
+
+    def test_rate_limit_floor_and_cap(self):
+        self.assertEqual(RetryPolicy(base_delay=0, rate_limit_delay=1).delay(RATE_LIMITED, 1), 1)
+        self.assertEqual(RetryPolicy(max_retries=10, max_delay=100).delay(RATE_LIMITED, 5), 100)
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('downloader_core.retry.time.monotonic', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_trips_after_threshold_within_window(self):
+        breaker = CircuitBreaker(threshold=3, window=60, cooldown=10)
+        self.assertFalse(breaker.record(NETWORK))
+        self.assertFalse(breaker.record(RATE_LIMITED))
+        self.assertFalse(breaker.record(RATE_LIMITED))
+        self.assertTrue(breaker.record(RATE_LIMITED))
+        self.assertEqual(breaker.remaining(), 10)
+        self.now += 10
+        self.assertEqual(breaker.remaining(), 0)
+        self.assertEqual(breaker.trips, 1)
+
+    def test_old_events_leave_the_window(self):
+        breaker = CircuitBreaker(threshold=2, window=60, cooldown=10)
+        breaker.record(RATE_LIMITED)
+        self.now += 61
+        self.assertFalse(breaker.record(RATE_LIMITED))
+
+    def test_consecutive_trips_double_cooldown(self):
+        breaker = CircuitBreaker(threshold=1, window=60, cooldown=10, max_cooldown=25)
+        cooldowns = []
+        for _ in range(3):
+            self.assertTrue(breaker.record(RATE_LIMITED))
+            cooldowns.append(breaker.remaining())
+            self.now += breaker.remaining()
+        self.assertEqual(cooldowns, [10, 20, 25])
+        # 有任务成功后从初始冷却时间开始
+        breaker.record_success()
+        breaker.record(RATE_LIMITED)
+        self.assertEqual(breaker.remaining(), 10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+磁盘空间预留和写入名额
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloader_core.runner import DownloadCancelled  # noqa: E402
+from downloader_core.storage import RESERVE_MARGIN, StorageManager  # noqa: E402
+
+MB = 1024 * 1024
+
+class StorageManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def manager(self, free, min_free=0, writers=0):
+        """磁盘剩余空间固定为 free 的 StorageManager"""
+        manager = StorageManager(min_free=min_free, writers_per_volume=writers)
+        manager._free = lambda volume, path: free
+        return manager
+
+    def test_reserve_and_release(self):
+        manager = self.manager(free=1000 * MB, min_free=100 * MB)
+        self.assertIsNone(manager.reserve('a', [(self.directory, 400 * MB)]))
+        self.assertEqual(manager.available(self.directory), 900 * MB - int(400 * MB * RESERVE_MARGIN))
+        manager.release('a')
+        self.assertEqual(manager.available(self.directory), 900 * MB)
+
+    def test_written_bytes_reduce_reservation(self):
+        manager = self.manager(free=1000 * MB)
+        manager.reserve('a', [(self.directory, 100 * MB)])
+        manager.written('a', 50 * MB)
+        self.assertEqual(manager.available(self.directory), 1000 * MB - (int(100 * MB * RESERVE_MARGIN) - 50 * MB))
+
+    def test_shortage_without_other_reservations_fails(self):
+        manager = self.manager(free=500 * MB, min_free=100 * MB)
+        reason = manager.reserve('a', [(self.directory, 450 * MB)])
+        self.assertIn('磁盘空间不足', reason)
+        self.assertEqual(manager.available(self.directory), 400 * MB)
+
+    def test_low_space(self):
+        self.assertIsNone(self.manager(free=500 * MB, min_free=100 * MB).low_space([self.directory]))
+        self.assertIn('暂停派发', self.manager(free=50 * MB, min_free=100 * MB).low_space([self.directory]))
+
+    def test_waits_for_other_reservations(self):
+        manager = self.manager(free=1000 * MB)
+        self.assertIsNone(manager.reserve('a', [(self.directory, 600 * MB)]))
+        results = []
+        thread = threading.Thread(target=lambda: results.append(manager.reserve('b', [(self.directory, 600 * MB)])))
+        thread.start()
+        thread.join(0.2)
+        self.assertEqual(results, [])
+        manager.release('a')
+        thread.join(5)
+        self.assertEqual(results, [None])
+
+    def test_cancel_while_waiting_for_space(self):
+        manager = self.manager(free=1000 * MB)
+        manager.reserve('a', [(self.directory, 600 * MB)])
+        with self.assertRaises(DownloadCancelled):
+            manager.reserve('b', [(self.directory, 600 * MB)], cancelled=lambda: True)
+
+    def test_writers_per_volume(self):
+        manager = self.manager(free=1000 * MB, writers=1)
+        manager.acquire_writer('a', self.directory)
+        with self.assertRaises(DownloadCancelled):
+            manager.acquire_writer('b', self.directory, cancelled=lambda: True)
+        manager.release_writer('a')
+        with manager.writing('b', self.directory):
+            self.assertEqual(manager.writers, {'b': manager.writers['b']})
+        self.assertEqual(manager.writers, {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,136 +2,108 @@
 """
 YouTube 批量下载器 - 简化版
 基于 yt_dlp_gui5.py 并集成反检测和智能重试功能
+
+下载逻辑位于 downloader_core 包（也可通过 python -m downloader_core 在命令行使用），本文件只负责界面。
 """
 
 import os
 import sys
-import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
-from tkinterdnd2 import DND_FILES, TkinterDnD
-import yaml
-import subprocess
-import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import ctypes
-import atexit
-import signal
 import time
-import random
-import uuid
-import requests
 
-def get_resource_path(relative_path):
-    """获取资源文件路径（支持打包后的exe）"""
-    try:
-        # PyInstaller打包后的临时目录
-        base_path = sys._MEIPASS
-    except Exception:
-        # 开发环境下的当前目录
-        base_path = os.path.abspath(".")
-    return os.path.join(base_path, relative_path)
-
-def get_ytdlp_executable():
-    """获取yt-dlp可执行文件路径（跨平台支持）"""
-    if sys.platform.startswith('win'):
-        return get_resource_path('yt-dlp.exe')
-    else:
-        # macOS和Linux使用yt-dlp（无扩展名）
-        return get_resource_path('yt-dlp')
-
-def get_config_path():
-    """获取配置文件路径（exe同目录下）"""
-    if getattr(sys, 'frozen', False):
-        # 打包后的exe文件目录
-        return os.path.join(os.path.dirname(sys.executable), 'youtube_downloader_config.yaml')
-    else:
-        # 开发环境
-        return 'youtube_downloader_config.yaml'
-
-# 配置文件名称和路径
-CONFIG_FILE = get_config_path()
-current_directory = os.path.dirname(os.path.abspath(__file__))
-yt_dlp_path = get_ytdlp_executable()
+from downloader_core.config import get_data_path
+from downloader_core.startup import STARTUP_PROFILE_FILE, StartupProfiler
+
+# --profile-startup 输出启动耗时分析，需要在导入界面和下载模块之前开始记录
+STARTUP_PROFILER = StartupProfiler.from_args(sys.argv, get_data_path(STARTUP_PROFILE_FILE))
+
+import tkinter as tk  # noqa: E402
+from tkinter import filedialog, messagebox, ttk  # noqa: E402
+from tkinterdnd2 import DND_FILES, TkinterDnD  # noqa: E402
+import threading  # noqa: E402
+import atexit  # noqa: E402
+import signal  # noqa: E402
+
+# 队列服务（HTTP 服务器和客户端）在窗口显示后才导入
+from downloader_core import DownloadEngine, load_config, save_config  # noqa: E402
+from downloader_core.journal import BatchJournal  # noqa: E402
+from downloader_core.links import find_links, iter_link_file  # noqa: E402
+from downloader_core.updates import UpdateQueue  # noqa: E402
+
+# 启动到窗口显示的目标耗时（毫秒，--profile-startup 时对照）
+STARTUP_TARGET_MS = 500
+# 界面刷新间隔（毫秒），工作线程的更新在两次刷新之间合并
+UI_REFRESH_INTERVAL = 100
+# 任务列表每隔几次界面刷新重绘一次，以及同时显示的行数（只为可见行创建表格项）
+JOB_VIEW_REFRESH_TICKS = 5
+JOB_VIEW_ROWS = 10
+
+JOB_STATE_NAMES = {
+    'queued': '排队中',
+    'resolving': '解析中',
+    'downloading': '下载中',
+    'merging': '合并中',
+    'retry_wait': '等待重试',
+    'done': '已完成',
+    'failed': '失败',
+    'cancelled': '已取消',
+}
+ORDER_POLICY_NAMES = {
+    'priority': '按链接顺序',
+    'shortest': '短视频优先',
+    'largest': '大文件优先',
+}
+JOB_FILTERS = {
+    '全部': None,
+    '进行中': {'resolving', 'downloading', 'merging', 'retry_wait'},
+    '排队中': {'queued'},
+    '失败': {'failed'},
+    '已完成': {'done'},
+    '已取消': {'cancelled'},
+}
 
 class YouTubeDownloader:
-    def __init__(self):
-        self.config = self.load_config()
+    def __init__(self, profiler=STARTUP_PROFILER):
+        self.profiler = profiler
+        try:
+            self.config = load_config()
+        except Exception as e:
+            messagebox.showerror("配置错误", f"无法加载配置文件: {e}")
+            sys.exit(1)
+        self.profiler.mark("加载配置")
+        # 工作线程只写入更新队列，由主线程定时刷新控件
+        self.ui_updates = UpdateQueue()
+        self.engine = DownloadEngine(
+            self.config,
+            on_status=self.update_status,
+            on_progress=lambda progress: self.ui_updates.put('batch_progress', progress),
+            on_concurrency=self.update_concurrency
+        )
+        self.profiler.mark("创建下载引擎")
+        # 下载通过队列服务进行：本程序内的服务，或已在运行的服务（queue_client）
+        self.service = None
+        self.queue_client = None
         self.root = None
         self.status_label = None
         self.progress_var = None
         self.progress_bar = None
         self.save_path_entry = None
         self.max_workers_entry = None
+        self.concurrency_label = None
         self.proxy_var = None
         self.debug_var = None
         self.low_quality_var = None
+        self.order_var = None
         self.proxy_test_var = None
         self.url_text = None
+        self.job_tree = None
+        self.job_scrollbar = None
+        self.job_filter_var = None
+        self.job_offset = 0
+        self.job_rows = []
+        self.job_view_ticks = 0
+        self.proxy_window = None
+        self.proxy_tree = None
         
-    def load_config(self):
-        """加载配置文件"""
-        try:
-            with open(CONFIG_FILE, 'r', encoding='utf-8') as file:
-                return yaml.safe_load(file)
-        except FileNotFoundError:
-            # 配置文件不存在，创建默认配置
-            default_config = self.create_default_config()
-            self.save_default_config(default_config)
-            return default_config
-        except Exception as e:
-            messagebox.showerror("配置错误", f"无法加载配置文件: {e}")
-            sys.exit(1)
-
-    def create_default_config(self):
-        """创建默认配置"""
-        return {
-            'behavior': {
-                'download_interval': 2,
-                'ignore_errors': True,
-                'max_retries': 3,
-                'random_delay_range': [1, 3],
-                'retry_delay': 5,
-                'unique_filename': True
-            },
-            'debug': {
-                'enabled': False,
-                'save_logs': False,
-                'show_formats': False
-            },
-            'download': {
-                'max_workers': 2,
-                'proxy': {
-                    'enabled': True,
-                    'test_on_startup': False,
-                    'test_url': 'https://www.google.com',
-                    'timeout': 3,
-                    'url': 'http://127.0.0.1:7890'
-                },
-                'save_path': os.path.join(os.path.expanduser('~'), 'Downloads')
-            },
-            'python_path': sys.executable,
-            'video': {
-                'format_priority': [
-                    'bestvideo[height=1080][fps=60]+bestaudio/best',
-                    'bestvideo[height=720][fps=60]+bestaudio/best',
-                    'bestvideo[height=1080][fps=30]+bestaudio/best',
-                    'bestvideo[height=720][fps=30]+bestaudio/best',
-                    'bestvideo[height=480]+bestaudio/best',
-                    'bestvideo[height=360]+bestaudio/best'
-                ],
-                'max_height': 1080,
-                'output_format': 'mp4'
-            }
-        }
-
-    def save_default_config(self, config):
-        """保存默认配置到文件"""
-        try:
-            with open(CONFIG_FILE, 'w', encoding='utf-8') as file:
-                yaml.dump(config, file, default_flow_style=False, allow_unicode=True)
-        except Exception as e:
-            print(f"无法保存默认配置: {e}")
-    
     def save_config(self):
         """保存配置文件"""
         try:
@@ -142,242 +114,207 @@ class YouTubeDownloader:
             if hasattr(self, 'proxy_test_var'):
                 self.config['download']['proxy']['test_on_startup'] = self.proxy_test_var.get()
             self.config['debug']['enabled'] = self.debug_var.get()
-            
-            with open(CONFIG_FILE, 'w', encoding='utf-8') as file:
-                yaml.dump(self.config, file, default_flow_style=False, allow_unicode=True)
+            if self.order_var:
+                policy = next((key for key, name in ORDER_POLICY_NAMES.items() if name == self.order_var.get()), 'priority')
+                self.config['download'].setdefault('order', {})['policy'] = policy
+
+            save_config(self.config)
         except Exception as e:
             print(f"保存配置失败: {e}")
     
-    def validate_save_path(self, path):
-        """检查并创建保存路径"""
-        if not os.path.exists(path):
-            try:
-                os.makedirs(path)
-                return True
-            except Exception as e:
-                self.update_status(f"无法创建路径: {e}")
-                return False
-        return True
-    
     def update_status(self, message):
         """线程安全的状态更新"""
-        if self.root and self.status_label:
-            self.root.after(0, lambda: self.status_label.config(text=message))
+        self.ui_updates.put('status', message)
     
     def update_progress(self, current, total):
         """更新进度条"""
-        if self.root and self.progress_var:
-            progress = (current / total) * 100 if total > 0 else 0
-            self.root.after(0, lambda: self.progress_var.set(progress))
-    
-    def test_proxy_connection(self):
-        """测试代理连接"""
-        if not self.config['download']['proxy']['enabled']:
-            return True
-            
-        try:
-            proxy_url = self.config['download']['proxy']['url']
-            test_url = self.config['download']['proxy']['test_url']
-            timeout = self.config['download']['proxy']['timeout']
-            
-            proxies = {'http': proxy_url, 'https': proxy_url}
-            response = requests.get(test_url, proxies=proxies, timeout=timeout)
-            return response.status_code == 200
-        except Exception:
-            return False
+        self.ui_updates.put('progress', (current / total) * 100 if total > 0 else 0)
     
-    def get_best_format(self, link, prefer_low_quality=False):
-        """获取最佳可用格式"""
-        try:
-            command = [yt_dlp_path, '-F', link]
-            if self.config['download']['proxy']['enabled']:
-                command.extend(['--proxy', self.config['download']['proxy']['url']])
-
-            result = subprocess.run(command, capture_output=True, text=True, timeout=30)
-            formats_output = result.stdout
-
-            if self.config['debug']['enabled']:
-                print(f"可用格式: {formats_output}")
-
-            # 如果优先下载最低画质
-            if prefer_low_quality:
-                low_quality_formats = [
-                    "worst[height<=360]+bestaudio/worst",
-                    "worst[height<=480]+bestaudio/worst",
-                    "worst[height<=720]+bestaudio/worst",
-                    "worst"
-                ]
-                for format_str in low_quality_formats:
-                    if any(keyword in formats_output for keyword in format_str.split('+')):
-                        return format_str
-                return "worst"
-
-            # 按优先级选择格式（高画质优先）
-            for format_str in self.config['video']['format_priority']:
-                if any(keyword in formats_output for keyword in format_str.split('+')):
-                    return format_str
-
-            # 如果没有找到理想格式，使用备用格式
-            return "best[height<=1080]"
-
-        except Exception as e:
-            print(f"获取格式失败: {e}")
-            return "worst" if prefer_low_quality else "best[height<=720]"
-    
-    def download_video(self, link, save_path, prefer_low_quality=False):
-        """下载单个视频"""
-        max_retries = self.config['behavior']['max_retries']
-        retry_delay = self.config['behavior']['retry_delay']
-
-        # 生成唯一文件名
-        if self.config['behavior']['unique_filename']:
-            short_uuid = uuid.uuid4().hex[:8]
-            filename_template = f"%(title)s_{short_uuid}.%(ext)s"
+    def update_concurrency(self, limit):
+        """更新界面上的当前并发数"""
+        self.ui_updates.put('concurrency', limit)
+
+    def refresh_ui(self):
+        """在主线程中定时刷新控件（每个控件只使用两次刷新之间的最新值）"""
+        updates = self.ui_updates.drain()
+        if 'status' in updates and self.status_label:
+            self.status_label.config(text=updates['status'])
+        if 'batch_progress' in updates:
+            # 批次进度在刷新时汇总，不论有多少个下载在进行
+            batch_progress = updates['batch_progress']
+            total = batch_progress.total
+            updates['progress'] = (batch_progress.position() / total) * 100 if total > 0 else 0
+        if 'progress' in updates and self.progress_var:
+            self.progress_var.set(updates['progress'])
+        if 'concurrency' in updates and self.concurrency_label:
+            self.concurrency_label.config(text=f"当前: {updates['concurrency']}")
+        self.job_view_ticks += 1
+        if self.job_view_ticks >= JOB_VIEW_REFRESH_TICKS:
+            self.job_view_ticks = 0
+            self.refresh_job_view()
+        self.root.after(UI_REFRESH_INTERVAL, self.refresh_ui)
+
+    def create_job_view(self, parent):
+        """创建任务列表（固定行数的表格，滚动时只替换可见行的内容，上万个任务也不卡顿）"""
+        frame = ttk.Frame(parent)
+        frame.columnconfigure(0, weight=1)
+        frame.rowconfigure(1, weight=1)
+
+        toolbar = ttk.Frame(frame)
+        toolbar.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 5))
+        ttk.Label(toolbar, text="显示:").pack(side=tk.LEFT)
+        self.job_filter_var = tk.StringVar(value='全部')
+        job_filter = ttk.Combobox(toolbar, textvariable=self.job_filter_var, values=list(JOB_FILTERS),
+                                  state='readonly', width=8)
+        job_filter.pack(side=tk.LEFT, padx=(5, 10))
+        job_filter.bind('<<ComboboxSelected>>', lambda event: self.scroll_job_view(0, absolute=True))
+        ttk.Button(toolbar, text="取消任务", command=self.cancel_selected_jobs).pack(side=tk.RIGHT)
+        ttk.Button(toolbar, text="移到最后", command=lambda: self.move_selected_jobs(False)).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(toolbar, text="优先下载", command=lambda: self.move_selected_jobs(True)).pack(side=tk.RIGHT)
+
+        columns = ('title', 'state', 'percent', 'speed', 'retries')
+        self.job_tree = ttk.Treeview(frame, columns=columns, show='headings', height=JOB_VIEW_ROWS)
+        for column, text, width, anchor in (
+            ('title', '标题', 280, tk.W), ('state', '状态', 70, tk.CENTER), ('percent', '进度', 60, tk.E),
+            ('speed', '速度', 90, tk.E), ('retries', '重试', 50, tk.E),
+        ):
+            self.job_tree.heading(column, text=text)
+            self.job_tree.column(column, width=width, anchor=anchor, stretch=(column == 'title'))
+        self.job_tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        self.job_scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self.on_job_scrollbar)
+        self.job_scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
+        self.job_tree.bind('<MouseWheel>', self.on_job_mousewheel)
+        self.job_tree.bind('<Button-4>', lambda event: self.scroll_job_view(-3))
+        self.job_tree.bind('<Button-5>', lambda event: self.scroll_job_view(3))
+        return frame
+
+    def get_visible_jobs(self):
+        """按当前筛选条件返回任务列表"""
+        jobs = self.engine.jobs
+        if jobs is None:
+            return []
+        return jobs.select(JOB_FILTERS.get(self.job_filter_var.get()))
+
+    def refresh_job_view(self):
+        """重绘任务列表的可见行"""
+        if not self.job_tree:
+            return
+        jobs = self.get_visible_jobs()
+        self.job_offset = max(0, min(self.job_offset, len(jobs) - JOB_VIEW_ROWS))
+        window = jobs[self.job_offset:self.job_offset + JOB_VIEW_ROWS]
+
+        for index in range(JOB_VIEW_ROWS):
+            iid = f"row{index}"
+            if index < len(window):
+                job = window[index]
+                percent = job.percent()
+                values = (
+                    job.title or job.video_id or job.link,
+                    JOB_STATE_NAMES.get(job.state, job.state),
+                    f"{percent:.0f}%" if percent is not None else '',
+                    f"{job.speed / (1024 * 1024):.2f} MB/s" if job.speed else '',
+                    max(0, job.attempts - 1),
+                )
+                if not self.job_tree.exists(iid):
+                    self.job_tree.insert('', index, iid=iid, values=values)
+                elif tuple(str(value) for value in self.job_tree.item(iid, 'values')) != tuple(str(value) for value in values):
+                    self.job_tree.item(iid, values=values)
+            elif self.job_tree.exists(iid):
+                self.job_tree.delete(iid)
+        self.job_rows = [job.link for job in window]
+
+        if jobs:
+            self.job_scrollbar.set(self.job_offset / len(jobs), (self.job_offset + len(window)) / len(jobs))
         else:
-            filename_template = "%(title)s.%(ext)s"
-
-        for attempt in range(max_retries):
-            try:
-                if attempt > 0:
-                    delay = retry_delay * attempt + random.uniform(1, 3)
-                    time.sleep(delay)
-                    print(f"重试下载 {link} (第 {attempt + 1} 次)")
-
-                # 获取最佳格式
-                format_str = self.get_best_format(link, prefer_low_quality)
-                
-                # 构建下载命令
-                command = [
-                    yt_dlp_path,
-                    '-f', format_str,
-                    '-o', os.path.join(save_path, filename_template),
-                    '--merge-output-format', self.config['video']['output_format'],
-                    # 反检测措施
-                    '--user-agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                    '--referer', 'https://www.youtube.com/',
-                    '--add-header', 'Accept-Language:en-US,en;q=0.9',
-                    '--add-header', 'Accept:text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                    '--sleep-interval', str(self.config['behavior']['download_interval']),
-                    '--max-sleep-interval', str(self.config['behavior']['download_interval'] + 2),
-                    '--retries', str(max_retries),
-                    '--fragment-retries', str(max_retries),
-                ]
-                
-                # 添加代理设置
-                if self.config['download']['proxy']['enabled']:
-                    command.extend(['--proxy', self.config['download']['proxy']['url']])
-                
-                # 添加错误忽略
-                if self.config['behavior']['ignore_errors']:
-                    command.append('--ignore-errors')
-                
-                command.append(link)
-                
-                # 执行下载
-                result = subprocess.run(command, capture_output=True, text=True)
-                
-                if result.returncode == 0:
-                    return 0  # 成功
-                else:
-                    print(f"下载失败 (尝试 {attempt + 1}): {result.stderr}")
-                    
-            except Exception as e:
-                print(f"下载异常 (尝试 {attempt + 1}): {e}")
-        
-        return -1  # 所有重试都失败
-    
-    def download_videos(self, file_path, links_list=None):
-        """批量下载视频"""
+            self.job_scrollbar.set(0, 1)
+
+    def scroll_job_view(self, amount, absolute=False):
+        """滚动任务列表（amount 为行数，absolute 为 True 时跳到指定行）"""
+        self.job_offset = amount if absolute else self.job_offset + amount
+        self.job_offset = max(0, self.job_offset)
+        self.refresh_job_view()
+
+    def on_job_scrollbar(self, action, amount, unit=None):
+        """滚动条拖动或点击"""
+        if action == 'moveto':
+            self.scroll_job_view(int(float(amount) * len(self.get_visible_jobs())), absolute=True)
+        elif action == 'scroll':
+            step = JOB_VIEW_ROWS if unit == 'pages' else 1
+            self.scroll_job_view(int(amount) * step)
+
+    def on_job_mousewheel(self, event):
+        """鼠标滚轮（Windows 每格 120，macOS 每格 1）"""
+        delta = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        self.scroll_job_view(-3 * delta)
+        return 'break'
+
+    def get_selected_job_links(self):
+        """任务列表中选中的链接"""
+        links = []
+        for iid in self.job_tree.selection():
+            index = int(iid[3:])
+            if index < len(self.job_rows):
+                links.append(self.job_rows[index])
+        return links
+
+    def cancel_selected_jobs(self):
+        """取消选中的任务"""
+        links = self.get_selected_job_links()
+        cancelled = sum(1 for link in links if self.engine.cancel_job(link))
+        if links:
+            self.update_status(f"已取消 {cancelled} 个任务")
+        self.job_tree.selection_set(())
+        self.refresh_job_view()
+
+    def move_selected_jobs(self, to_front):
+        """将选中的排队任务移到队首或队尾"""
+        links = self.get_selected_job_links()
+        # 移到队首时倒序处理，保持选中任务之间的相对顺序
+        for link in (reversed(links) if to_front else links):
+            self.engine.move_job(link, to_front)
+        self.refresh_job_view()
+
+    def download_videos(self, file_path, links_list=None, journal_path=None):
+        """批量下载视频（指定 journal_path 时按日志继续未完成的批次）"""
         save_path = self.save_path_entry.get()
-        max_workers = int(self.max_workers_entry.get())
         prefer_low_quality = self.low_quality_var.get() if self.low_quality_var else False
 
-        if not file_path and not links_list:
+        if not file_path and not links_list and not journal_path:
             self.update_status("请先选择一个文件或输入链接")
             return
 
-        if not self.validate_save_path(save_path):
-            return
-
-        # 保存配置
+        # 保存配置（并发数等设置由本程序内的队列服务使用）
         self.save_config()
 
-        # 测试代理连接
+        # 测试代理连接（并行检查代理池，任一代理可用即可开始；不可用的代理在下载中自动跳过）
         if self.config['download']['proxy']['enabled']:
             self.update_status("正在测试代理连接...")
-            if not self.test_proxy_connection():
+            max_age = self.config['download']['proxy'].get('check_interval', 60)
+            if not self.engine.test_proxy_connection(max_age=max_age):
                 self.update_status("代理连接失败，请检查代理设置")
-                messagebox.showerror("代理错误", "无法连接到代理服务器，请检查Clash是否启动并开放7890端口")
+                messagebox.showerror("代理错误", "无法连接到任何代理服务器，请检查Clash是否启动并开放7890端口")
                 return
 
-        # 读取链接
-        if links_list:
-            links = links_list
-        else:
-            try:
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    links = [line.strip() for line in file if line.strip()]
-            except Exception as e:
-                self.update_status(f"读取文件失败: {e}")
-                return
+        from downloader_core.service import ServiceError
 
-        if not links:
-            self.update_status("没有找到有效链接")
+        rejected = []
+        try:
+            if journal_path:
+                ids = self.queue_client.resume(journal_path, client='gui')
+            else:
+                # 链接文件边读边解析边入队；记录来源文件，失败的链接保存到 <文件>_failed.txt
+                source = os.path.abspath(file_path) if file_path else None
+                if file_path:
+                    links_list = iter_link_file(file_path, lambda number, line, reason: rejected.append(number))
+                ids = self.queue_client.submit(links_list, save_path=save_path,
+                                               low_quality=prefer_low_quality, client='gui', source=source)
+        except (OSError, ServiceError) as e:
+            self.update_status(f"加入下载队列失败: {e}")
             return
+        rejected_text = f"，忽略 {len(rejected)} 行无法识别的链接" if rejected else ""
+        self.update_status(f"已加入下载队列: {len(ids)} 个链接{rejected_text}")
 
-        total_count = len(links)
-        completed_count = 0
-        failed_links = []
-
-        quality_text = "最低画质" if prefer_low_quality else "最佳画质"
-        self.update_status(f"开始下载 {total_count} 个视频 ({quality_text})...")
-        self.update_progress(0, total_count)
-
-        # 限制并发数以避免被检测
-        actual_workers = min(max_workers, 2)
-
-        with ThreadPoolExecutor(max_workers=actual_workers) as executor:
-            futures = {}
-
-            for i, link in enumerate(links):
-                # 添加随机延迟
-                if i > 0:
-                    delay_range = self.config['behavior']['random_delay_range']
-                    delay = random.uniform(delay_range[0], delay_range[1])
-                    time.sleep(delay)
-
-                future = executor.submit(self.download_video, link, save_path, prefer_low_quality)
-                futures[future] = link
-            
-            for future in as_completed(futures):
-                link = futures[future]
-                try:
-                    result = future.result()
-                    if result == 0:
-                        completed_count += 1
-                    else:
-                        failed_links.append(link)
-                        
-                    self.update_progress(completed_count + len(failed_links), total_count)
-                    self.update_status(f"进度: {completed_count + len(failed_links)}/{total_count} (成功: {completed_count})")
-                    
-                except Exception as e:
-                    failed_links.append(link)
-                    print(f"下载异常: {link}, 错误: {e}")
-        
-        # 保存失败的链接
-        if failed_links:
-            failed_file = file_path + '_failed.txt'
-            try:
-                with open(failed_file, 'w', encoding='utf-8') as f:
-                    for link in failed_links:
-                        f.write(link + '\n')
-                self.update_status(f"下载完成: {completed_count}/{total_count} 成功，失败链接已保存到 {failed_file}")
-            except Exception as e:
-                self.update_status(f"下载完成: {completed_count}/{total_count} 成功，但无法保存失败链接: {e}")
-        else:
-            self.update_status(f"全部下载完成: {completed_count}/{total_count}")
-    
     def select_file(self):
         """选择文件"""
         file_path = filedialog.askopenfilename(
@@ -406,24 +343,19 @@ class YouTubeDownloader:
             messagebox.showwarning("输入错误", "请在文本框中输入YouTube链接")
             return
 
-        # 解析链接（支持换行和空格分隔）
-        import re
-        # 匹配YouTube链接的正则表达式
-        youtube_pattern = r'https?://(?:www\.)?(?:youtube\.com/watch\?v=|youtu\.be/)[a-zA-Z0-9_-]+'
-        links = re.findall(youtube_pattern, url_text)
-
-        if not links:
-            # 如果没有找到标准YouTube链接，尝试按行分割
-            lines = [line.strip() for line in url_text.split('\n') if line.strip()]
-            # 过滤出可能的链接
-            links = [line for line in lines if 'youtube.com' in line or 'youtu.be' in line]
+        # 解析链接（支持换行和空格分隔，转换为规范链接）
+        links, rejected = find_links(url_text)
 
         if not links:
             self.update_status("未找到有效的YouTube链接")
             messagebox.showerror("链接错误", "未找到有效的YouTube链接，请检查输入格式")
             return
 
-        self.update_status(f"找到 {len(links)} 个链接，开始下载...")
+        if rejected:
+            print("无法识别的行: " + "; ".join(f"第 {number} 行（{reason}）: {line}" for number, line, reason in rejected))
+            self.update_status(f"找到 {len(links)} 个链接，忽略 {len(rejected)} 行无法识别的内容，开始下载...")
+        else:
+            self.update_status(f"找到 {len(links)} 个链接，开始下载...")
         threading.Thread(target=self.download_videos, args=(None, links), daemon=True).start()
     
     def update_ytdlp(self):
@@ -431,8 +363,7 @@ class YouTubeDownloader:
         def update_worker():
             try:
                 self.update_status("正在更新 yt-dlp...")
-                result = subprocess.run([yt_dlp_path, '-U'], capture_output=True, text=True, timeout=120)
-                if result.returncode == 0:
+                if self.engine.update_ytdlp():
                     self.update_status("yt-dlp 更新完成")
                 else:
                     self.update_status("yt-dlp 更新失败")
@@ -444,6 +375,7 @@ class YouTubeDownloader:
     def prevent_sleep(self):
         """防止系统休眠"""
         try:
+            import ctypes
             ES_CONTINUOUS = 0x80000000
             ES_SYSTEM_REQUIRED = 0x00000001
             ctypes.windll.kernel32.SetThreadExecutionState(ES_CONTINUOUS | ES_SYSTEM_REQUIRED)
@@ -453,6 +385,7 @@ class YouTubeDownloader:
     def restore_sleep(self):
         """恢复系统休眠设置"""
         try:
+            import ctypes
             ES_CONTINUOUS = 0x80000000
             ctypes.windll.kernel32.SetThreadExecutionState(ES_CONTINUOUS)
         except:
@@ -461,6 +394,9 @@ class YouTubeDownloader:
     def signal_handler(self, sig, frame):
         """信号处理"""
         self.restore_sleep()
+        if self.service:
+            self.service.stop()
+        self.engine.close_journals()
         if self.root:
             self.root.quit()
         sys.exit(0)
@@ -469,7 +405,7 @@ class YouTubeDownloader:
         """创建GUI界面"""
         self.root = TkinterDnD.Tk()
         self.root.title("YouTube 批量下载器 v2.0")
-        self.root.geometry("650x700")
+        self.root.geometry("650x900")
 
         # 设置图标（如果存在）
         try:
@@ -509,6 +445,8 @@ class YouTubeDownloader:
         self.max_workers_entry = ttk.Entry(main_frame, width=10)
         self.max_workers_entry.grid(row=row, column=1, sticky=tk.W, padx=(10, 0), pady=5)
         self.max_workers_entry.insert(0, str(self.config['download']['max_workers']))
+        self.concurrency_label = ttk.Label(main_frame, text="", foreground="gray")
+        self.concurrency_label.grid(row=row, column=2, sticky=tk.W, padx=(5, 0), pady=5)
         row += 1
 
         # 代理设置
@@ -529,6 +467,15 @@ class YouTubeDownloader:
         low_quality_check.grid(row=row, column=0, columnspan=2, sticky=tk.W, pady=5)
         row += 1
 
+        # 下载顺序（链接后加 priority=N 的始终优先）
+        ttk.Label(main_frame, text="下载顺序:").grid(row=row, column=0, sticky=tk.W, pady=5)
+        policy = self.config['download'].get('order', {}).get('policy', 'priority')
+        self.order_var = tk.StringVar(value=ORDER_POLICY_NAMES.get(policy, ORDER_POLICY_NAMES['priority']))
+        order_combo = ttk.Combobox(main_frame, textvariable=self.order_var, values=list(ORDER_POLICY_NAMES.values()),
+                                   state='readonly', width=12)
+        order_combo.grid(row=row, column=1, sticky=tk.W, padx=(10, 0), pady=5)
+        row += 1
+
         # 启动时测试代理
         self.proxy_test_var = tk.BooleanVar(value=self.config['download']['proxy'].get('test_on_startup', False))
         proxy_test_check = ttk.Checkbutton(main_frame, text="启动时测试代理连接", variable=self.proxy_test_var)
@@ -554,7 +501,11 @@ class YouTubeDownloader:
 
         # 测试代理按钮
         test_proxy_button = ttk.Button(button_frame, text="测试代理", command=self.test_proxy_gui)
-        test_proxy_button.pack(side=tk.LEFT)
+        test_proxy_button.pack(side=tk.LEFT, padx=(0, 10))
+
+        # 代理状态按钮
+        proxy_status_button = ttk.Button(button_frame, text="代理状态", command=self.open_proxy_window)
+        proxy_status_button.pack(side=tk.LEFT)
 
         row += 1
 
@@ -633,6 +584,12 @@ class YouTubeDownloader:
         self.status_label.grid(row=row, column=0, columnspan=3, pady=10)
         row += 1
 
+        # 任务列表
+        job_frame = self.create_job_view(main_frame)
+        job_frame.grid(row=row, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 5))
+        main_frame.rowconfigure(row, weight=1)
+        row += 1
+
         # 使用说明
         help_text = """使用说明：
 方式1: 准备一个txt文件，每行一个YouTube链接，点击"选择链接文件"或拖放文件到窗口
@@ -664,8 +621,13 @@ class YouTubeDownloader:
         """GUI中的代理测试"""
         def test_worker():
             self.update_status("正在测试代理连接...")
-            if self.test_proxy_connection():
-                self.update_status("代理连接测试成功")
+            if self.engine.test_proxy_connection():
+                proxy_pool = self.engine.get_proxy_pool()
+                if proxy_pool and len(proxy_pool) > 1:
+                    healthy = sum(1 for item in proxy_pool.stats() if item['healthy'])
+                    self.update_status(f"代理连接测试成功，{healthy}/{len(proxy_pool)} 个代理可用")
+                else:
+                    self.update_status("代理连接测试成功")
                 messagebox.showinfo("代理测试", "代理连接正常")
             else:
                 self.update_status("代理连接测试失败")
@@ -673,11 +635,91 @@ class YouTubeDownloader:
 
         threading.Thread(target=test_worker, daemon=True).start()
 
+    def open_proxy_window(self):
+        """打开代理状态窗口（每个代理的可用状态、延迟、速度和成功/失败次数）"""
+        if self.proxy_window and self.proxy_window.winfo_exists():
+            self.proxy_window.lift()
+            return
+        self.proxy_window = tk.Toplevel(self.root)
+        self.proxy_window.title("代理状态")
+        self.proxy_window.geometry("720x260")
+
+        columns = ('url', 'state', 'latency', 'speed', 'active', 'successes', 'failures', 'error')
+        self.proxy_tree = ttk.Treeview(self.proxy_window, columns=columns, show='headings', height=8)
+        for column, text, width in (
+            ('url', '代理', 180), ('state', '状态', 60), ('latency', '延迟', 70), ('speed', '速度', 90),
+            ('active', '进行中', 60), ('successes', '成功', 50), ('failures', '失败', 50), ('error', '最近错误', 200),
+        ):
+            self.proxy_tree.heading(column, text=text)
+            self.proxy_tree.column(column, width=width, stretch=(column == 'error'))
+        self.proxy_tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 5))
+
+        check_button = ttk.Button(self.proxy_window, text="立即检查", command=lambda: threading.Thread(
+            target=self.engine.test_proxy_connection, daemon=True).start())
+        check_button.pack(pady=(0, 10))
+        self.refresh_proxy_window()
+
+    def refresh_proxy_window(self):
+        """每秒刷新代理状态窗口（窗口关闭后停止）"""
+        if not self.proxy_window or not self.proxy_window.winfo_exists():
+            self.proxy_window = None
+            return
+        proxy_pool = self.engine.get_proxy_pool()
+        stats = proxy_pool.stats() if proxy_pool else []
+        self.proxy_tree.delete(*self.proxy_tree.get_children())
+        for item in stats:
+            self.proxy_tree.insert('', tk.END, values=(
+                item['url'],
+                {True: '可用', False: '停用', None: '未检查'}[item['healthy']],
+                f"{item['latency'] * 1000:.0f} ms" if item['latency'] is not None else '',
+                f"{item['throughput'] / (1024 * 1024):.2f} MB/s" if item['throughput'] is not None else '',
+                item['active'],
+                item['successes'],
+                item['failures'],
+                item['last_error'] or '',
+            ))
+        if not stats:
+            self.proxy_tree.insert('', tk.END, values=('未启用代理', '', '', '', '', '', '', ''))
+        self.proxy_window.after(1000, self.refresh_proxy_window)
+
     def on_closing(self):
         """窗口关闭事件"""
         self.restore_sleep()
+        if self.service:
+            self.service.stop()
+        self.engine.close_journals()
         self.root.destroy()
 
+    def offer_resume(self):
+        """启动时检查未完成的批次，询问是否继续下载"""
+        directory = self.engine.get_journal_directory()
+        if not directory:
+            return
+
+        for journal_path in BatchJournal.find_unfinished(directory):
+            try:
+                journal = BatchJournal(journal_path)
+                journal.close()
+                remaining = journal.unfinished_count() if journal.header else 0
+            except Exception as e:
+                print(f"读取下载日志失败: {journal_path}, 错误: {e}")
+                continue
+
+            if not remaining:
+                journal.finish()
+                continue
+            if journal.header.get('service'):
+                # 队列服务的批次由服务启动时继续
+                continue
+
+            source = journal.header.get('file_path')
+            source_text = os.path.basename(source) if source else "直接输入的链接"
+            if messagebox.askyesno("继续下载", f"发现未完成的下载任务（{source_text}，{remaining} 个链接未完成），是否继续下载？"):
+                self.update_status("继续未完成的下载...")
+                threading.Thread(target=self.download_videos, args=(None, None, journal_path), daemon=True).start()
+            else:
+                journal.finish()
+
     def run(self):
         """运行程序"""
         # 设置信号处理
@@ -690,30 +732,78 @@ class YouTubeDownloader:
 
         # 创建并运行GUI
         root = self.create_gui()
+        self.profiler.mark("创建界面")
+
+        # 定时刷新界面
+        root.after(UI_REFRESH_INTERVAL, self.refresh_ui)
+
+        # 窗口显示之后再启动队列服务和检查 yt-dlp，不推迟窗口出现
+        root.after_idle(self.start_background_tasks)
+
+        root.mainloop()
+
+    def start_background_tasks(self):
+        """启动或连接队列服务，检查上次未完成的下载任务和 yt-dlp"""
+        self.profiler.mark("窗口显示")
+        self.profiler.report(target_ms=STARTUP_TARGET_MS)
+
+        self.start_queue_service()
+        self.profiler.mark("队列服务就绪")
+        self.root.after(500, self.offer_resume)
 
-        # 启动时检查yt-dlp
         self.update_status("检查 yt-dlp 状态...")
         threading.Thread(target=self.check_ytdlp_on_startup, daemon=True).start()
 
-        root.mainloop()
+    def start_queue_service(self):
+        """连接已运行的队列服务，没有时在本程序内启动（其他客户端也可以提交任务）"""
+        from downloader_core.service import connect_service, create_service
+
+        self.queue_client = connect_service(self.config)
+        if self.queue_client:
+            self.update_status(f"已连接下载队列服务: {self.queue_client.url}")
+            threading.Thread(target=self.poll_remote_status, daemon=True).start()
+            return
+
+        self.service = create_service(self.engine)
+        listen = self.config.get('service', {}).get('enabled', True)
+        try:
+            self.service.start(listen=listen)
+        except OSError as e:
+            print(f"队列服务端口不可用，只接受本程序的任务: {e}")
+            self.service.start(listen=False)
+        self.queue_client = self.service
+
+    def poll_remote_status(self):
+        """连接其他进程的队列服务时，定时读取状态和进度"""
+        from downloader_core.service import ServiceError
+
+        while True:
+            try:
+                status = self.queue_client.status()
+            except (OSError, ServiceError):
+                status = None
+            if status:
+                if status.get('status'):
+                    self.update_status(status['status'])
+                progress = status.get('progress')
+                if progress:
+                    self.update_progress(progress['position'], progress['total'])
+            time.sleep(1)
 
     def check_ytdlp_on_startup(self):
         """启动时检查yt-dlp"""
-        try:
-            result = subprocess.run([yt_dlp_path, '--version'],
-                                  capture_output=True, text=True, timeout=10)
-            if result.returncode == 0:
-                version = result.stdout.strip()
-                self.update_status(f"就绪 - yt-dlp {version}")
-            else:
-                self.update_status("yt-dlp 检查失败，建议更新")
-        except Exception:
+        version = self.engine.get_ytdlp_version()
+        self.profiler.mark("检查 yt-dlp")
+        if version:
+            self.update_status(f"就绪 - yt-dlp {version}")
+        else:
             self.update_status("yt-dlp 检查失败，建议更新")
 
 
 def main():
     """主函数"""
     try:
+        STARTUP_PROFILER.mark("导入模块")
         app = YouTubeDownloader()
         app.run()
     except KeyboardInterrupt: